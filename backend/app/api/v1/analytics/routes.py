@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify
+from app.models.performance import MasteryView
+
+analytics_bp = Blueprint('analytics', __name__)
+
+
+@analytics_bp.route('/mastery/<int:user_id>', methods=['GET'])
+def get_mastery(user_id):
+    """Materialized mastery and recommendations for one user (one indexed lookup, no ML at request time)."""
+    rows = MasteryView.for_user(user_id)
+    topics = sorted((row.to_dict() for row in rows), key=lambda r: r["topic"])
+    recommendations = sorted(
+        (r for r in topics if r["recommendation_rank"] is not None),
+        key=lambda r: r["recommendation_rank"]
+    )
+    return jsonify({
+        "user_id": user_id,
+        "version": max((r["version"] for r in topics), default=None),
+        "topics": topics,
+        "recommendations": [
+            {"topic": r["topic"], "accuracy": r["accuracy"], "recommended_difficulty": r["recommended_difficulty"]}
+            for r in recommendations
+        ],
+    })
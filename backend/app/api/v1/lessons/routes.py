@@ -1,8 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app.models.users import db
 from app.models.lesson import Lesson
 from app.models.quiz import Quiz
-from ml.train.quiz_gen import generate_quiz, chunk_text
+from ml.train.quiz_gen import DEFAULT_CONCURRENCY, generate_quiz_from_chunks, chunk_text
 from ml.utils.text_cleaner import clean_text
 
 lessons_bp = Blueprint('lessons', __name__)
@@ -43,13 +43,13 @@ def generate_lesson_quiz(lesson_id):
     chunks = chunk_text(cleaned_content, max_words=100) # Ensure chunks aren't too big
 
     # 2. Generate quiz
-    full_quiz_data = []
-    
     # Limit chunks to avoid excessive API calls if content is huge
     max_chunks = 5
-    for i, chunk in enumerate(chunks[:max_chunks]):
-        questions = generate_quiz(chunk)
-        full_quiz_data.extend(questions)
+    full_quiz_data = generate_quiz_from_chunks(
+        chunks[:max_chunks],
+        max_workers=current_app.config.get("QUIZ_GEN_CONCURRENCY", DEFAULT_CONCURRENCY),
+        batch_tokens=current_app.config.get("QUIZ_GEN_BATCH_TOKENS", 0)
+    )
 
     if not full_quiz_data:
         return jsonify({"error": "Failed to generate quiz questions"}), 500
@@ -1,7 +1,12 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from app.models.users import db, User
 from app.models.quiz import Quiz
 from app.models.submission import QuizAttempt, QuizAnswer
+from app.models.performance import TopicStats, DEFAULT_TOPIC
+from datetime import datetime, timedelta
+import math
+
+DIFFICULTIES = ("easy", "medium", "hard")
 
 quizzes_bp = Blueprint('quizzes', __name__)
 
@@ -32,15 +37,27 @@ def get_recent_quizzes():
 def submit_quiz(quiz_id):
     data = request.get_json()
     # Expect: { "user_id": 1, "class_id": optional, "answers": [{ "question": "...", "answer": "...", "is_correct": true }] }
+    # Optional: "difficulty": "easy" | "medium" | "hard", "time_taken_seconds": 240
     
     quiz = Quiz.query.get_or_404(quiz_id)
     
     user_id = data.get('user_id')
     class_id = data.get('class_id')
     answers_data = data.get('answers', [])
+    difficulty = data.get('difficulty')
+    time_taken = data.get('time_taken_seconds')
     
     if not user_id:
         return jsonify({"error": "User ID is required"}), 400
+    if difficulty is not None and difficulty not in DIFFICULTIES:
+        return jsonify({"error": "difficulty must be one of easy, medium, hard"}), 400
+    if time_taken is not None:
+        try:
+            time_taken = float(time_taken)
+        except (TypeError, ValueError):
+            time_taken = math.nan
+        if not math.isfinite(time_taken) or time_taken < 0:
+            return jsonify({"error": "time_taken_seconds must be a number of seconds >= 0"}), 400
 
     # Check if user
     user = User.query.get(user_id)
@@ -56,11 +73,18 @@ def submit_quiz(quiz_id):
     correct_c = sum(1 for a in answers_data if a.get('is_correct'))
     score = (correct_c / total_q * 100) if total_q > 0 else 0.0
 
+    completed_at = datetime.utcnow()
+    # Leave started_at empty when the client did not time the attempt
+    started_at = completed_at - timedelta(seconds=time_taken) if time_taken is not None else None
+
     attempt = QuizAttempt(
         user_id=user_id,
         quiz_id=quiz.id,
         class_id=class_id,
-        score=score
+        score=score,
+        difficulty=difficulty,
+        started_at=started_at,
+        completed_at=completed_at
     )
     
     db.session.add(attempt)
@@ -83,7 +107,7 @@ def submit_quiz(quiz_id):
     # Gamification: Streak logic
     diamonds_earned = 0
     if user:
-        from datetime import date, timedelta
+        from datetime import date
         today = date.today()
         if user.last_active_date is None:
             user.streak = 1
@@ -101,7 +125,25 @@ def submit_quiz(quiz_id):
         diamonds_earned = correct_c * 5
         user.diamonds += diamonds_earned
 
+    # Keep the per-topic mastery statistics current (O(1) per submission)
+    topic = (quiz.lesson.topic if quiz.lesson else None) or DEFAULT_TOPIC
+    stats = TopicStats.for_update(user_id, topic)
+    stats.record_attempt(
+        accuracy=score / 100.0,
+        attempted_at=completed_at,
+        difficulty=difficulty,
+        avg_time=time_taken / total_q if time_taken is not None and total_q > 0 else None
+    )
+
     db.session.commit()
+
+    if current_app.config.get("MASTERY_REFRESH_ON_SUBMIT"):
+        try:
+            from ml.tasks import enqueue_mastery_refresh
+            enqueue_mastery_refresh()
+        except Exception as e:
+            # The next successful enqueue picks these rows up; never fail the submission over it
+            current_app.logger.warning("Could not queue mastery refresh: %s", e)
     
     return jsonify({
         "message": "Quiz submitted successfully",
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from pydantic import ValidationError
 from app.models.users import db, User
@@ -6,12 +6,15 @@ from app.schemas.teacher import InviteStudentSchema
 from app.models.lesson import Lesson
 from app.models.quiz import Quiz
 from werkzeug.utils import secure_filename
+import json
 import os
 import time
 
 from ml.utils.pdf_utils import extract_text_from_pdf
 from ml.utils.text_cleaner import clean_text
-from ml.train.quiz_gen import chunk_text, generate_quiz
+from ml.rate_limit import RateLimitError
+from ml.train.quiz_gen import (DEFAULT_CONCURRENCY, chunk_text, generate_quiz_from_chunks, is_placeholder,
+                               iter_quiz_from_chunks)
 
 ALLOWED_EXTENSIONS = {"pdf", "txt", "docx"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
@@ -103,110 +106,132 @@ def invite_student():
     return jsonify({"msg": f"Student {data.full_name} invited successfully"}), 201
 
 
-@teacher_bp.route("/materials", methods=["POST"])
-# Note: this endpoint accepts uploads and processes them synchronously for now
-def upload_material():
+def _receive_upload():
+    """Save the uploaded file and extract its text.
+
+    Returns (error_response, None) or (None, upload) where upload holds the
+    teacher, saved file name, cleaned text and the generation options from the form.
+    """
+    # Allow authenticated teachers, but also accept anonymous uploads for quick dev testing
+    from flask_jwt_extended import verify_jwt_in_request
+    current_user_id = None
     try:
-        # Allow authenticated teachers, but also accept anonymous uploads for quick dev testing
-        from flask_jwt_extended import verify_jwt_in_request
-        current_user_id = None
+        verify_jwt_in_request(optional=True)
+        current_user_id = get_jwt_identity()
+    except Exception:
+        pass # No valid token
+        
+    teacher = None
+    if current_user_id:
         try:
-            verify_jwt_in_request(optional=True)
-            current_user_id = get_jwt_identity()
+            teacher = User.query.get(int(current_user_id))
         except Exception:
-            pass # No valid token
-            
-        teacher = None
-        if current_user_id:
+            teacher = None
+
+    if "file" not in request.files:
+        return (jsonify({"msg": "file is required"}), 400), None
+
+    file = request.files["file"]
+    filename = secure_filename(file.filename or "")
+    if not filename or "." not in filename:
+        return (jsonify({"msg": "Invalid filename"}), 400), None
+
+    ext = filename.rsplit(".", 1)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        return (jsonify({"msg": "Unsupported file type"}), 400), None
+
+    # Check file size
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    if size > MAX_FILE_SIZE:
+        return (jsonify({"msg": "File too large"}), 400), None
+
+    # Save file to backend/uploads
+    project_root = os.path.abspath(os.path.join(current_app.root_path, ".."))
+    uploads_dir = os.path.join(project_root, "uploads")
+    os.makedirs(uploads_dir, exist_ok=True)
+
+    timestamp = int(time.time())
+    saved_name = f"{(teacher.id if teacher else 'anon')}_{timestamp}_{filename}"
+    saved_path = os.path.join(uploads_dir, saved_name)
+    file.save(saved_path)
+
+    # Extract text based on extension
+    try:
+        if ext == "pdf":
+            text = extract_text_from_pdf(saved_path)
+        elif ext == "txt":
+            with open(saved_path, "r", encoding="utf-8") as fh:
+                text = fh.read()
+        elif ext == "docx":
             try:
-                teacher = User.query.get(int(current_user_id))
+                from docx import Document
+                doc = Document(saved_path)
+                text = "\n".join(p.text for p in doc.paragraphs)
             except Exception:
-                teacher = None
-
-        if "file" not in request.files:
-            return jsonify({"msg": "file is required"}), 400
-
-        file = request.files["file"]
-        filename = secure_filename(file.filename or "")
-        if not filename or "." not in filename:
-            return jsonify({"msg": "Invalid filename"}), 400
-
-        ext = filename.rsplit(".", 1)[1].lower()
-        if ext not in ALLOWED_EXTENSIONS:
-            return jsonify({"msg": "Unsupported file type"}), 400
-
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        size = file.tell()
-        file.seek(0)
-        if size > MAX_FILE_SIZE:
-            return jsonify({"msg": "File too large"}), 400
-
-        # Save file to backend/uploads
-        project_root = os.path.abspath(os.path.join(current_app.root_path, ".."))
-        uploads_dir = os.path.join(project_root, "uploads")
-        os.makedirs(uploads_dir, exist_ok=True)
-
-        timestamp = int(time.time())
-        saved_name = f"{(teacher.id if teacher else 'anon')}_{timestamp}_{filename}"
-        saved_path = os.path.join(uploads_dir, saved_name)
-        file.save(saved_path)
-
-        # Extract text based on extension
-        try:
-            if ext == "pdf":
-                text = extract_text_from_pdf(saved_path)
-            elif ext == "txt":
-                with open(saved_path, "r", encoding="utf-8") as fh:
-                    text = fh.read()
-            elif ext == "docx":
-                try:
-                    from docx import Document
-                    doc = Document(saved_path)
-                    text = "\n".join(p.text for p in doc.paragraphs)
-                except Exception:
-                    return jsonify({"msg": "Could not read DOCX file (missing dependency)"}), 400
-            else:
-                text = ""
-        except Exception as e:
-            return jsonify({"msg": f"Failed to extract text: {e}"}), 500
-
-        # Clean and chunk
-        cleaned = clean_text(text)
-        num_questions = int(request.form.get("numQuestions", request.form.get("num_questions", 10)))
-        difficulty = request.form.get("difficulty", "medium")
-        title = request.form.get("title", f"Quiz - {filename}")
-        subject = request.form.get("subject", "Uploaded Material") # New parameter
-        
+                return (jsonify({"msg": "Could not read DOCX file (missing dependency)"}), 400), None
+        else:
+            text = ""
+    except Exception as e:
+        return (jsonify({"msg": f"Failed to extract text: {e}"}), 500), None
+
+    # Clean and chunk
+    cleaned = clean_text(text)
+    return None, {
+        "teacher": teacher,
+        "saved_name": saved_name,
+        "cleaned": cleaned,
+        "num_questions": int(request.form.get("numQuestions", request.form.get("num_questions", 10))),
+        "difficulty": request.form.get("difficulty", "medium"),
+        "title": request.form.get("title", f"Quiz - {filename}"),
+        "subject": request.form.get("subject", "Uploaded Material"), # New parameter
         # Chunk text to ensure we have enough context for Qs
-        # Adjust chunk size if we want more complex questions? 50 words is quite small. 
-        chunks = chunk_text(cleaned, max_words=150) # Increased context for better Qs
+        # Adjust chunk size if we want more complex questions? 50 words is quite small.
+        "chunks": chunk_text(cleaned, max_words=150), # Increased context for better Qs
+    }
+
+
+def _quiz_generation_options(upload):
+    return dict(
+        difficulty=upload["difficulty"],
+        num_questions=upload["num_questions"],
+        max_workers=current_app.config.get("QUIZ_GEN_CONCURRENCY", DEFAULT_CONCURRENCY),
+        batch_tokens=current_app.config.get("QUIZ_GEN_BATCH_TOKENS", 0),
+        min_chars=50
+    )
+
+
+def _create_lesson(upload):
+    lesson = Lesson(
+        title=upload["title"],
+        content=upload["cleaned"], # Storing full text as lesson content
+        topic=upload["subject"],
+        file_path=upload["saved_name"],
+        class_id=None, # Optionally link to class if we had class_id in form
+        teacher_id=upload["teacher"].id if upload["teacher"] else None
+    )
+    db.session.add(lesson)
+    db.session.commit()
+    return lesson
+
+
+@teacher_bp.route("/materials", methods=["POST"])
+# Note: this endpoint accepts uploads and processes them synchronously for now
+def upload_material():
+    try:
+        error, upload = _receive_upload()
+        if error is not None:
+            return error
         
-        # Generate quiz items up to num_questions
-        quiz_questions = []
+        # Generate quiz items up to num_questions, several chunks at a time (order is kept)
         # If chunks < num_questions, we might run out. We could loop or use overlapping chunks.
-        # For now, just generate as many as we can from chunks.
-        for c in chunks:
-            if len(c) < 50: continue # skip very short chunks
-            generated = generate_quiz(c, difficulty=difficulty)
-            quiz_questions.extend(generated)
-            if len(quiz_questions) >= num_questions:
-                break
-                
-        quiz_questions = quiz_questions[:num_questions]
+        # For now, just generate as many as we can from chunks; very short chunks are skipped.
+        quiz_questions = generate_quiz_from_chunks(upload["chunks"], **_quiz_generation_options(upload))
         
         # SAVE TO DATABASE
         # 1. Create Lesson
-        lesson = Lesson(
-            title=title,
-            content=cleaned, # Storing full text as lesson content
-            topic=subject,
-            file_path=saved_name,
-            class_id=None, # Optionally link to class if we had class_id in form
-            teacher_id=teacher.id if teacher else None
-        )
-        db.session.add(lesson)
-        db.session.commit()
+        lesson = _create_lesson(upload)
         
         # 2. Create Quiz
         quiz = Quiz(
@@ -224,7 +249,70 @@ def upload_material():
             "num_questions": len(quiz_questions)
         }), 201
 
+    except RateLimitError:
+        raise  # answered 503 + Retry-After by the app's error handler
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@teacher_bp.route("/materials/stream", methods=["POST"])
+def upload_material_stream():
+    """Same upload as /materials, answered as Server-Sent Events.
+
+    The Lesson and an empty Quiz are created first (`lesson` event); each
+    question is appended to the Quiz and sent (`question` event) as soon as its
+    chunk is generated, and a final `done` event carries the summary. Chunks
+    the model failed on are skipped, never sent as placeholders. A failure
+    mid-way ends the stream with an `error` event; questions sent so far stay saved.
+    """
+    error, upload = _receive_upload()
+    if error is not None:
+        return error
+
+    lesson = _create_lesson(upload)
+    quiz = Quiz(lesson_id=lesson.id, questions=[])
+    db.session.add(quiz)
+    db.session.commit()
+    # One prompt per chunk: a packed batch would hold back the first question until the whole batch answers
+    options = dict(_quiz_generation_options(upload), batch_tokens=0)
+    summary = {"quiz_id": quiz.id, "lesson_id": lesson.id, "title": lesson.title}
+
+    def events():
+        started = time.perf_counter()
+        yield _sse("lesson", summary)
+        questions = []
+        try:
+            for item in iter_quiz_from_chunks(upload["chunks"], **options):
+                if is_placeholder(item):
+                    continue
+                questions.append(item)
+                # Reassign so SQLAlchemy sees the JSON column change
+                quiz.questions = list(questions)
+                db.session.commit()
+                yield _sse("question", {"index": len(questions) - 1, "question": item})
+        except RateLimitError as e:
+            db.session.rollback()
+            yield _sse("error", {"error": "Quiz generation is rate limited, please retry later",
+                                 "retry_after": e.retry_after, "num_questions": len(questions)})
+            return
+        except Exception as e:
+            db.session.rollback()
+            yield _sse("error", {"error": str(e), "num_questions": len(questions)})
+            return
+        yield _sse("done", {
+            "message": "Quiz generated and saved successfully",
+            **summary,
+            "num_questions": len(questions),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        })
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # don't let nginx buffer the stream
+    })
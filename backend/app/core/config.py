@@ -8,3 +8,12 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "JWT_SUPER_SECRET")
+    # Load every ml/models/*.joblib into the model registry when the app starts
+    ML_PRELOAD_MODELS = os.environ.get("ML_PRELOAD_MODELS", "0") == "1"
+    # Queue a refresh of the materialized mastery table (RQ ml-tasks) after each quiz submission
+    # (one pooled Redis call; `python -m ml.worker` also queues it every MASTERY_REFRESH_INTERVAL s)
+    MASTERY_REFRESH_ON_SUBMIT = os.environ.get("MASTERY_REFRESH_ON_SUBMIT", "1") == "1"
+    # Concurrent Gemini calls when generating a quiz from document chunks
+    QUIZ_GEN_CONCURRENCY = int(os.environ.get("QUIZ_GEN_CONCURRENCY", "4"))
+    # Token budget per multi-chunk quiz prompt (0 = one prompt per chunk)
+    QUIZ_GEN_BATCH_TOKENS = int(os.environ.get("QUIZ_GEN_BATCH_TOKENS", "4000"))
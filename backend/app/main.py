@@ -1,5 +1,6 @@
 import sys
 import os
+import math
 
 # Add backend folder to sys.path so absolute imports work
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -15,11 +16,17 @@ from flask_cors import CORS
 from app.core.config import Config
 from app.models.users import db
 from app.models.submission import QuizAttempt, QuizAnswer
+from app.models.performance import TopicStats, MasteryView
 from app.api.v1.auth.routes import auth_bp
 from app.api.v1.teacher.routes import teacher_bp
 from app.api.v1.classes.routes import classes_bp
 from app.api.v1.lessons.routes import lessons_bp
 from app.api.v1.quizzes.routes import quizzes_bp
+from app.api.v1.analytics.routes import analytics_bp
+from ml.rate_limit import RateLimitError
+
+# Retry-After for a rate-limited model call that carried no hint of its own (seconds)
+RATE_LIMIT_RETRY_AFTER = 30
 
 def create_app():
     app = Flask(__name__)
@@ -35,6 +42,18 @@ def create_app():
     app.register_blueprint(classes_bp, url_prefix="/api/classes")
     app.register_blueprint(lessons_bp, url_prefix="/api/lessons")
     app.register_blueprint(quizzes_bp, url_prefix="/api/quizzes")
+    app.register_blueprint(analytics_bp, url_prefix="/api/analytics")
+
+    if app.config.get("ML_PRELOAD_MODELS"):
+        from ml.model_registry import get_registry
+        get_registry().preload()
+
+    @app.errorhandler(RateLimitError)
+    def model_rate_limited(e):
+        # The model quota is exhausted even after backing off; tell the client when to come back
+        retry_after = max(1, math.ceil(e.retry_after or RATE_LIMIT_RETRY_AFTER))
+        return {"error": "Quiz generation is rate limited, please retry later", "retry_after": retry_after}, \
+            503, {"Retry-After": str(retry_after)}
 
     @app.route("/")
     def home():
@@ -0,0 +1,210 @@
+from app.models.users import db
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from ml.feature_store import STATS_FIELDS, new_stats, update_stats, features_from_stats
+
+DEFAULT_TOPIC = "general"
+RECOMMENDATIONS_PER_USER = 3
+
+
+class TopicStats(db.Model):
+    """Running mastery statistics per (user, topic), updated on every quiz submission.
+
+    Columns mirror `ml.feature_store.STATS_FIELDS`; see that module for their meaning.
+    """
+    __tablename__ = 'topic_stats'
+    __table_args__ = (db.UniqueConstraint('user_id', 'topic', name='uq_topic_stats_user_topic'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    topic = db.Column(db.String(100), nullable=False)
+
+    attempts_count = db.Column(db.Integer, nullable=False, default=0)
+    n_accuracy = db.Column(db.Integer, nullable=False, default=0)
+    sum_accuracy = db.Column(db.Float, nullable=False, default=0.0)
+    n_finite = db.Column(db.Integer, nullable=False, default=0)
+    sum_finite = db.Column(db.Float, nullable=False, default=0.0)
+    m2_finite = db.Column(db.Float, nullable=False, default=0.0)
+    n_time = db.Column(db.Integer, nullable=False, default=0)
+    sum_time = db.Column(db.Float, nullable=False, default=0.0)
+    n_missing_time = db.Column(db.Integer, nullable=False, default=0)
+    sum_inv_questions = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Regression sums, x = seconds since x0 (first attempt, epoch seconds)
+    x0 = db.Column(db.Float, nullable=True)
+    x_max = db.Column(db.Float, nullable=True)
+    sx = db.Column(db.Float, nullable=False, default=0.0)
+    sxy = db.Column(db.Float, nullable=False, default=0.0)
+    sxx = db.Column(db.Float, nullable=False, default=0.0)
+
+    n_easy = db.Column(db.Integer, nullable=False, default=0)
+    sum_easy = db.Column(db.Float, nullable=False, default=0.0)
+    n_medium = db.Column(db.Integer, nullable=False, default=0)
+    sum_medium = db.Column(db.Float, nullable=False, default=0.0)
+    n_hard = db.Column(db.Integer, nullable=False, default=0)
+    sum_hard = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Bumped on every recorded attempt; MasteryView rows remember the version they were computed from
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = db.relationship('User', backref='topic_stats')
+
+    def __init__(self, user_id, topic):
+        self.user_id = user_id
+        self.topic = topic
+        for field, value in new_stats().items():
+            setattr(self, field, value)
+        self.version = 0
+
+    def as_stats(self):
+        stats = {field: getattr(self, field) for field in STATS_FIELDS}
+        stats["student_id"] = self.user_id
+        stats["topic"] = self.topic
+        return stats
+
+    def record_attempt(self, accuracy, attempted_at, difficulty=None, avg_time=None):
+        """Fold one attempt into the running statistics (O(1))."""
+        stats = update_stats(self.as_stats(), accuracy, attempted_at, difficulty=difficulty, avg_time=avg_time)
+        for field in STATS_FIELDS:
+            setattr(self, field, stats[field])
+        self.version = (self.version or 0) + 1
+
+    @classmethod
+    def for_update(cls, user_id, topic):
+        """Return the row for (user_id, topic), locked for update, creating it if missing.
+
+        A missing row cannot be locked, so two first submissions can both try to
+        insert it. The insert runs in a savepoint; the loser of that race rolls
+        back to it and locks the winner's row instead.
+        """
+        query = cls.query.filter_by(user_id=user_id, topic=topic).with_for_update()
+        row = query.first()
+        if row is None:
+            try:
+                with db.session.begin_nested():
+                    row = cls(user_id=user_id, topic=topic)
+                    db.session.add(row)
+            except IntegrityError:
+                row = query.first()
+        return row
+
+    @classmethod
+    def features_frame(cls, user_id=None):
+        """Mastery features (`aggregate_features` columns) straight from the stored statistics."""
+        query = cls.query if user_id is None else cls.query.filter_by(user_id=user_id)
+        return features_from_stats(row.as_stats() for row in query)
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "topic": self.topic,
+            "attempts_count": self.attempts_count,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class MasteryView(db.Model):
+    """Materialized mastery prediction and topic recommendation per (user, topic).
+
+    Rows are written by `refresh_dirty` (run on the RQ `ml-tasks` queue) and read
+    by the analytics API with one indexed lookup on user_id. `stats_version` is
+    the TopicStats.version the row was computed from; `version` is the refresh
+    run that wrote it.
+    """
+    __tablename__ = 'mastery_view'
+    __table_args__ = (db.UniqueConstraint('user_id', 'topic', name='uq_mastery_view_user_topic'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    topic = db.Column(db.String(100), nullable=False)
+
+    accuracy = db.Column(db.Float, nullable=True)
+    mastery_probability = db.Column(db.Float, nullable=True)  # None when the topic has no trained model
+    mastery_level = db.Column(db.String(20), nullable=True)
+    recommended_difficulty = db.Column(db.String(20), nullable=True)
+    recommendation_rank = db.Column(db.Integer, nullable=True)  # 1 = practise first; None = not recommended
+
+    stats_version = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def dirty_user_ids(cls):
+        """Users with a TopicStats row that has no view row or a newer version than its view row."""
+        query = (
+            db.session.query(TopicStats.user_id)
+            .outerjoin(cls, and_(cls.user_id == TopicStats.user_id, cls.topic == TopicStats.topic))
+            .filter(or_(cls.id.is_(None), cls.stats_version != TopicStats.version))
+            .distinct()
+        )
+        return [user_id for (user_id,) in query]
+
+    @classmethod
+    def refresh_dirty(cls, batch_size=500, registry=None):
+        """Recompute the rows of every dirty user and return (version, users refreshed).
+
+        A user's recommendations rank all of their topics, so a change to one
+        topic recomputes that user's rows; untouched users are not read at all.
+        """
+        from ml.pipeline import mastery_levels, recommend_next_topics_batch
+        from ml.topic_models import predict_topic_mastery_batch
+
+        user_ids = cls.dirty_user_ids()
+        if not user_ids:
+            return None, 0
+        version = (db.session.query(func.max(cls.version)).scalar() or 0) + 1
+        now = datetime.utcnow()
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            stats_rows = TopicStats.query.filter(TopicStats.user_id.in_(batch)).all()
+            stats_versions = {(row.user_id, row.topic): row.version for row in stats_rows}
+            feats = features_from_stats(row.as_stats() for row in stats_rows)
+
+            probs = predict_topic_mastery_batch(feats, registry)["mastery_probability"].to_numpy()
+            levels = mastery_levels(feats["accuracy_mean"])
+            recs = recommend_next_topics_batch(feats, top_n=RECOMMENDATIONS_PER_USER)
+            ranked = {(sid, topic): (rank, diff) for sid, topic, rank, diff in zip(
+                recs["student_id"].tolist(), recs["topic"].tolist(), recs["rank"].tolist(),
+                recs["recommended_difficulty"].tolist())}
+
+            existing = {(v.user_id, v.topic): v for v in cls.query.filter(cls.user_id.in_(batch))}
+            for i, (user_id, topic, accuracy) in enumerate(zip(
+                    feats["student_id"].tolist(), feats["topic"].tolist(), feats["accuracy_mean"].tolist())):
+                key = (user_id, topic)
+                view = existing.get(key)
+                if view is None:
+                    view = cls(user_id=user_id, topic=topic)
+                    db.session.add(view)
+                rank, difficulty = ranked.get(key, (None, None))
+                view.accuracy = None if accuracy != accuracy else float(accuracy)
+                view.mastery_probability = None if probs[i] != probs[i] else float(probs[i])
+                view.mastery_level = str(levels[i])
+                view.recommended_difficulty = difficulty
+                view.recommendation_rank = rank
+                view.stats_version = stats_versions[key]
+                view.version = version
+                view.refreshed_at = now
+            db.session.commit()
+        return version, len(user_ids)
+
+    @classmethod
+    def for_user(cls, user_id):
+        return cls.query.filter_by(user_id=user_id).all()
+
+    def to_dict(self):
+        return {
+            "topic": self.topic,
+            "accuracy": self.accuracy,
+            "mastery_probability": self.mastery_probability,
+            "mastery_level": self.mastery_level,
+            "recommended_difficulty": self.recommended_difficulty,
+            "recommendation_rank": self.recommendation_rank,
+            "version": self.version,
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+        }
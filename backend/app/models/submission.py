@@ -11,6 +11,7 @@ class QuizAttempt(db.Model):
     class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=True)
     
     score = db.Column(db.Float, nullable=False) # e.g. 85.0
+    difficulty = db.Column(db.String(20), nullable=True) # easy / medium / hard, if the client sent it
     started_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -29,6 +30,7 @@ class QuizAttempt(db.Model):
             "quiz_id": self.quiz_id,
             "class_id": self.class_id,
             "score": self.score,
+            "difficulty": self.difficulty,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "answers": [a.to_dict() for a in self.answers]
@@ -0,0 +1,90 @@
+"""Single-file store for named NumPy arrays that loads by memory-mapping.
+
+Layout: an 8-byte magic, an 8-byte little-endian header length, a JSON header
+({"meta": ..., "arrays": {name: {"dtype", "shape", "offset"}}}) and then the raw
+array bytes, each starting on a 64-byte boundary. `load_arrays` maps the file
+once (read-only) and returns zero-copy views into it, so every process that
+loads the same file shares its pages through the OS page cache instead of
+holding a private copy.
+
+Only plain numeric / fixed-width string dtypes are stored; object arrays are
+rejected so nothing is ever unpickled.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"ASFYARR1"
+_ALIGN = 64
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+def save_arrays(path: str, arrays: Mapping[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> str:
+    """Write `arrays` (and JSON-serialisable `meta`) to `path` atomically."""
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise TypeError(f"array {name!r} has object dtype; only plain dtypes can be stored")
+
+    specs = {}
+    offset = 0
+    for name, a in arrays.items():
+        specs[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({"meta": meta or {}, "arrays": specs}).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    # A unique temp file per writer, so concurrent saves of the same path cannot interleave
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack("<Q", len(header)))
+            fh.write(header)
+            for name, a in arrays.items():
+                fh.seek(data_start + specs[name]["offset"])
+                fh.write(a.tobytes())
+            fh.truncate(data_start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def load_arrays(path: str, mmap_mode: bool = True) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Return ({name: read-only array}, meta) for a file written by `save_arrays`.
+
+    With mmap_mode the arrays are views into a shared read-only mapping of the
+    file; otherwise the file is read into private memory.
+    """
+    with open(path, "rb") as fh:
+        if mmap_mode:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = fh.read()
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not an array store file")
+    (header_len,) = struct.unpack("<Q", buf[len(MAGIC):len(MAGIC) + 8])
+    header = json.loads(bytes(buf[len(MAGIC) + 8:len(MAGIC) + 8 + header_len]))
+    data_start = _aligned(len(MAGIC) + 8 + header_len)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        a = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + spec["offset"])
+        arrays[name] = a.reshape(shape)
+    return arrays, header["meta"]
@@ -0,0 +1,44 @@
+"""Benchmark `aggregate_features` against the per-group reference loop.
+
+Usage:
+  python -m ml.benchmarks.bench_aggregate
+  python -m ml.benchmarks.bench_aggregate --sizes 10000 100000 1000000 --loop-max 100000
+
+Attempts come from `ml.synthetic.generate_attempts`. Prints one line per row count with wall time of each implementation and the speedup.
+The loop is only timed up to `--loop-max` rows since it grows with the number of groups.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from ml.pipeline import preprocess, aggregate_features, _aggregate_features_loop
+from ml.synthetic import generate_attempts
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--loop-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'groups':>8} {'vectorized_s':>13} {'loop_s':>9} {'speedup':>8}")
+    for n_rows in args.sizes:
+        df = preprocess(generate_attempts(n_rows, n_topics=20))
+        vec = _timed(aggregate_features, df)
+        groups = df.groupby(["student_id", "topic"]).ngroups
+        if n_rows <= args.loop_max:
+            loop = _timed(_aggregate_features_loop, df)
+            print(f"{n_rows:>10} {groups:>8} {vec:>13.3f} {loop:>9.3f} {loop / vec:>7.1f}x")
+        else:
+            print(f"{n_rows:>10} {groups:>8} {vec:>13.3f} {'-':>9} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare full KMeans with the streaming mini-batch clusterer.
+
+Usage:
+  python -m ml.benchmarks.bench_clustering --sizes 10000 100000 1000000
+
+Feature rows are drawn around a few well-separated profiles. For each size it
+reports fit wall time and throughput, the inertia of the mini-batch solution
+relative to full KMeans (1.00 = equally tight clusters), and the adjusted Rand
+index between the two labelings.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from ml.clustering import assign_clusters, cluster_matrix, fit_streaming_clusters
+from ml.pipeline import cluster_students
+from ml.synthetic import generate_cluster_features
+
+
+def _inertia(X: np.ndarray, labels: np.ndarray, centroids: np.ndarray) -> float:
+    return float(((X - centroids[labels]) ** 2).sum())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'full_s':>8} {'mini_s':>8} {'mini_rows/s':>12} {'inertia_ratio':>14} {'ari':>6}")
+    for n_rows in args.sizes:
+        feats = generate_cluster_features(n_rows)
+        X = cluster_matrix(feats)
+
+        start = time.perf_counter()
+        km, full = cluster_students(feats)
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mbk = fit_streaming_clusters(feats, batch_size=args.batch_size)
+        labels = assign_clusters(feats, mbk)
+        mini_s = time.perf_counter() - start
+
+        ratio = _inertia(X, labels, mbk.cluster_centers_) / km.inertia_
+        ari = adjusted_rand_score(full["cluster"], labels)
+        print(f"{n_rows:>10} {full_s:>8.2f} {mini_s:>8.2f} {n_rows / mini_s:>12,.0f} {ratio:>14.3f} {ari:>6.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark JSON extraction from large model responses.
+
+Usage:
+  python -m ml.benchmarks.bench_json_extract --items 20000
+
+Compares the old `generate_json` fallback (json.loads, then a greedy
+`\\{.*\\}` regex) with `ml.json_extract.extract_json` on responses of a few MB:
+clean JSON, JSON in a code fence with prose and stray braces around it, a
+truncated answer, and a run of unmatched braces (the regex's worst case). Each
+row reports seconds per call and whether the parser recovered the expected
+value ("ok"), something else ("wrong") or nothing ("fail").
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict
+
+from ml.json_extract import extract_json
+
+
+def old_extract(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except Exception:
+        m = re.search(r"(\{.*\})", text, re.S)
+        if m:
+            try:
+                return json.loads(m.group(1))
+            except Exception:
+                pass
+    raise ValueError("Could not parse JSON from model response")
+
+
+def make_cases(n_items: int, n_braces: int) -> Dict[str, tuple]:
+    items = [{"index": i, "answer": f"Because option {i % 4} {{fits}} the \"passage\".",
+              "options": [f"opt {k}" for k in range(4)], "correct_answer": "opt 1", "hint": "Reread."}
+             for i in range(n_items)]
+    payload = {"items": items}
+    body = json.dumps(payload, indent=1)
+    cut = body[:int(len(body) * 0.97)]
+    return {
+        "clean": (body, payload),
+        "fenced+prose": (f"Here are the items you asked for:\n```json\n{body}\n```\nLet me know {{if}} you need more.",
+                         payload),
+        "truncated": (cut, {"items": extract_json(cut)["items"]}),
+        "unmatched{": ("{" * n_braces + " no closing brace", None),
+    }
+
+
+def _time(fn: Callable[[str], Any], text: str, expected: Any, repeat: int) -> tuple:
+    best, outcome = float("inf"), "fail"
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            value = fn(text)
+            outcome = "ok" if value == expected else "wrong"
+        except ValueError:
+            outcome = "fail" if expected is not None else "ok"
+        best = min(best, time.perf_counter() - start)
+    return best, outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--braces", type=int, default=20_000, help="length of the unmatched-brace case")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'case':<14} {'MB':>6} {'old_s':>9} {'old':>6} {'new_s':>9} {'new':>6}")
+    for name, (text, expected) in make_cases(args.items, args.braces).items():
+        old_s, old_ok = _time(old_extract, text, expected, args.repeat)
+        new_s, new_ok = _time(extract_json, text, expected, args.repeat)
+        print(f"{name:<14} {len(text) / 2**20:>6.2f} {old_s:>9.4f} {old_ok:>6} {new_s:>9.4f} {new_ok:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark batched per-topic mastery scoring against the per-row loop.
+
+Usage:
+  python -m ml.benchmarks.bench_mastery --students 500 --topics 20
+
+Trains per-topic models into a temporary directory, then scores every
+(student, topic) row once via `predict_topic_mastery`-style single-row calls and
+once with `predict_topic_mastery_batch`. Models are served from a warm
+`ModelRegistry` in both cases, so the numbers compare only the scoring path.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from ml.model_registry import ModelRegistry
+from ml.pipeline import aggregate_features, preprocess
+from ml.synthetic import generate_attempts
+from ml.topic_models import FEATURE_COLUMNS, predict_topic_mastery_batch, train_per_topic_models
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--loop-rows", type=int, default=2000, help="rows scored by the slow loop (extrapolated)")
+    args = parser.parse_args()
+
+    raw = generate_attempts(args.students * args.topics * 8, n_students=args.students, n_topics=args.topics)
+    agg = aggregate_features(preprocess(raw))
+    with tempfile.TemporaryDirectory() as model_dir:
+        train_per_topic_models(agg, model_dir=model_dir)
+        registry = ModelRegistry(model_dir)
+        registry.preload()
+
+        sample = agg.head(args.loop_rows)
+        start = time.perf_counter()
+        loop = []
+        for row in sample.to_dict("records"):
+            model = registry.get(row["topic"])
+            X = np.array([[row.get(c, 0.0) for c in FEATURE_COLUMNS]])
+            loop.append(float(model.predict_proba(X)[0, list(model.classes_).index(1)]) if 1 in model.classes_ else 0.0)
+        loop_s = (time.perf_counter() - start) * len(agg) / len(sample)
+
+        start = time.perf_counter()
+        batch = predict_topic_mastery_batch(agg, registry)
+        batch_s = time.perf_counter() - start
+
+    np.testing.assert_allclose(batch["mastery_probability"].to_numpy()[:len(loop)], loop)
+    print(f"rows={len(agg)} topics={agg['topic'].nunique()}")
+    print(f"per-row loop (extrapolated): {loop_s:8.2f}s")
+    print(f"batched:                     {batch_s:8.3f}s  ({loop_s / batch_s:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
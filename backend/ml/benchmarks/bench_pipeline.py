@@ -0,0 +1,170 @@
+"""Scaling benchmark of the whole ML pipeline on synthetic attempt logs.
+
+Usage:
+  python -m ml.benchmarks.bench_pipeline
+  python -m ml.benchmarks.bench_pipeline --sizes 10000 100000 1000000 10000000 --output results.json
+
+For every size a log is generated with `ml.synthetic` and written to CSV (not
+timed). A fresh child process then runs load_data -> preprocess ->
+aggregate_features -> cluster_students -> train_topic_classifier ->
+predict_mastery, so one size's memory never inflates the next. Each stage
+records wall and CPU seconds, rows in/out, the RSS before the stage and the
+peak RSS while it ran (sampled from /proc every few ms; on platforms without
+/proc the process-wide ru_maxrss is used). The results plus environment info
+are written to a JSON file that later runs can be compared against.
+
+`--train-rows` caps the (student, topic) rows the classifier is trained on
+(sampled with the run seed), since a 200-tree forest on millions of rows is a
+different benchmark; the cap is recorded in the results.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from ml.pipeline import (aggregate_features, cluster_students, load_data, predict_mastery, preprocess,
+                         train_topic_classifier)
+from ml.synthetic import write_attempts
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else 0.0
+
+
+def _current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _maxrss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 1024
+
+
+class _PeakRss:
+    """Track the peak RSS of this process while the block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.before = self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss_mb() or 0.0)
+
+    def __enter__(self) -> "_PeakRss":
+        now = _current_rss_mb()
+        if now is None:
+            self._thread = None
+            self.before = self.peak = _maxrss_mb()
+            return self
+        self.before = self.peak = now
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is None:
+            self.peak = _maxrss_mb()
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss_mb() or 0.0)
+
+
+def _stage(records: List[Dict[str, Any]], name: str, n_rows: int, fn: Callable, *args, rows_in: int = 0):
+    with _PeakRss() as rss:
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            out = fn(*args)
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    frame = out[1] if isinstance(out, tuple) else out
+    records.append({
+        "rows": n_rows,
+        "stage": name,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "rows_in": rows_in,
+        "rows_out": len(frame) if isinstance(frame, pd.DataFrame) else None,
+        "rss_before_mb": round(rss.before, 1),
+        "peak_rss_mb": round(rss.peak, 1),
+    })
+    return out
+
+
+def run_size(csv_path: str, n_rows: int, train_rows: Optional[int], seed: int) -> List[Dict[str, Any]]:
+    """Run every pipeline stage once on `csv_path` and return one record per stage."""
+    records: List[Dict[str, Any]] = []
+    raw = _stage(records, "load_data", n_rows, load_data, csv_path)
+    df = _stage(records, "preprocess", n_rows, preprocess, raw, rows_in=len(raw))
+    del raw
+    agg = _stage(records, "aggregate_features", n_rows, aggregate_features, df, rows_in=len(df))
+    del df
+    _stage(records, "cluster_students", n_rows, cluster_students, agg, rows_in=len(agg))
+    train = agg if not train_rows or len(agg) <= train_rows else agg.sample(train_rows, random_state=seed)
+    models = _stage(records, "train_topic_classifier", n_rows, train_topic_classifier, train, rows_in=len(train))
+    _stage(records, "predict_mastery", n_rows, predict_mastery, models, agg, rows_in=len(agg))
+    return records
+
+
+def _environment(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "seed": args.seed,
+        "train_rows": args.train_rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--output", default="bench_pipeline.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--train-rows", type=int, default=200_000)
+    parser.add_argument("--workdir", default=None, help="where to write the generated CSVs (default: a temp dir)")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for n_rows in args.sizes:
+            csv_path = os.path.join(workdir, f"attempts_{n_rows}.csv")
+            write_attempts(csv_path, n_rows, seed=args.seed)
+            with ctx.Pool(1) as pool:
+                records = pool.apply(run_size, (csv_path, n_rows, args.train_rows, args.seed))
+            os.remove(csv_path)
+            for r in records:
+                print(f"{r['rows']:>10} {r['stage']:<24} {r['wall_s']:>9.3f}s {r['peak_rss_mb']:>9.1f}MB")
+            results.extend(records)
+            # Write after every size so a long run still leaves partial results
+            with open(args.output, "w", encoding="utf-8") as fh:
+                json.dump({"environment": _environment(args), "results": results}, fh, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Benchmark `preprocess` in default and compact mode.
+
+Usage:
+  python -m ml.benchmarks.bench_preprocess --sizes 100000 1000000
+
+Reports wall time, tracemalloc peak during the call and the deep memory usage of
+the resulting frame for each mode.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from ml.pipeline import preprocess
+from ml.synthetic import generate_attempts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'mode':>8} {'wall_s':>8} {'peak_mb':>9} {'result_mb':>10}")
+    for n_rows in args.sizes:
+        raw = generate_attempts(n_rows, n_topics=20)
+        for compact in (False, True):
+            tracemalloc.start()
+            start = time.perf_counter()
+            out = preprocess(raw, compact=compact)
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            size = out.memory_usage(deep=True).sum() / 2**20
+            mode = "compact" if compact else "default"
+            print(f"{n_rows:>10} {mode:>8} {wall:>8.3f} {peak:>9.1f} {size:>10.1f}")
+            del out
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Throughput / tail-latency benchmark of quiz generation against the fake Gemini.
+
+Usage:
+  python -m ml.benchmarks.bench_quiz_gen
+  python -m ml.benchmarks.bench_quiz_gen --latency lognormal --latency-ms 800 --error-rate 0.02 \\
+      --uploads 40 --clients 4 --modes sequential concurrent batched task --http
+
+Each "upload" is what `upload_material` does after text extraction: chunk a
+document into 150-word chunks and call `generate_quiz_from_chunks` for
+`--questions` items. Mode `task` runs `ml.tasks.process_uploaded_file` on the
+same document instead. `--clients` uploads run at once. The model is
+`ml.fake_gemini` with the given latency / failure injection, in process or
+over HTTP (`--http`), so runs are offline and the per-call draws are seeded.
+Reported per mode: upload latency p50/p95/p99/max, uploads per second, model
+calls made and how many of the requested questions were missing (chunks the
+model failed on are left out, and an upload still rate limited after the
+retries returns nothing).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ml import fake_gemini
+from ml.rate_limit import RateLimitError
+from ml.train import quiz_gen
+from ml.train.quiz_gen import chunk_text, generate_quiz_from_chunks
+
+_WORDS = ("cell energy light plant water carbon process membrane protein growth structure system "
+          "function transfer reaction molecule organism layer signal pattern").split()
+
+
+def make_document(n_words: int, seed: int) -> str:
+    rng = np.random.default_rng(seed)
+    words = rng.choice(_WORDS, n_words)
+    sentences = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, n_words, 12)]
+    return " ".join(sentences)
+
+
+def _upload(mode: str, text: str, args: argparse.Namespace, workdir: str, i: int) -> List[Dict[str, Any]]:
+    if mode == "task":
+        from ml.tasks import process_uploaded_file
+
+        path = os.path.join(workdir, f"upload_{i}.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        return process_uploaded_file(path, f"doc {i}", teacher_id=1, num_questions=args.questions).get("quiz", [])
+    return generate_quiz_from_chunks(
+        chunk_text(text, max_words=150),
+        num_questions=args.questions,
+        max_workers=1 if mode == "sequential" else args.concurrency,
+        batch_tokens=args.batch_tokens if mode == "batched" else 0,
+        min_chars=50,
+    )
+
+
+def run_mode(mode: str, args: argparse.Namespace, config: fake_gemini.FakeGeminiConfig) -> Dict[str, Any]:
+    model = fake_gemini.FakeGeminiModel(config)
+    server = None
+    if args.http:
+        server, url = fake_gemini.start_server(model)
+        target = fake_gemini.FakeGeminiHTTPClient(url)
+    else:
+        target = model
+    # The shared client is what quiz_gen and ml.tasks call; this process only runs the benchmark
+    client = fake_gemini.install(target)
+    client.limiter = None
+    client.max_retries = args.retries
+
+    docs = [make_document(args.words, seed=i) for i in range(args.uploads)]
+    latencies: List[float] = []
+    missing = 0
+
+    def one(i: int) -> None:
+        nonlocal missing
+        start = time.perf_counter()
+        try:
+            items = _upload(mode, docs[i], args, workdir, i)
+        except RateLimitError:
+            items = []
+        latencies.append(time.perf_counter() - start)
+        missing += args.questions - len(items)
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                list(pool.map(one, range(args.uploads)))
+            wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    lat = np.array(latencies)
+    return {
+        "mode": mode,
+        "p50": float(np.percentile(lat, 50)),
+        "p95": float(np.percentile(lat, 95)),
+        "p99": float(np.percentile(lat, 99)),
+        "max": float(lat.max()),
+        "uploads_per_s": args.uploads / wall,
+        "model_calls": model.stats()["calls"],
+        "missing": missing,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["sequential", "concurrent", "batched"],
+                        choices=["sequential", "concurrent", "batched", "task"])
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=2, help="uploads running at the same time")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--words", type=int, default=2000, help="words per uploaded document")
+    parser.add_argument("--concurrency", type=int, default=quiz_gen.DEFAULT_CONCURRENCY)
+    parser.add_argument("--batch-tokens", type=int, default=quiz_gen.DEFAULT_BATCH_TOKENS)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--http", action="store_true", help="talk to the fake over HTTP instead of in process")
+    parser.add_argument("--latency", choices=fake_gemini.LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = fake_gemini.FakeGeminiConfig(
+        latency=args.latency, latency_ms=args.latency_ms, latency_spread=args.latency_spread,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, truncate_rate=args.truncate_rate,
+        retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f"{'mode':<12} {'p50_s':>8} {'p95_s':>8} {'p99_s':>8} {'max_s':>8} {'uploads/s':>10} {'calls':>7} {'missing':>8}")
+    for mode in args.modes:
+        r = run_mode(mode, args, config)
+        print(f"{r['mode']:<12} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['p99']:>8.3f} {r['max']:>8.3f} "
+              f"{r['uploads_per_s']:>10.2f} {r['model_calls']:>7} {r['missing']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Mini-batch student clustering that can be updated as new feature rows arrive.
+
+`pipeline.cluster_students` refits a full KMeans over the whole feature matrix on
+every run. The functions here fit a `MiniBatchKMeans` from a stream of feature
+batches (a frame, or any iterable of frames such as `iter_attempt_chunks` output
+run through the aggregation), so at most one batch is held at a time. They also
+`partial_fit` later batches into an existing model and persist it, so new
+students are assigned to the nearest saved centroid without refitting.
+
+The saved model lives at ML_CLUSTER_MODEL_PATH (default
+`ml/models/student_clusters.joblib`, which is gitignored).
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Iterable, Iterator, Optional, Union
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+
+CLUSTER_FEATURES = ["accuracy_mean", "avg_time_mean", "improvement_slope"]
+DEFAULT_BATCH_SIZE = 4096
+
+CLUSTER_MODEL_PATH = os.getenv("ML_CLUSTER_MODEL_PATH",
+                               os.path.join(os.path.dirname(__file__), "models", "student_clusters.joblib"))
+
+FeatureSource = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+def cluster_matrix(features_df: pd.DataFrame) -> np.ndarray:
+    """The matrix `cluster_students` clusters on: CLUSTER_FEATURES with NaN as 0."""
+    return features_df[CLUSTER_FEATURES].fillna(0.0).to_numpy(dtype=float)
+
+
+def iter_feature_batches(source: FeatureSource, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[np.ndarray]:
+    """Yield cluster matrices of at most `batch_size` rows from a frame or an iterable of frames."""
+    frames = [source] if isinstance(source, pd.DataFrame) else source
+    for frame in frames:
+        for start in range(0, len(frame), batch_size):
+            yield cluster_matrix(frame.iloc[start:start + batch_size])
+
+
+def new_clusterer(n_clusters: int = 3, batch_size: int = DEFAULT_BATCH_SIZE, random_state: int = 0) -> MiniBatchKMeans:
+    return MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, n_init=3, random_state=random_state)
+
+
+def partial_fit_clusters(model: MiniBatchKMeans, source: FeatureSource,
+                         batch_size: Optional[int] = None) -> MiniBatchKMeans:
+    """Fold feature rows into `model` batch by batch.
+
+    The first `partial_fit` call needs at least `n_clusters` rows, so small
+    leading batches are buffered until that many have arrived.
+    """
+    batch_size = batch_size or model.batch_size
+    pending = []
+    n_pending = 0
+    for X in iter_feature_batches(source, batch_size):
+        if not hasattr(model, "cluster_centers_"):
+            pending.append(X)
+            n_pending += len(X)
+            if n_pending < model.n_clusters:
+                continue
+            X = np.vstack(pending)
+            pending = []
+        model.partial_fit(X)
+    if pending:
+        raise ValueError(f"need at least {model.n_clusters} feature rows to initialise the clusters, got {n_pending}")
+    return model
+
+
+def fit_streaming_clusters(source: FeatureSource, n_clusters: int = 3,
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> MiniBatchKMeans:
+    """Fit a fresh mini-batch model from `source` in a single streaming pass."""
+    return partial_fit_clusters(new_clusterer(n_clusters, batch_size), source)
+
+
+def assign_clusters(features_df: pd.DataFrame, model_or_centroids) -> np.ndarray:
+    """Label each row with its nearest centroid (no refit)."""
+    centroids = getattr(model_or_centroids, "cluster_centers_", model_or_centroids)
+    centroids = np.asarray(centroids, dtype=float)
+    X = cluster_matrix(features_df)
+    # ||x - c||^2 without the ||x||^2 term, which is the same for every centroid
+    dist = (centroids ** 2).sum(axis=1) - 2.0 * X @ centroids.T
+    return dist.argmin(axis=1)
+
+
+def save_clusterer(model: MiniBatchKMeans, path: Optional[str] = None) -> str:
+    """Persist the model (centroids and per-centroid counts) so later runs can keep partial-fitting it."""
+    path = path or CLUSTER_MODEL_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-", suffix=".joblib")
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def load_clusterer(path: Optional[str] = None) -> MiniBatchKMeans:
+    path = path or CLUSTER_MODEL_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return joblib.load(path)
+
+
+def update_saved_clusters(source: FeatureSource, n_clusters: int = 3, batch_size: int = DEFAULT_BATCH_SIZE,
+                          path: Optional[str] = None) -> MiniBatchKMeans:
+    """Partial-fit `source` into the saved model (a fresh one if none is saved yet) and save it back.
+
+    A saved model with a different `n_clusters` is replaced by a fresh fit.
+    """
+    try:
+        model = load_clusterer(path)
+    except FileNotFoundError:
+        model = None
+    if model is None or model.n_clusters != n_clusters:
+        model = new_clusterer(n_clusters, batch_size)
+    partial_fit_clusters(model, source, batch_size)
+    save_clusterer(model, path)
+    return model
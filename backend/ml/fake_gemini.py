@@ -0,0 +1,317 @@
+"""Local stand-in for the Gemini API, for offline load tests and benchmarks.
+
+`FakeGeminiModel` has the `generate_text(model=..., prompt=...)` shape that
+`GeminiClient` calls, and answers every prompt this codebase sends with
+schema-valid JSON:
+- the single-question prompt from `quiz_gen`;
+- the numbered multi-question prompt from `generate_quiz_batch`;
+- the `build_quiz_prompt` quiz used by `ml.tasks`.
+Anything else gets plain text. `FakeGeminiConfig` injects:
+- latency, drawn from a fixed, uniform, lognormal or pareto distribution;
+- server errors (500);
+- rate-limit errors (429 with a retry-after), either at a random rate or
+  from a server-side requests-per-minute quota;
+- truncated JSON.
+Draws are seeded per (seed, prompt, n-th time that prompt was seen), so a run
+is reproducible regardless of thread scheduling.
+
+Use it in process:
+
+    from ml import fake_gemini
+    fake_gemini.install(fake_gemini.FakeGeminiModel(fake_gemini.FakeGeminiConfig(latency_ms=800)))
+
+or over HTTP (one JSON POST per call, keep-alive) from any process:
+
+    python -m ml.fake_gemini --port 8765 --latency lognormal --latency-ms 800 --error-rate 0.02
+    GEMINI_FAKE_URL=http://127.0.0.1:8765 flask run
+
+`GEMINI_FAKE=1` makes `GeminiClient` use an in-process model configured from
+the FAKE_GEMINI_* environment variables instead.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal", "pareto")
+
+
+@dataclass
+class FakeGeminiConfig:
+    latency: str = "fixed"
+    latency_ms: float = 0.0        # fixed value / median
+    latency_spread: float = 0.5    # uniform: +/- fraction; lognormal: sigma; pareto: shape is 1/spread
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    truncate_rate: float = 0.0
+    rpm: float = 0.0               # server-side quota; 0 = unlimited
+    retry_after: float = 1.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "FAKE_GEMINI_") -> "FakeGeminiConfig":
+        values = {}
+        for f in fields(cls):
+            raw = os.getenv(prefix + f.name.upper())
+            if raw is not None:
+                values[f.name] = raw if f.type == "str" else (int(raw) if f.type == "int" else float(raw))
+        return cls(**values)
+
+
+class FakeGeminiError(RuntimeError):
+    """Mimics an API error: `.code` is the HTTP status, `.retry_after` the hint in seconds."""
+
+    def __init__(self, code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _sample_latency(cfg: FakeGeminiConfig, rng: np.random.Generator) -> float:
+    """Seconds to sleep for one call."""
+    base = cfg.latency_ms / 1000.0
+    if base <= 0:
+        return 0.0
+    if cfg.latency == "uniform":
+        return base * rng.uniform(1 - cfg.latency_spread, 1 + cfg.latency_spread)
+    if cfg.latency == "lognormal":
+        return base * rng.lognormal(0.0, cfg.latency_spread)
+    if cfg.latency == "pareto":
+        # Heavy tail with the given median: x_m * 2**(1/a) = median
+        a = 1.0 / max(cfg.latency_spread, 1e-6)
+        return base / 2 ** (1 / a) * (1 + rng.pareto(a))
+    return base
+
+
+def _options(topic: str, k: int) -> Tuple[list, str]:
+    options = [f"{topic} option {i + 1}" for i in range(4)]
+    return options, options[k % 4]
+
+
+def fake_answer(prompt: str, rng: np.random.Generator) -> str:
+    """Schema-valid response text for the prompt shapes used in this codebase."""
+    numbered = re.findall(r"^\[(\d+)\] (.*)$", prompt, re.M)
+    if "Questions:\n" in prompt and numbered:
+        items = []
+        for idx, question in numbered:
+            options, correct = _options(question[:40], int(rng.integers(4)))
+            items.append({"index": int(idx), "answer": f"Because {correct} matches the passage.",
+                          "options": options, "correct_answer": correct, "hint": "Reread the passage."})
+        return json.dumps({"items": items})
+
+    n = re.search(r"Number of questions: (\d+)", prompt)
+    if n:
+        topic = (re.search(r"Topic: (.*)", prompt) or [None, "general"])[1]
+        difficulty = (re.search(r"Difficulty: (\w+)", prompt) or [None, "medium"])[1]
+        quiz = []
+        for i in range(int(n.group(1))):
+            options, correct = _options(topic, int(rng.integers(4)))
+            quiz.append({"question": f"Question {i + 1} about {topic}?", "choices": options,
+                         "answer": correct, "difficulty": difficulty})
+        return json.dumps({"quiz": quiz})
+
+    if "valid JSON" in prompt:
+        options, correct = _options("answer", int(rng.integers(4)))
+        return json.dumps({"answer": f"Because {correct} matches the passage.", "options": options,
+                           "correct_answer": correct, "hint": "Reread the passage."})
+
+    return "This passage explains its topic in a few sentences."
+
+
+class FakeGeminiModel:
+    """In-process fake with the `generate_text(model=..., prompt=...)` client shape."""
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None, sleep=time.sleep):
+        self.config = config or FakeGeminiConfig()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._seen: Dict[int, int] = {}
+        self._window: deque = deque()
+        self.counts = {"calls": 0, "ok": 0, "errors": 0, "rate_limited": 0, "truncated": 0}
+
+    def _rng(self, prompt: str) -> np.random.Generator:
+        h = zlib.crc32(prompt.encode("utf-8"))
+        with self._lock:
+            n = self._seen.get(h, 0)
+            self._seen[h] = n + 1
+        return np.random.default_rng([self.config.seed, h, n])
+
+    def _over_quota(self) -> bool:
+        if self.config.rpm <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0] >= 60.0:
+                self._window.popleft()
+            if len(self._window) >= self.config.rpm:
+                return True
+            self._window.append(now)
+            return False
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def complete(self, prompt: str) -> str:
+        """Return the response text for `prompt` or raise FakeGeminiError, after the sampled latency."""
+        cfg = self.config
+        rng = self._rng(prompt)
+        self._count("calls")
+        # Draw every random number up front so the outcome doesn't depend on which branch is taken
+        delay, u_limit, u_error, u_trunc, cut = (_sample_latency(cfg, rng), rng.random(), rng.random(),
+                                                  rng.random(), rng.uniform(0.3, 0.9))
+        if self._over_quota() or u_limit < cfg.rate_limit_rate:
+            self._count("rate_limited")
+            raise FakeGeminiError(429, "RESOURCE_EXHAUSTED: quota exceeded", retry_after=cfg.retry_after)
+        self._sleep(delay)
+        if u_error < cfg.error_rate:
+            self._count("errors")
+            raise FakeGeminiError(500, "INTERNAL: injected failure")
+        text = fake_answer(prompt, rng)
+        if u_trunc < cfg.truncate_rate:
+            self._count("truncated")
+            return text[:max(1, int(len(text) * cut))]
+        self._count("ok")
+        return text
+
+    def generate_text(self, model: Optional[str] = None, prompt: str = "", **kwargs) -> FakeResponse:
+        return FakeResponse(self.complete(prompt))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    model: FakeGeminiModel
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        try:
+            text = self.model.complete(payload.get("prompt", ""))
+        except FakeGeminiError as e:
+            headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else None
+            self._send(e.code, {"error": str(e)}, headers)
+            return
+        self._send(200, {"text": text})
+
+    def do_GET(self) -> None:
+        self._send(200, self.model.stats())
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_server(model: Optional[FakeGeminiModel] = None, host: str = "127.0.0.1",
+                 port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve `model` over HTTP from a daemon thread; returns (server, base_url). Call server.shutdown() to stop."""
+    handler = type("FakeGeminiHandler", (_Handler,), {"model": model or FakeGeminiModel()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+class FakeGeminiHTTPClient:
+    """Client for `start_server`, with the same `generate_text` shape; one keep-alive connection per thread."""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        url = urlparse(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def generate_text(self, model: Optional[str] = None, prompt: str = "", **kwargs) -> FakeResponse:
+        body = json.dumps({"model": model, "prompt": prompt})
+        conn = self._conn()
+        try:
+            conn.request("POST", "/generate", body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = json.loads(resp.read() or b"{}")
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if resp.status != 200:
+            retry = resp.getheader("Retry-After")
+            raise FakeGeminiError(resp.status, data.get("error", ""), float(retry) if retry else None)
+        return FakeResponse(data["text"])
+
+
+def client_from_env() -> Optional[Any]:
+    """The fake selected by GEMINI_FAKE_URL / GEMINI_FAKE=1, or None."""
+    if os.getenv("GEMINI_FAKE_URL"):
+        return FakeGeminiHTTPClient(os.environ["GEMINI_FAKE_URL"])
+    if os.getenv("GEMINI_FAKE", "0") == "1":
+        return FakeGeminiModel(FakeGeminiConfig.from_env())
+    return None
+
+
+def install(fake: Any, client: Any = None) -> Any:
+    """Point a GeminiClient (default: the shared `get_client()`) at `fake`, with its response cache off."""
+    if client is None:
+        from ml.genai import get_client
+        client = get_client()
+    client._client = fake
+    client.cache = None
+    return client
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake Gemini API over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    for f in fields(FakeGeminiConfig):
+        if f.name != "latency":
+            parser.add_argument("--" + f.name.replace("_", "-"), type=int if f.type == "int" else float,
+                                default=f.default)
+    args = parser.parse_args()
+    config = FakeGeminiConfig(**{f.name: getattr(args, f.name) for f in fields(FakeGeminiConfig)})
+    server, url = start_server(FakeGeminiModel(config), args.host, args.port)
+    print(f"fake Gemini listening on {url} ({config})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
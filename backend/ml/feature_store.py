@@ -0,0 +1,107 @@
+"""Running per-(student, topic) statistics for the mastery features.
+
+The record kept per (student, topic) has the same fields as a row of
+`pipeline.partial_aggregate`: counts, sums, the accuracy M2 (sum of squared
+deviations, updated with Welford's method), regression sums with time measured
+from the first attempt, and per-difficulty counts/sums. `update_stats` folds a
+single attempt into a record in O(1); `features_from_stats` turns any number of
+records into the `aggregate_features` columns without touching raw attempts.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Mapping, MutableMapping, Optional, Union
+
+import pandas as pd
+
+from ml.pipeline import DIFFICULTY_LEVELS, _PARTIAL_SUM_COLUMNS, finalize_partial_aggregates
+
+STATS_FIELDS = list(_PARTIAL_SUM_COLUMNS) + ["m2_finite", "x0", "x_max"]
+
+_COUNT_FIELDS = {f for f in STATS_FIELDS if f.startswith("n_")} | {"attempts_count"}
+
+
+def new_stats() -> Dict[str, Any]:
+    """Return an empty statistics record (x0/x_max stay None until the first attempt)."""
+    stats: Dict[str, Any] = {f: (0 if f in _COUNT_FIELDS else 0.0) for f in STATS_FIELDS}
+    stats["x0"] = None
+    stats["x_max"] = None
+    return stats
+
+
+def _epoch(ts: Union[datetime, float, int]) -> float:
+    if isinstance(ts, datetime):
+        # Naive datetimes are UTC, like pandas' Timestamp.timestamp()
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp()
+    return float(ts)
+
+
+def update_stats(
+    stats: MutableMapping[str, Any],
+    accuracy: float,
+    attempted_at: Union[datetime, float, int],
+    difficulty: Optional[str] = None,
+    avg_time: Optional[float] = None,
+) -> MutableMapping[str, Any]:
+    """Fold one attempt into `stats` in place and return it.
+
+    accuracy: correct / total for the attempt
+    attempted_at: datetime (naive = UTC) or epoch seconds
+    difficulty: "easy" | "medium" | "hard"; anything else only counts towards the totals
+    avg_time: seconds per question, or None when unknown
+    """
+    x = _epoch(attempted_at)
+    if stats.get("x0") is None:
+        stats["x0"] = x
+        stats["x_max"] = x
+    elif x < stats["x0"]:
+        # Re-base the regression sums onto the earlier origin
+        d = stats["x0"] - x
+        n = stats["attempts_count"]
+        stats["sxx"] += 2 * d * stats["sx"] + n * d * d
+        stats["sx"] += n * d
+        stats["sxy"] += d * stats["sum_finite"]
+        stats["x0"] = x
+    stats["x_max"] = max(stats["x_max"], x)
+    dx = x - stats["x0"]
+
+    stats["attempts_count"] += 1
+    stats["sx"] += dx
+    stats["sxx"] += dx * dx
+
+    if accuracy is not None and not math.isnan(accuracy):
+        stats["n_accuracy"] += 1
+        stats["sum_accuracy"] += accuracy
+        if difficulty in DIFFICULTY_LEVELS:
+            stats[f"n_{difficulty}"] += 1
+            stats[f"sum_{difficulty}"] += accuracy
+        if math.isfinite(accuracy):
+            n_old = stats["n_finite"]
+            mean_old = stats["sum_finite"] / n_old if n_old else 0.0
+            stats["n_finite"] = n_old + 1
+            stats["sum_finite"] += accuracy
+            mean_new = stats["sum_finite"] / stats["n_finite"]
+            stats["m2_finite"] += (accuracy - mean_old) * (accuracy - mean_new)
+            stats["sxy"] += dx * accuracy
+
+    if avg_time is not None and not math.isnan(avg_time):
+        stats["n_time"] += 1
+        stats["sum_time"] += avg_time
+
+    return stats
+
+
+def features_from_stats(records: Iterable[Mapping[str, Any]]) -> pd.DataFrame:
+    """Build the `aggregate_features` frame from stats records.
+
+    Each record needs `student_id` and `topic` next to the `STATS_FIELDS`.
+    """
+    state = pd.DataFrame([
+        {"student_id": r["student_id"], "topic": r["topic"], **{f: r[f] for f in STATS_FIELDS}}
+        for r in records
+        if r["attempts_count"]
+    ], columns=["student_id", "topic"] + STATS_FIELDS)
+    return finalize_partial_aggregates(state.astype({"x0": float, "x_max": float}))
@@ -0,0 +1,141 @@
+"""Array-backed inference for the trained RandomForest mastery models.
+
+`flatten_forest` copies every tree of a fitted `RandomForestClassifier` into a
+handful of contiguous arrays (feature, threshold, left, right, value) with the
+node ids of all trees concatenated. `FlatForest.predict_proba` walks all trees
+for a batch of rows at once with NumPy indexing: one step per tree level, no
+per-tree Python calls and no sklearn on the hot path. It mirrors the sklearn
+estimator API (`classes_`, `predict_proba`, `predict`), so it can stand in for
+the forest in `predict_mastery` or behind the model registry. Saved forests
+are memory-mapped on load, so worker processes share one copy of the arrays.
+
+Leaves point at themselves; each step only advances the (row, tree) pairs
+that are not on a leaf yet, so the work is the total path length. Inputs are cast to float32 before comparing against the
+thresholds, exactly like sklearn's tree traversal.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from ml.array_store import load_arrays, save_arrays
+
+FOREST_SUFFIX = ".forest"
+
+_BLOCK_CELLS = 1 << 20
+
+_ARRAYS = ["feature", "threshold", "left", "right", "value", "roots", "classes"]
+
+
+@dataclass
+class FlatForest:
+    feature: np.ndarray  # int32 (n_nodes,), 0 on leaves
+    threshold: np.ndarray  # float64 (n_nodes,)
+    left: np.ndarray  # int32 (n_nodes,), global node id, self on leaves
+    right: np.ndarray  # int32 (n_nodes,)
+    value: np.ndarray  # float64 (n_nodes, n_classes), class probabilities per node
+    roots: np.ndarray  # int32 (n_trees,), root node id of each tree
+    classes: np.ndarray
+    max_depth: int  # informational; traversal stops when every path is on a leaf
+    n_features: int
+    feature_names: Optional[np.ndarray] = None
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.classes
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node id per (row, tree), shape (n_rows, n_trees)."""
+        X = self._as_matrix(X)
+        n_trees = len(self.roots)
+        node = np.tile(self.roots, len(X))
+        row = np.repeat(np.arange(len(X)), n_trees)
+        is_leaf = self.left == np.arange(len(self.left))
+        # Only (row, tree) pairs that have not reached a leaf take the next step
+        active = np.flatnonzero(~is_leaf[node])
+        while active.size:
+            nd = node[active]
+            go_left = X[row[active], self.feature[nd]] <= self.threshold[nd]
+            nd = np.where(go_left, self.left[nd], self.right[nd])
+            node[active] = nd
+            active = active[~is_leaf[nd]]
+        return node.reshape(len(X), n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = self._as_matrix(X)
+        out = np.empty((len(X), len(self.classes)))
+        # Blocks bound the (rows, trees, classes) gather to a few MB
+        step = max(1, _BLOCK_CELLS // max(1, len(self.roots) * len(self.classes)))
+        for start in range(0, len(X), step):
+            out[start:start + step] = self.value[self.apply(X[start:start + step])].mean(axis=1)
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+    def _as_matrix(self, X) -> np.ndarray:
+        if self.feature_names is not None and hasattr(X, "columns"):
+            X = X[list(self.feature_names)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got {X.shape[1]}")
+        return X
+
+
+def flatten_forest(forest) -> FlatForest:
+    """Export a fitted RandomForestClassifier (single output) to a FlatForest."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in forest.estimators_:
+        tree = est.tree_
+        n = tree.node_count
+        ids = np.arange(n, dtype=np.int32) + offset
+        leaf = tree.children_left == -1
+        features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(leaf, ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, ids, tree.children_right + offset).astype(np.int32))
+        # value holds class weights (older sklearn) or fractions (newer); normalise to probabilities
+        v = tree.value[:, 0, :].astype(np.float64)
+        values.append(v / v.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    names = getattr(forest, "feature_names_in_", None)
+    classes = np.asarray(forest.classes_)
+    if classes.dtype == object:
+        classes = classes.astype(str)  # so the file loads without pickle
+    return FlatForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=classes,
+        max_depth=int(max_depth),
+        n_features=int(forest.n_features_in_),
+        feature_names=None if names is None else np.asarray(names, dtype=str),
+    )
+
+
+def save_flat_forest(flat: FlatForest, path: str) -> str:
+    """Write `flat` to a single array-store file (see `ml.array_store`)."""
+    arrays = {name: getattr(flat, name) for name in _ARRAYS}
+    if flat.feature_names is not None:
+        arrays["feature_names"] = flat.feature_names
+    return save_arrays(path, arrays, {"max_depth": flat.max_depth, "n_features": flat.n_features})
+
+
+def load_flat_forest(path: str, mmap_mode: bool = True) -> FlatForest:
+    """Load a saved forest; by default its arrays are memory-mapped and shared across processes."""
+    arrays, meta = load_arrays(path, mmap_mode=mmap_mode)
+    names = arrays.pop("feature_names", None)
+    return FlatForest(max_depth=int(meta["max_depth"]), n_features=int(meta["n_features"]),
+                      feature_names=names, **arrays)
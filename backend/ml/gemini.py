@@ -1,6 +1,6 @@
 """Compatibility shim: re-export the Gemini client from `genai.py` as `gemini`.
 Some tests and modules import `ml.gemini`, so this keeps both names working.
 """
-from .genai import GeminiClient
+from .genai import GeminiClient, get_client
 
-__all__ = ["GeminiClient"]
+__all__ = ["GeminiClient", "get_client"]
@@ -6,35 +6,72 @@ exposes two convenience methods:
 - generate_json(prompt): attempts to parse JSON from the model's output
 
 The wrapper is intentionally small and resilient so tests can mock the methods easily.
+
+Responses are cached by (model, prompt, params) through `ml.llm_cache` (the
+process-wide cache unless `cache=` is given; `cache=None` disables it). Pass
+`use_cache=False` to a call to always hit the model.
+
+`get_client()` returns one shared, thread-safe client per (api key, model), so
+the underlying `genai.Client` and its HTTP connection pool are built once per
+process instead of once per question. `agenerate_text` / `agenerate_json` run
+a call in a worker thread for asyncio code, and `generate_many` runs several
+prompts concurrently under a cap.
+
+Model calls go through `ml.rate_limit`: the shared RPM/TPM limiter (when
+GEMINI_RPM / GEMINI_TPM are set) and retries with jittered backoff on 429 and
+transient server errors (GEMINI_MAX_RETRIES, default 4). A call that stays rate
+limited raises `RateLimitError` instead of a generic failure.
 """
 from __future__ import annotations
 
+import asyncio
 import os
-import json
-import re
-from typing import Any, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ml.json_extract import extract_json_partial
+from ml.llm_cache import cache_key, get_default_cache
+from ml.rate_limit import DEFAULT_OUTPUT_TOKENS, call_with_retries, estimate_tokens, get_default_limiter
+
+_DEFAULT = object()
+DEFAULT_MAX_CONCURRENCY = 4
 
 
 class GeminiClient:
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None, cache: Any = _DEFAULT,
+                 limiter: Any = _DEFAULT, max_retries: Optional[int] = None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model = model or os.getenv("GEMINI_MODEL", "gemini-3.5")
         self._client: Optional[Any] = None
+        self.cache = get_default_cache() if cache is _DEFAULT else cache
+        self.limiter = get_default_limiter() if limiter is _DEFAULT else limiter
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "4")) if max_retries is None else max_retries
+        self._client_lock = threading.Lock()
 
     def _get_client(self) -> Optional[Any]:
         if self._client is not None:
             return self._client
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._build_client()
+        return self._client
+
+    def _build_client(self) -> Optional[Any]:
+        # GEMINI_FAKE_URL / GEMINI_FAKE=1 select the offline stand-in from ml.fake_gemini
+        from ml.fake_gemini import client_from_env
+        fake = client_from_env()
+        if fake is not None:
+            return fake
         try:
             from google import genai  # type: ignore
 
             if not self.api_key:
                 # Client library might work without explicit key if running in GCP; still attach anyway
-                self._client = genai.Client()
-            else:
-                self._client = genai.Client(api_key=self.api_key)
+                return genai.Client()
+            return genai.Client(api_key=self.api_key)
         except Exception:
-            self._client = None
-        return self._client
+            return None
 
     def _extract_text_from_response(self, resp: Any) -> str:
         # Common response shapes from google genai or similar
@@ -50,39 +87,103 @@ class GeminiClient:
                 return first.content
         return str(resp)
 
-    def generate_text(self, prompt: str, **kwargs) -> str:
+    def generate_text(self, prompt: str, use_cache: bool = True, **kwargs) -> str:
         """Return model text for the prompt.
 
         Raises: RuntimeError if no client is available.
         """
+        key = None
+        if use_cache and self.cache is not None:
+            key = cache_key(self.model, prompt, kwargs)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
         client = self._get_client()
         if client is None:
             raise RuntimeError("No Gemini client available (missing dependency or API key)")
 
-        # Keep compatibility with a couple of client shapes
-        try:
-            resp = client.generate_text(model=self.model, prompt=prompt, **kwargs)
-        except TypeError:
-            # Some clients may expect different arg names or a single request object; try fallback
-            resp = client.generate_text(prompt)
+        def call():
+            if self.limiter is not None:
+                self.limiter.acquire(estimate_tokens(prompt) + int(kwargs.get("max_output_tokens", DEFAULT_OUTPUT_TOKENS)))
+            # Keep compatibility with a couple of client shapes
+            try:
+                return client.generate_text(model=self.model, prompt=prompt, **kwargs)
+            except TypeError:
+                # Some clients may expect different arg names or a single request object; try fallback
+                return client.generate_text(prompt)
+
+        resp = call_with_retries(call, max_retries=self.max_retries, limiter=self.limiter)
 
-        return self._extract_text_from_response(resp).strip()
+        text = self._extract_text_from_response(resp).strip()
+        if key is not None and text:
+            self.cache.set(key, text)
+        return text
 
-    def generate_json(self, prompt: str, **kwargs) -> dict:
+    def generate_json(self, prompt: str, use_cache: bool = True, **kwargs) -> dict:
         """Request a JSON object response and return parsed JSON.
 
-        If raw response is not valid JSON, attempt to extract a JSON object from the text.
-        Raises ValueError if JSON cannot be recovered.
+        If raw response is not valid JSON, the JSON is extracted from the text with
+        `ml.json_extract` (code fences, surrounding prose, trailing commas; a truncated
+        answer yields its complete items). Raises ValueError if JSON cannot be recovered.
+        Truncated or unparseable responses are dropped from the cache.
         """
-        text = self.generate_text(prompt, **kwargs)
+        # Only pass use_cache when set, so replacements of generate_text(prompt) still work
+        text = self.generate_text(prompt, **kwargs) if use_cache else self.generate_text(prompt, use_cache=False, **kwargs)
         try:
-            return json.loads(text)
-        except Exception:
-            # Try to extract the first {...} block
-            m = re.search(r"(\{.*\})", text, re.S)
-            if m:
-                try:
-                    return json.loads(m.group(1))
-                except Exception:
-                    pass
+            value, complete = extract_json_partial(text)
+        except ValueError:
+            value, complete = None, False
+        else:
+            if complete:
+                return value
+        # Don't keep a truncated/unparseable answer cached; a retry may get a full one
+        if use_cache and self.cache is not None:
+            self.cache.delete(cache_key(self.model, prompt, kwargs))
+        if value is not None:
+            return value
         raise ValueError("Could not parse JSON from model response")
+
+    async def agenerate_text(self, prompt: str, **kwargs) -> str:
+        """`generate_text` without blocking the event loop."""
+        return await asyncio.to_thread(self.generate_text, prompt, **kwargs)
+
+    async def agenerate_json(self, prompt: str, **kwargs) -> dict:
+        """`generate_json` without blocking the event loop."""
+        return await asyncio.to_thread(self.generate_json, prompt, **kwargs)
+
+    def generate_many(self, prompts: Sequence[str], as_json: bool = False,
+                      max_concurrency: int = DEFAULT_MAX_CONCURRENCY, **kwargs) -> List[Any]:
+        """Run several prompts concurrently (at most `max_concurrency` at once).
+
+        Returns one result per prompt, in order; a prompt that failed yields its
+        exception object instead of raising, so one bad call does not lose the rest.
+        """
+        call = self.generate_json if as_json else self.generate_text
+
+        def run(prompt: str) -> Any:
+            try:
+                return call(prompt, **kwargs)
+            except Exception as e:
+                return e
+
+        if max_concurrency <= 1 or len(prompts) <= 1:
+            return [run(p) for p in prompts]
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(prompts)), thread_name_prefix="gemini") as pool:
+            return list(pool.map(run, prompts))
+
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], GeminiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str] = None, model: Optional[str] = None) -> GeminiClient:
+    """Process-wide GeminiClient for (api_key, model), defaulting to the env settings."""
+    key = (api_key or os.getenv("GEMINI_API_KEY"), model or os.getenv("GEMINI_MODEL", "gemini-3.5"))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = GeminiClient(api_key=key[0], model=key[1])
+    return client
@@ -0,0 +1,233 @@
+"""Opt-in stage instrumentation for `ml.pipeline` and `ml.topic_models`.
+
+Public functions there are decorated with `@traced`. While tracing is off the
+wrapper is a single flag check before calling through. Once enabled, every
+call records a span: wall and CPU seconds, rows in (first DataFrame argument)
+and rows out (returned DataFrame/dict), the tracemalloc peak above the start
+when `memory=True`, and its parent span, so nested calls form a call tree.
+
+    from ml import instrument
+    with instrument.tracing("trace.json", memory=True):
+        run_nightly_pipeline()
+    print(instrument.summary())
+
+`write_trace` emits Chrome trace events (open in chrome://tracing or Perfetto
+for a flame chart); `folded_stacks` gives the collapsed-stack text that
+flamegraph.pl / speedscope read. Setting ML_TRACE=<path> enables tracing at
+import and writes the trace at exit, for runs that cannot be edited. With
+`log=True` each span is also logged as one JSON line on the "ml.instrument"
+logger.
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("ml.instrument")
+
+
+class _State:
+    enabled = False
+    memory = False
+    log = False
+    spans: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    local = threading.local()
+    started_tracemalloc = False
+
+
+_state = _State()
+
+
+def enable(memory: bool = False, log: bool = False) -> None:
+    """Start recording spans. memory=True also tracks tracemalloc peaks (slows allocation-heavy code)."""
+    _state.memory = memory
+    _state.log = log
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state.started_tracemalloc = True
+    _state.enabled = True
+
+
+def disable() -> None:
+    _state.enabled = False
+    if _state.started_tracemalloc:
+        tracemalloc.stop()
+        _state.started_tracemalloc = False
+
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+
+def reset() -> None:
+    with _state.lock:
+        _state.spans = []
+
+
+def get_spans() -> List[Dict[str, Any]]:
+    with _state.lock:
+        return list(_state.spans)
+
+
+def _rows(value: Any) -> Optional[int]:
+    if isinstance(value, tuple):
+        counts = [_rows(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return counts[-1] if counts else None
+    if hasattr(value, "shape") and hasattr(value, "columns"):  # DataFrame
+        return int(value.shape[0])
+    if isinstance(value, dict):
+        return len(value)
+    return None
+
+
+def _rows_in(args: tuple, kwargs: dict) -> Optional[int]:
+    for value in list(args) + list(kwargs.values()):
+        if hasattr(value, "shape") and hasattr(value, "columns"):
+            return int(value.shape[0])
+    return None
+
+
+@contextlib.contextmanager
+def span(name: str, rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Record a span around a block; set `record["rows_out"]` inside to report output rows."""
+    if not _state.enabled:
+        yield {}
+        return
+    stack = getattr(_state.local, "stack", None)
+    if stack is None:
+        stack = _state.local.stack = []
+    parent = stack[-1] if stack else None
+    record: Dict[str, Any] = {
+        "name": name,
+        "path": f"{parent['path']};{name}" if parent else name,
+        "depth": len(stack),
+        "thread": threading.get_ident(),
+        "rows_in": rows_in,
+        "rows_out": None,
+    }
+    memory = _state.memory and tracemalloc.is_tracing()
+    if memory:
+        # Child spans reset the peak, so fold what the parent saw so far into it first
+        if parent is not None:
+            parent["_peak"] = max(parent.get("_peak", 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        record["_base"] = tracemalloc.get_traced_memory()[0]
+        record["_peak"] = 0
+    stack.append(record)
+    start_ts, wall0, cpu0 = time.time(), time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall0
+        record["cpu_s"] = time.process_time() - cpu0
+        record["start"] = start_ts
+        stack.pop()
+        if memory and tracemalloc.is_tracing():
+            peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+            record["peak_mb"] = max(0, peak - record.pop("_base")) / 2**20
+            if parent is not None:
+                parent["_peak"] = max(parent.get("_peak", 0), peak)
+        with _state.lock:
+            _state.spans.append(record)
+        if _state.log:
+            logger.info(json.dumps(record, default=str))
+
+
+def traced(fn: Callable) -> Callable:
+    """Decorator: record a span per call while tracing is enabled."""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return fn(*args, **kwargs)
+        with span(name, _rows_in(args, kwargs)) as record:
+            result = fn(*args, **kwargs)
+            record["rows_out"] = _rows(result)
+            return result
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def tracing(path: Optional[str] = None, memory: bool = False, log: bool = False) -> Iterator[None]:
+    """Enable tracing for a block, then write the trace to `path` (if given) and disable."""
+    reset()
+    enable(memory=memory, log=log)
+    try:
+        yield
+    finally:
+        disable()
+        if path:
+            write_trace(path)
+
+
+def write_trace(path: str, spans: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Write spans as Chrome trace events ("X" complete events, microseconds)."""
+    spans = get_spans() if spans is None else spans
+    pid = os.getpid()
+    events = []
+    for s in spans:
+        args = {k: s[k] for k in ("cpu_s", "rows_in", "rows_out", "peak_mb") if s.get(k) is not None}
+        events.append({"name": s["name"], "ph": "X", "pid": pid, "tid": s["thread"],
+                       "ts": s["start"] * 1e6, "dur": s["wall_s"] * 1e6, "args": args})
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+    return path
+
+
+def _self_times(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Wall seconds per call path, excluding time spent in child spans."""
+    total: Dict[str, float] = {}
+    for s in spans:
+        total[s["path"]] = total.get(s["path"], 0.0) + s["wall_s"]
+    self_time = dict(total)
+    for path, seconds in total.items():
+        parent, sep, _ = path.rpartition(";")
+        if sep and parent in self_time:
+            self_time[parent] -= seconds
+    return self_time
+
+
+def folded_stacks(spans: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Collapsed stacks ("a;b;c <self microseconds>" per line) for flamegraph tools."""
+    spans = get_spans() if spans is None else spans
+    lines = [f"{path} {max(0, int(round(seconds * 1e6)))}" for path, seconds in sorted(_self_times(spans).items())]
+    return "\n".join(lines)
+
+
+def summary(spans: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Per-function table (calls, total/self wall, CPU, rows, peak memory), slowest first."""
+    spans = get_spans() if spans is None else spans
+    self_by_path = _self_times(spans)
+    rows: Dict[str, Dict[str, float]] = {}
+    for s in spans:
+        r = rows.setdefault(s["name"], {"calls": 0, "wall": 0.0, "self": 0.0, "cpu": 0.0, "rows_in": 0, "peak": 0.0})
+        r["calls"] += 1
+        r["wall"] += s["wall_s"]
+        r["cpu"] += s["cpu_s"]
+        r["rows_in"] += s.get("rows_in") or 0
+        r["peak"] = max(r["peak"], s.get("peak_mb") or 0.0)
+    for path, seconds in self_by_path.items():
+        rows[path.rsplit(";", 1)[-1]]["self"] += seconds
+
+    lines = [f"{'function':<52} {'calls':>6} {'wall_s':>9} {'self_s':>9} {'cpu_s':>9} {'rows_in':>10} {'peak_mb':>8}"]
+    for name, r in sorted(rows.items(), key=lambda kv: kv[1]["wall"], reverse=True):
+        lines.append(f"{name:<52} {r['calls']:>6} {r['wall']:>9.3f} {r['self']:>9.3f} {r['cpu']:>9.3f} "
+                     f"{int(r['rows_in']):>10} {r['peak']:>8.1f}")
+    return "\n".join(lines)
+
+
+if os.getenv("ML_TRACE"):
+    enable(memory=os.getenv("ML_TRACE_MEMORY", "0") == "1")
+    atexit.register(lambda: write_trace(os.environ["ML_TRACE"]))
@@ -0,0 +1,178 @@
+"""Linear-time extraction of JSON from free-form model responses.
+
+Models wrap JSON in markdown fences, add prose before or after it (sometimes
+with braces of its own), leave trailing commas, or stop mid-answer at the
+output limit. `extract_json` handles all of these in one left-to-right pass:
+
+- the body of the first ``` fence is tried before the raw text;
+- top-level `{...}` / `[...]` spans are found by a scanner that jumps between
+  structural characters with a regex. It skips whole string literals, escapes
+  included, so braces inside strings don't count. Quotes outside any
+  container are ignored, so prose like `5" screen` cannot derail it;
+- a span that does not parse is retried with trailing commas removed;
+- if the text ends inside a value, the scanner's checkpoints (after each
+  complete array item or top-level member) are closed and parsed from the
+  last one backwards, which recovers every complete item of a truncated array.
+
+Parsing goes through orjson when it is installed, else the stdlib json.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+
+    def _loads(s: str) -> Any:
+        return orjson.loads(s)
+except ImportError:  # pragma: no cover - depends on the environment
+    _loads = json.loads
+
+MAX_REPAIR_ATTEMPTS = 32
+
+_OPEN = re.compile(r"[{\[]")
+# A whole string literal (group 1 is the closing quote, missing if the text ends inside it) or one structural char
+_INNER = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?|[{}\[\],]', re.S)
+_TRAILING_COMMA = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[}\]])', re.S)
+_FENCE = re.compile(r"```[ \t]*[\w+-]*[ \t]*\r?\n?")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_trailing_commas(s: str) -> str:
+    """Drop commas directly before a closing bracket (outside strings)."""
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(2), s)
+
+
+def _parse(s: str) -> Any:
+    try:
+        return _loads(s)
+    except ValueError:
+        return _loads(strip_trailing_commas(s))
+
+
+def _fenced(text: str) -> Optional[str]:
+    m = _FENCE.search(text)
+    if m is None:
+        return None
+    end = text.find("```", m.end())
+    return text[m.end():] if end < 0 else text[m.end():end]
+
+
+def _closers(node: Any) -> str:
+    out = []
+    while node is not None:
+        out.append(node[0])
+        node = node[1]
+    return "".join(out)
+
+
+def _scan(text: str, start: int) -> Tuple[str, int, List[Tuple[int, Any]]]:
+    """Scan the value opening at text[start].
+
+    Returns ("complete", end, _), ("invalid", resume_at, _) for mismatched
+    brackets, or ("truncated", len(text), checkpoints) where each checkpoint
+    (pos, stack) makes text[start:pos] + _closers(stack) a complete value.
+    The stack is a linked list of (closer, parent) so a checkpoint costs O(1).
+    Checkpoints are only taken between items of an array or of the top-level
+    value, so a half-written object is dropped rather than returned partially.
+    """
+    stack: Any = (_CLOSERS[text[start]], None)
+    depth = 1
+    checkpoints: List[Tuple[int, Any]] = []
+    for m in _INNER.finditer(text, start + 1):
+        tok = m.group()
+        if tok[0] == '"':
+            if m.group(1) is None:
+                return "truncated", len(text), checkpoints
+        elif tok in "{[":
+            stack = (_CLOSERS[tok], stack)
+            depth += 1
+            if tok == "[":
+                checkpoints.append((m.end(), stack))
+        elif tok == ",":
+            if depth == 1 or stack[0] == "]":
+                checkpoints.append((m.start(), stack))
+        else:
+            if stack[0] != tok:
+                return "invalid", m.end(), checkpoints
+            stack = stack[1]
+            depth -= 1
+            if stack is None:
+                return "complete", m.end(), checkpoints
+            if depth == 1 or stack[0] == "]":
+                checkpoints.append((m.end(), stack))
+    return "truncated", len(text), checkpoints
+
+
+def _repair(text: str, start: int, checkpoints: List[Tuple[int, Any]]) -> Tuple[bool, Any]:
+    for pos, stack in reversed(checkpoints[-MAX_REPAIR_ATTEMPTS:]):
+        try:
+            return True, _parse(text[start:pos] + _closers(stack))
+        except ValueError:
+            continue
+    return False, None
+
+
+def _extract(body: str, prefer: Optional[type]) -> Tuple[bool, Any, bool]:
+    """(found, value, complete) for one candidate body."""
+    fallback: Optional[Tuple[Any, bool]] = None
+    pos = 0
+    while True:
+        m = _OPEN.search(body, pos)
+        if m is None:
+            break
+        start = m.start()
+        state, pos, checkpoints = _scan(body, start)
+        if state == "complete":
+            try:
+                value = _parse(body[start:pos])
+            except ValueError:
+                continue
+            if prefer is None or isinstance(value, prefer):
+                return True, value, True
+            if fallback is None or not fallback[1]:
+                fallback = (value, True)
+        elif state == "truncated":
+            ok, value = _repair(body, start, checkpoints)
+            if ok and fallback is None:
+                fallback = (value, False)
+            break
+    if fallback is not None:
+        return True, fallback[0], fallback[1]
+    return False, None, False
+
+
+def extract_json_partial(text: str, prefer: Optional[type] = dict) -> Tuple[Any, bool]:
+    """Return (value, complete) for the JSON in `text`; complete is False for a repaired truncated tail.
+
+    The first complete value of type `prefer` wins, then the first complete
+    value of any type, then a repaired truncated one. Raises ValueError if
+    nothing can be recovered.
+    """
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return _loads(stripped), True
+        except ValueError:
+            pass
+    fenced = _fenced(text)
+    if fenced is not None and fenced.strip()[:1] in ("{", "["):
+        try:
+            return _loads(fenced.strip()), True
+        except ValueError:
+            pass
+    for body in ([fenced] if fenced is not None else []) + [text]:
+        found, value, complete = _extract(body, prefer)
+        if found:
+            return value, complete
+    raise ValueError("Could not parse JSON from model response")
+
+
+def extract_json(text: str, prefer: Optional[type] = dict, allow_partial: bool = True) -> Any:
+    """Parse the JSON embedded in a model response (see the module docstring)."""
+    value, complete = extract_json_partial(text, prefer)
+    if not complete and not allow_partial:
+        raise ValueError("Model response JSON is truncated")
+    return value
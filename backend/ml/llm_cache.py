@@ -0,0 +1,201 @@
+"""Content-addressed cache of model responses for `ml.genai.GeminiClient`.
+
+Keys are a SHA-256 of (model, prompt, generation params), so the same prompt
+sent to the same model with the same settings is answered from the cache, e.g.
+when a PDF is re-uploaded or a lesson quiz regenerated. `ResponseCache` has an
+in-memory LRU tier and, when given a path, a persistent SQLite tier that is
+shared by every process pointing at the same file. Both tiers honour a TTL and
+a maximum entry count, and the SQLite tier also a maximum total size of the
+stored responses (least recently used entries go first). Hit/miss counters per
+tier are exposed through `stats()`.
+
+Any object with `get(key) -> Optional[str]`, `set(key, value)` and
+`delete(key)` can be passed to `GeminiClient(cache=...)` instead.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_DISK_ENTRIES = 100_000
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+# A full SQLite tier is pruned down to this fraction of its bounds, so the cost
+# of the (sorting) prune query is paid once per many inserts, not on every one
+PRUNE_TO = 0.9
+# Other processes also insert into a shared file; recount at least this often
+RECOUNT_EVERY = 1000
+
+# Oldest-first eviction: rows past the newest `n` entries or `bytes` of values
+_PRUNE_SQL = (
+    "DELETE FROM responses WHERE key IN (SELECT key FROM ("
+    "SELECT key, ROW_NUMBER() OVER w AS n, SUM(length(CAST(value AS BLOB))) OVER w AS kept FROM responses "
+    "WINDOW w AS (ORDER BY accessed_at DESC, rowid DESC ROWS UNBOUNDED PRECEDING)) WHERE n > ? OR kept > ?)"
+)
+
+
+def cache_key(model: str, prompt: str, params: Optional[Mapping[str, Any]] = None) -> str:
+    payload = json.dumps({"model": model, "prompt": prompt, "params": dict(params or {})},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = None,
+                 path: Optional[str] = None, max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._clock = clock
+        self._lock = threading.RLock()
+        # key -> (value, stored_at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        # Running size of the SQLite tier: exact after each prune, an upper bound for
+        # this process's own inserts in between (replaced keys are counted twice)
+        self._disk_entries = 0
+        self._disk_bytes = 0
+        self._inserts_since_count = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)")
+            self._prune()
+
+    def _fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl is None or now - stored_at < self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._fresh(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expired += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if self._fresh(row[1], now):
+                        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[0]
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.expired += 1
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = self._clock()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) "
+                                 "VALUES (?, ?, ?, ?)", (key, value, now, now))
+                self._disk_entries += 1
+                self._disk_bytes += len(value.encode("utf-8"))
+                self._inserts_since_count += 1
+                if (self._disk_entries > self.max_disk_entries or self._disk_bytes > self.max_disk_bytes
+                        or self._inserts_since_count >= RECOUNT_EVERY):
+                    self._prune()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._disk_entries = self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "entries": len(self._entries),
+            }
+
+    def _count(self) -> Tuple[int, int]:
+        return self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(CAST(value AS BLOB))), 0) FROM responses").fetchone()
+
+    def _prune(self) -> None:
+        """Recount the SQLite tier; if it is over a bound, evict LRU rows down to PRUNE_TO of the bounds."""
+        entries, size = self._count()
+        if entries > self.max_disk_entries or size > self.max_disk_bytes:
+            keep_entries = math.ceil(self.max_disk_entries * PRUNE_TO)
+            keep_bytes = math.ceil(self.max_disk_bytes * PRUNE_TO)
+            self.evictions += self._db.execute(_PRUNE_SQL, (keep_entries, keep_bytes)).rowcount
+            entries, size = self._count()
+        self._disk_entries, self._disk_bytes = entries, size
+        self._inserts_since_count = 0
+
+    def _remember(self, key: str, value: str, stored_at: float) -> None:
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment; None when LLM_CACHE=0.
+
+    LLM_CACHE_SIZE bounds the memory tier, LLM_CACHE_TTL (seconds, 0 = never)
+    expires entries, and LLM_CACHE_PATH adds the SQLite tier at that file,
+    holding at most LLM_CACHE_MAX_BYTES of responses.
+    """
+    global _cache
+    if os.getenv("LLM_CACHE", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = float(os.getenv("LLM_CACHE_TTL", "0")) or None
+                _cache = ResponseCache(max_entries=int(os.getenv("LLM_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES))),
+                                       ttl=ttl, path=os.getenv("LLM_CACHE_PATH") or None,
+                                       max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES",
+                                                                    str(DEFAULT_MAX_DISK_BYTES))))
+    return _cache
@@ -0,0 +1,143 @@
+"""In-process cache of the per-topic models in `ml/models/`.
+
+`ModelRegistry.get(topic)` returns the unpickled model. It only calls
+`joblib.load` when the topic is not cached yet or when the file's (mtime, size)
+changed since it was loaded, so a retrain is picked up without a restart. The
+cache is an LRU bounded by model count and by bytes, with the on-disk size used
+as the estimate of a model's footprint. Hit, miss, reload and eviction counters
+are exposed through `stats()`. `suffix`/`loader` select another on-disk format,
+e.g. the flattened forests from `ml.flat_forest`.
+"""
+from __future__ import annotations
+
+import glob
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import joblib
+
+from ml.topic_models import MODEL_DIR
+
+DEFAULT_MAX_MODELS = 256
+DEFAULT_MAX_BYTES = 1024 * 2**20
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: Optional[str] = None, max_models: int = DEFAULT_MAX_MODELS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, loader: Callable[[str], Any] = joblib.load,
+                 suffix: str = ".joblib"):
+        self.model_dir = model_dir or MODEL_DIR
+        self.suffix = suffix
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._lock = threading.RLock()
+        # topic -> (model, (mtime_ns, size))
+        self._entries: "OrderedDict[str, Tuple[Any, Tuple[int, int]]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def path_for(self, topic: str) -> str:
+        return os.path.join(self.model_dir, f"{topic}{self.suffix}")
+
+    def get(self, topic: str):
+        """Return the model for `topic`, loading it if it is new or changed on disk."""
+        path = self.path_for(topic)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(topic)
+            raise FileNotFoundError(path) from None
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(topic)
+            if entry is not None and entry[1] == signature:
+                self._entries.move_to_end(topic)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            if entry is not None:
+                self.reloads += 1
+                self._drop(topic)
+            model = self._loader(path)
+            self._entries[topic] = (model, signature)
+            self._bytes += signature[1]
+            self._evict()
+            return model
+
+    def preload(self, topics: Optional[Iterable[str]] = None) -> List[str]:
+        """Load `topics` (default: every model file in the model dir) and return the ones loaded."""
+        if topics is None:
+            paths = sorted(glob.glob(os.path.join(self.model_dir, f"*{self.suffix}")))
+            topics = [os.path.basename(p)[:-len(self.suffix)] for p in paths]
+        loaded = []
+        for topic in topics:
+            try:
+                self.get(topic)
+            except FileNotFoundError:
+                continue
+            loaded.append(topic)
+        return loaded
+
+    def invalidate(self, topic: Optional[str] = None) -> None:
+        """Forget one topic, or every cached model when `topic` is None."""
+        with self._lock:
+            if topic is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._drop(topic)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "models": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _drop(self, topic: str) -> None:
+        entry = self._entries.pop(topic, None)
+        if entry is not None:
+            self._bytes -= entry[1][1]
+
+    def _evict(self) -> None:
+        # Always keep the most recent model, even if it alone exceeds max_bytes
+        while len(self._entries) > 1 and (len(self._entries) > self.max_models or self._bytes > self.max_bytes):
+            _, (_, signature) = self._entries.popitem(last=False)
+            self._bytes -= signature[1]
+            self.evictions += 1
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Process-wide registry over `topic_models.MODEL_DIR`.
+
+    With ML_FLAT_MODELS=1 it serves the memory-mapped `<topic>.forest` exports
+    instead of unpickling `<topic>.joblib`, so N worker processes share one copy
+    of the tree arrays through the page cache.
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if os.getenv("ML_FLAT_MODELS", "0") == "1":
+                    from ml.flat_forest import FOREST_SUFFIX, load_flat_forest
+                    _registry = ModelRegistry(suffix=FOREST_SUFFIX, loader=load_flat_forest)
+                else:
+                    _registry = ModelRegistry()
+    return _registry
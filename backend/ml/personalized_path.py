@@ -4,8 +4,55 @@ Rules:
 - For each weak topic (low accuracy), recommend sequence: Revision -> Practice -> Assessment -> Advancement
 - Adjust number of practice items according to how weak the student is
 - Keep variations so two students get different sequences if needed
+
+The variation comes from a stable CRC32 of the topic name (not the per-process
+randomized `hash()`), so every worker builds the same path for the same input.
+A topic's steps depend only on (topic, accuracy bucket, difficulty, pace), so
+they are built once per key and memoized; `generate_class_paths` returns each
+distinct sequence once and has students refer to it by key.
 """
-from typing import List, Dict
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+PACE_REPEATS = {"slow": 3, "normal": 2, "fast": 1}
+
+Step = Dict[str, str]
+
+
+def _stable_seed(topic: str) -> int:
+    return zlib.crc32(str(topic).encode("utf-8")) % 3
+
+
+def _accuracy_bucket(accuracy: float) -> int:
+    """Weakness bucket 0 (mastered) .. 5 (nothing right); practice blocks scale with it. NaN counts as 0 accuracy."""
+    if accuracy != accuracy:
+        accuracy = 0.0
+    return int((1 - accuracy) * 5)
+
+
+@lru_cache(maxsize=4096)
+def _topic_steps(topic: str, bucket: int, difficulty: str, repeats: int) -> Tuple[Step, ...]:
+    """The step template for one topic; cached and shared, so treat the dicts as read-only."""
+    # number of practice blocks scales with weakness
+    practice_blocks = max(1, bucket * repeats)
+
+    # Vary steps between topics with a hash that is stable across processes
+    seed = _stable_seed(topic)
+
+    sequence = [{"step": "revision", "topic": topic, "details": f"Read textbook / notes for {topic}", "difficulty": "easy"}]
+    for i in range(practice_blocks):
+        sequence.append({"step": "practice", "topic": topic, "details": f"Practice set {i+1}", "difficulty": difficulty if i >= seed else "easy"})
+    sequence.append({"step": "assessment", "topic": topic, "details": "Short quiz to test mastery", "difficulty": difficulty})
+    sequence.append({"step": "advance_or_repeat", "topic": topic, "details": "If assessment good -> advance, else repeat practice", "difficulty": difficulty})
+    return tuple(sequence)
+
+
+def _template_key(topic: str, bucket: int, difficulty: str, repeats: int) -> str:
+    return f"{topic}|{bucket}|{difficulty}|{repeats}"
 
 
 def generate_learning_path(recommendation: Dict, pace: str = "normal") -> List[Dict]:
@@ -14,31 +61,62 @@ def generate_learning_path(recommendation: Dict, pace: str = "normal") -> List[D
     recommendation: {"recommendations": [{topic, accuracy, recommended_difficulty}], ...}
     pace: "slow" | "normal" | "fast" — controls how many practice blocks
     """
-    pace_map = {"slow": 3, "normal": 2, "fast": 1}
-    repeats = pace_map.get(pace, 2)
+    repeats = PACE_REPEATS.get(pace, 2)
 
     path = []
     for rec in recommendation.get("recommendations", []):
-        topic = rec["topic"]
-        accuracy = rec["accuracy"]
-        difficulty = rec["recommended_difficulty"]
+        steps = _topic_steps(rec["topic"], _accuracy_bucket(rec["accuracy"]), rec["recommended_difficulty"], repeats)
+        path.append({"topic": rec["topic"], "sequence": [dict(step) for step in steps]})
 
-        # number of practice blocks scales with weakness
-        practice_blocks = max(1, int((1 - accuracy) * 5) * repeats)
+    return path
 
-        # Ensure uniqueness across students by varying steps with topic name hash
-        seed = abs(hash(topic)) % 3
 
-        sequence = []
-        sequence.append({"step": "revision", "topic": topic, "details": f"Read textbook / notes for {topic}", "difficulty": "easy"})
-        for i in range(practice_blocks):
-            sequence.append({"step": "practice", "topic": topic, "details": f"Practice set {i+1}", "difficulty": difficulty if i >= seed else "easy"})
-        sequence.append({"step": "assessment", "topic": topic, "details": "Short quiz to test mastery", "difficulty": difficulty})
-        sequence.append({"step": "advance_or_repeat", "topic": topic, "details": "If assessment good -> advance, else repeat practice", "difficulty": difficulty})
+def generate_class_paths(recommendations: Union[pd.DataFrame, Mapping[Any, Dict]],
+                         pace: Union[str, Mapping[Any, str]] = "normal") -> Dict[str, Any]:
+    """Build learning paths for a whole class in one call.
 
-        path.append({"topic": topic, "sequence": sequence})
+    `recommendations` is either the long frame from
+    `pipeline.recommend_next_topics_batch` or {student_id: recommend_next_topic()
+    dict}. `pace` is one pace for everyone or {student_id: pace}. Returns
+    {"templates": {key: [steps]}, "paths": {student_id: [{"topic", "template"}]}}
+    where each distinct step sequence appears once; `expand_class_paths` turns it
+    back into per-student `generate_learning_path` output.
+    """
+    if isinstance(recommendations, pd.DataFrame):
+        df = recommendations
+        if "rank" in df.columns:
+            df = df.sort_values(["student_id", "rank"], kind="mergesort")
+        students = df["student_id"].tolist()
+        topics = df["topic"].tolist()
+        buckets = np.trunc((1 - df["accuracy"].fillna(0.0).to_numpy(dtype=float)) * 5).astype(int).tolist()
+        difficulties = df["recommended_difficulty"].tolist()
+    else:
+        students, topics, buckets, difficulties = [], [], [], []
+        for sid, rec in recommendations.items():
+            for r in rec.get("recommendations", []):
+                students.append(sid)
+                topics.append(r["topic"])
+                buckets.append(_accuracy_bucket(r["accuracy"]))
+                difficulties.append(r["recommended_difficulty"])
 
-    return path
+    templates: Dict[str, List[Step]] = {}
+    paths: Dict[Any, List[Dict[str, str]]] = {}
+    for sid, topic, bucket, difficulty in zip(students, topics, buckets, difficulties):
+        repeats = PACE_REPEATS.get(pace if isinstance(pace, str) else pace.get(sid, "normal"), 2)
+        key = _template_key(topic, bucket, difficulty, repeats)
+        if key not in templates:
+            templates[key] = [dict(step) for step in _topic_steps(topic, bucket, difficulty, repeats)]
+        paths.setdefault(sid, []).append({"topic": topic, "template": key})
+    return {"templates": templates, "paths": paths}
+
+
+def expand_class_paths(compact: Dict[str, Any]) -> Dict[Any, List[Dict]]:
+    """{student_id: generate_learning_path-style list} from `generate_class_paths` output."""
+    templates = compact["templates"]
+    return {
+        sid: [{"topic": entry["topic"], "sequence": [dict(step) for step in templates[entry["template"]]]} for entry in entries]
+        for sid, entries in compact["paths"].items()
+    }
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 """ML pipeline for Personalized Learning Platform.
 
 Modules:
-- load_data: read quiz attempts CSV
+- load_data / iter_attempt_chunks: read quiz attempts (CSV, Parquet or Feather), whole or in chunks
 - preprocess: handle missing values, encode categoricals, make numeric features
 - aggregate_features: per-student/per-topic aggregations (accuracy, avg_time, difficulty success ratios)
-- model training: clustering and per-topic classifier for mastery
+- aggregate_features_chunked: the same features folded chunk by chunk for exports larger than RAM
+- model training: clustering (full or mini-batch) and per-topic classifier for mastery
 - inference: predict mastery and recommend topics/difficulty
 
 Notes:
@@ -12,8 +13,11 @@ Notes:
 """
 from __future__ import annotations
 
+import copy
+import glob
 import math
-from typing import Tuple, Dict, Any
+import os
+from typing import Tuple, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Union
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
@@ -22,6 +26,45 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 from dataclasses import dataclass
+from ml.instrument import traced
+
+
+DIFFICULTY_LEVELS = ("easy", "medium", "hard")
+
+ATTEMPT_COLUMNS = [
+    "student_id",
+    "topic",
+    "difficulty",
+    "total_questions",
+    "correct_answers",
+    "time_taken_seconds",
+    "attempt_date",
+]
+
+# Fixed CSV dtypes so every chunk comes back with the same types
+ATTEMPT_CSV_DTYPES = {
+    "student_id": str,
+    "topic": str,
+    "difficulty": str,
+    "total_questions": "float64",
+    "correct_answers": "float64",
+    "time_taken_seconds": "float64",
+}
+
+DEFAULT_CHUNKSIZE = 500_000
+
+FEATURE_OUTPUT_COLUMNS = [
+    "student_id",
+    "topic",
+    "accuracy_mean",
+    "accuracy_std",
+    "avg_time_mean",
+    "attempts_count",
+    "improvement_slope",
+    "success_easy",
+    "success_medium",
+    "success_hard",
+]
 
 
 @dataclass
@@ -31,13 +74,106 @@ class TrainedModels:
     encoders: Dict[str, Any]
 
 
-def load_data(csv_path: str) -> pd.DataFrame:
-    """Load quiz attempts CSV into DataFrame."""
-    df = pd.read_csv(csv_path, parse_dates=["attempt_date"])
-    return df
+@traced
+def load_data(csv_path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Load quiz attempts into a DataFrame.
+
+    `csv_path` may also point at a Parquet (.parquet/.pq) or Feather (.feather/.arrow)
+    file, or be a glob matching several files. `columns` projects the read to a subset.
+    """
+    paths = _expand_paths(csv_path)
+    if len(paths) == 1 and _file_format(paths[0]) == "csv":
+        usecols = list(columns) if columns is not None else None
+        parse_dates = ["attempt_date"] if usecols is None or "attempt_date" in usecols else False
+        return pd.read_csv(paths[0], usecols=usecols, parse_dates=parse_dates)
+    return pd.concat(list(iter_attempt_chunks(paths, chunksize=None, columns=columns)), ignore_index=True)
+
+
+def _expand_paths(source: Union[str, os.PathLike, Sequence[Union[str, os.PathLike]]]) -> List[str]:
+    if isinstance(source, (str, os.PathLike)):
+        source = [source]
+    paths: List[str] = []
+    for item in source:
+        item = os.fspath(item)
+        if glob.has_magic(item):
+            matched = sorted(glob.glob(item))
+            if not matched:
+                raise FileNotFoundError(item)
+            paths.extend(matched)
+        else:
+            paths.append(item)
+    return paths
+
+
+def _file_format(path: str) -> str:
+    ext = path.lower().rsplit(".", 1)[-1] if "." in path else ""
+    if ext in ("parquet", "pq"):
+        return "parquet"
+    if ext in ("feather", "arrow", "ipc"):
+        return "feather"
+    return "csv"
+
+
+def _typed_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    if "attempt_date" in chunk.columns and not pd.api.types.is_datetime64_any_dtype(chunk["attempt_date"]):
+        chunk["attempt_date"] = pd.to_datetime(chunk["attempt_date"])
+    return chunk
 
 
-def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+def iter_attempt_chunks(
+    source: Union[str, os.PathLike, Sequence[Union[str, os.PathLike]]],
+    chunksize: Optional[int] = DEFAULT_CHUNKSIZE,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield attempt rows from a path, glob or list of paths in typed chunks.
+
+    CSV files are read with `pd.read_csv(chunksize=...)`. Parquet files are streamed
+    by record batch and Feather files are memory-mapped and sliced batch by batch;
+    both read only `columns` when given and need `pyarrow`. `chunksize=None` yields
+    each file whole.
+    """
+    columns = list(columns) if columns is not None else None
+    for path in _expand_paths(source):
+        fmt = _file_format(path)
+        if fmt == "csv":
+            # attempt_date is converted in _typed_chunk; read_csv's parse_dates is much slower with dtype=
+            dtypes = {c: t for c, t in ATTEMPT_CSV_DTYPES.items() if columns is None or c in columns}
+            reader = pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+            if chunksize is None:
+                yield _typed_chunk(reader)
+                continue
+            with reader:
+                for chunk in reader:
+                    yield _typed_chunk(chunk)
+        elif fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            pf = pq.ParquetFile(path)
+            if chunksize is None:
+                yield _typed_chunk(pf.read(columns=columns).to_pandas())
+                continue
+            for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+                yield _typed_chunk(batch.to_pandas())
+        else:
+            import pyarrow as pa
+
+            with pa.memory_map(path, "r") as source_file:
+                reader = pa.ipc.open_file(source_file)
+                if chunksize is None:
+                    table = reader.read_all()
+                    yield _typed_chunk((table.select(columns) if columns is not None else table).to_pandas())
+                    continue
+                # Record batches are decompressed one at a time
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    for offset in range(0, batch.num_rows, chunksize):
+                        yield _typed_chunk(batch.slice(offset, chunksize).to_pandas())
+
+
+@traced
+def preprocess(df: pd.DataFrame, compact: bool = False, time_fill: Optional[float] = None) -> pd.DataFrame:
     """Preprocess raw attempt logs.
 
     Steps:
@@ -45,28 +181,76 @@ def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     - Ensure types
     - Create accuracy and avg_time_per_question
     - Map difficulty to ordinal value for convenience
+
+    The input frame is never modified; only a shallow copy is taken, so the
+    untouched columns share memory with it.
+
+    With `compact=True` the result is shrunk for large exports: student_id, topic
+    and difficulty become categoricals, the counts become the narrowest int type
+    that fits and the ratios become float32.
+
+    Missing time_taken_seconds are filled with `time_fill`, by default the median of
+    df. Passing np.nan leaves them missing for `partial_aggregate` to account for.
     """
-    df = df.copy()
+    df = df.copy(deep=False)
 
     # Fill basic NA
     df["correct_answers"] = df["correct_answers"].fillna(0).astype(int)
     df["total_questions"] = df["total_questions"].fillna(1).astype(int)
-    df["time_taken_seconds"] = df["time_taken_seconds"].fillna(df["time_taken_seconds"].median())
+    if time_fill is None:
+        time_fill = df["time_taken_seconds"].median()
+    df["time_taken_seconds"] = df["time_taken_seconds"].fillna(time_fill)
 
     # Derived features
     df["accuracy"] = df["correct_answers"] / df["total_questions"]
     # Avoid divide-by-zero
-    df["avg_time_per_question"] = df.apply(
-        lambda r: r["time_taken_seconds"] / r["total_questions"] if r["total_questions"] > 0 else np.nan, axis=1
-    )
+    df["avg_time_per_question"] = df["time_taken_seconds"] / df["total_questions"].where(df["total_questions"] > 0)
 
     # Map difficulty to ordinal
     diff_map = {"easy": 0, "medium": 1, "hard": 2}
     df["difficulty_ord"] = df["difficulty"].map(diff_map).fillna(1).astype(int)
 
+    if compact:
+        df = _compact_dtypes(df)
+
+    return df
+
+
+def _compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast a preprocessed frame in place (see `preprocess(compact=True)`)."""
+    for col in ("student_id", "topic", "difficulty"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in ("correct_answers", "total_questions"):
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    df["difficulty_ord"] = df["difficulty_ord"].astype(np.int8)
+    for col in ("accuracy", "avg_time_per_question"):
+        df[col] = df[col].astype(np.float32)
     return df
 
 
+def _epoch_seconds(dates: pd.Series) -> np.ndarray:
+    """Return attempt dates as float seconds since the epoch (same as `Timestamp.timestamp()`)."""
+    values = pd.to_datetime(dates).values.astype("datetime64[ns]").astype(np.int64)
+    return values / 1e9
+
+
+def _slope_from_sums(n, sx, sy, sxy, sxx):
+    """Least-squares slope of y on x from grouped sums.
+
+    slope = (n*Σxy - Σx*Σy) / (n*Σx² - (Σx)²), written in the centered form
+    Sxy / Sxx so that it matches `np.cov(x, y, bias=True)[0, 1] / np.var(x)`.
+    Groups with fewer than two attempts or no spread in x get 0.0.
+    """
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sxy_c = sxy - sx * sy / n
+        sxx_c = sxx - sx * sx / n
+        slope = sxy_c / sxx_c
+    return np.where((n >= 2) & (sxx_c != 0), slope, 0.0)
+
+
+@traced
 def aggregate_features(df: pd.DataFrame) -> pd.DataFrame:
     """Aggregate features per student and topic to create training examples.
 
@@ -76,7 +260,208 @@ def aggregate_features(df: pd.DataFrame) -> pd.DataFrame:
     - avg_time_mean
     - attempts_count
     - improvement_slope (simple trend measure)
-    - success_ratio_easy/medium/hard
+    - success_easy/medium/hard
+
+    All features come out of a single grouped aggregation (`partial_aggregate`).
+    The slope is the closed-form least-squares fit over grouped sums (Σx, Σy, Σxy,
+    Σx²), with x shifted to the first attempt of each group to keep the sums well
+    conditioned, and the difficulty ratios are means over per-difficulty masked columns.
+    """
+    return finalize_partial_aggregates(partial_aggregate(df))
+
+
+@traced
+def aggregate_features_chunked(
+    source: Union[str, os.PathLike, Sequence[Union[str, os.PathLike]]],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """Run load -> preprocess -> aggregate_features over `source` one chunk at a time.
+
+    Only the per-group partial aggregates and a value histogram of time_taken_seconds
+    (for the global median fill) are kept in memory. The result matches
+    `aggregate_features(preprocess(load_data(source)))` up to float rounding.
+    """
+    state: Optional[pd.DataFrame] = None
+    time_counts: Optional[pd.Series] = None
+    for chunk in iter_attempt_chunks(source, chunksize=chunksize):
+        counts = chunk["time_taken_seconds"].value_counts()
+        time_counts = counts if time_counts is None else time_counts.add(counts, fill_value=0)
+        part = partial_aggregate(preprocess(chunk, compact=compact, time_fill=np.nan))
+        state = part if state is None else merge_partial_aggregates([state, part])
+    if state is None:
+        raise ValueError(f"No attempt rows found in {source!r}")
+    return finalize_partial_aggregates(state, time_fill=_median_from_counts(time_counts))
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    """Median of the values described by a `value_counts()` histogram."""
+    counts = counts[counts > 0].sort_index()
+    total = int(counts.sum())
+    if total == 0:
+        return float("nan")
+    cum = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy(dtype=float)
+    lo = values[np.searchsorted(cum, (total - 1) // 2 + 1)]
+    hi = values[np.searchsorted(cum, total // 2 + 1)]
+    return (lo + hi) / 2
+
+
+_PARTIAL_SUM_COLUMNS = [
+    "attempts_count",
+    "n_accuracy",
+    "sum_accuracy",
+    "n_finite",
+    "sum_finite",
+    "n_time",
+    "sum_time",
+    "n_missing_time",
+    "sum_inv_questions",
+    "sx",
+    "sxy",
+    "sxx",
+] + [f"{prefix}_{level}" for level in DIFFICULTY_LEVELS for prefix in ("n", "sum")]
+
+
+@traced
+def partial_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """Fold preprocessed attempts into mergeable per-(student_id, topic) aggregates.
+
+    Each row holds counts and sums plus the accuracy M2 (sum of squared deviations)
+    and regression sums with x measured from the group's earliest attempt (x0). M2
+    and the regression sums only cover finite accuracies; a non-finite one turns
+    accuracy_std / improvement_slope into NaN at the end, as np.std / np.cov would.
+    Rows whose time_taken_seconds is missing keep Σ 1/total_questions instead, so the
+    fill value can be applied in `finalize_partial_aggregates`.
+    """
+    keys = ["student_id", "topic"]
+    accuracy = df["accuracy"].astype(float)
+    finite = accuracy.where(np.isfinite(accuracy))
+    total = df["total_questions"]
+
+    x_abs = pd.Series(_epoch_seconds(df["attempt_date"]), index=df.index)
+    x = x_abs - x_abs.groupby([df[k] for k in keys], observed=True, sort=False).transform("min")
+    missing_time = df["time_taken_seconds"].isna() & (total > 0)
+
+    work = pd.DataFrame({
+        "student_id": df["student_id"],
+        "topic": df["topic"],
+        "accuracy": accuracy,
+        "finite": finite,
+        "avg_time": df["avg_time_per_question"].astype(float),
+        "inv_questions": (1.0 / total.where(missing_time)).astype(float),
+        "x_abs": x_abs,
+        "x": x,
+        "xy": x * finite,
+        "xx": x * x,
+    })
+    for level in DIFFICULTY_LEVELS:
+        work[f"acc_{level}"] = accuracy.where(df["difficulty"] == level)
+
+    grouped = work.groupby(keys, observed=True, sort=True)
+    out = grouped.agg(
+        attempts_count=("accuracy", "size"),
+        n_accuracy=("accuracy", "count"),
+        sum_accuracy=("accuracy", "sum"),
+        n_finite=("finite", "count"),
+        sum_finite=("finite", "sum"),
+        n_time=("avg_time", "count"),
+        sum_time=("avg_time", "sum"),
+        n_missing_time=("inv_questions", "count"),
+        sum_inv_questions=("inv_questions", "sum"),
+        x0=("x_abs", "min"),
+        x_max=("x_abs", "max"),
+        sx=("x", "sum"),
+        sxy=("xy", "sum"),
+        sxx=("xx", "sum"),
+        **{f"n_{level}": (f"acc_{level}", "count") for level in DIFFICULTY_LEVELS},
+        **{f"sum_{level}": (f"acc_{level}", "sum") for level in DIFFICULTY_LEVELS},
+    )
+    out["m2_finite"] = (grouped["finite"].var(ddof=0) * out["n_finite"]).fillna(0.0)
+    return out.reset_index()
+
+
+@traced
+def merge_partial_aggregates(parts: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Combine partial aggregates of the same (student_id, topic) groups.
+
+    Regression sums are re-based onto the earliest x0 and accuracy M2 is merged
+    with the parallel variance formula (Chan et al.), so the result equals the
+    partial aggregate of the concatenated attempts.
+    """
+    keys = ["student_id", "topic"]
+    both = pd.concat(list(parts), ignore_index=True)
+    for key in keys:
+        if isinstance(both[key].dtype, pd.CategoricalDtype):
+            both[key] = both[key].astype(object)
+    by = [both[k] for k in keys]
+
+    # Shift x from each part's origin to the merged origin
+    x0 = both.groupby(by, sort=False)["x0"].transform("min")
+    d = both["x0"] - x0
+    n = both["attempts_count"]
+    both["sxx"] = both["sxx"] + 2 * d * both["sx"] + n * d * d
+    both["sx"] = both["sx"] + n * d
+    both["sxy"] = both["sxy"] + d * both["sum_finite"]
+
+    # Between-part contribution to M2
+    n_fin = both["n_finite"]
+    grouped_n = both.groupby(by, sort=False)
+    mean = grouped_n["sum_finite"].transform("sum") / grouped_n["n_finite"].transform("sum")
+    part_mean = both["sum_finite"] / n_fin.where(n_fin > 0)
+    both["m2_finite"] = both["m2_finite"] + (n_fin * (part_mean - mean) ** 2).fillna(0.0)
+
+    grouped = both.groupby(keys, sort=True)
+    out = grouped[_PARTIAL_SUM_COLUMNS + ["m2_finite"]].sum()
+    out["x0"] = grouped["x0"].min()
+    out["x_max"] = grouped["x_max"].max()
+    return out.reset_index()
+
+
+@traced
+def finalize_partial_aggregates(state: pd.DataFrame, time_fill: Optional[float] = None) -> pd.DataFrame:
+    """Turn partial aggregates into the `aggregate_features` output columns.
+
+    `time_fill` is the value that stands in for attempts with a missing
+    time_taken_seconds (see `preprocess`); without it those attempts are ignored
+    for avg_time_mean.
+    """
+    n = state["attempts_count"].to_numpy()
+    n_acc = state["n_accuracy"].to_numpy(dtype=float)
+    n_fin = state["n_finite"].to_numpy(dtype=float)
+
+    out = state[["student_id", "topic", "attempts_count"]].copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["accuracy_mean"] = state["sum_accuracy"].to_numpy() / n_acc
+        # Single attempts have no spread
+        std = np.sqrt(state["m2_finite"].to_numpy() / n_fin)
+        std = np.where(n_fin < n_acc, np.nan, std)
+        out["accuracy_std"] = np.where(n > 1, std, 0.0)
+
+        sum_time = state["sum_time"].to_numpy()
+        n_time = state["n_time"].to_numpy(dtype=float)
+        if time_fill is not None and not pd.isna(time_fill):
+            sum_time = sum_time + time_fill * state["sum_inv_questions"].to_numpy()
+            n_time = n_time + state["n_missing_time"].to_numpy()
+        out["avg_time_mean"] = sum_time / n_time
+
+        for level in DIFFICULTY_LEVELS:
+            ratio = state[f"sum_{level}"].to_numpy() / state[f"n_{level}"].to_numpy(dtype=float)
+            # Fill NaNs for success ratios with 0.0 to be conservative
+            out[f"success_{level}"] = np.where(np.isnan(ratio), 0.0, ratio)
+
+    slope = _slope_from_sums(n, state["sx"].to_numpy(), state["sum_finite"].to_numpy(), state["sxy"].to_numpy(), state["sxx"].to_numpy())
+    # A missing or infinite accuracy poisons the fit (np.cov propagates NaN)
+    has_gap = (n_fin < n) & (n >= 2) & (state["x_max"].to_numpy() > state["x0"].to_numpy())
+    out["improvement_slope"] = np.where(has_gap, np.nan, slope)
+
+    return out[FEATURE_OUTPUT_COLUMNS].reset_index(drop=True)
+
+
+def _aggregate_features_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """Reference per-group implementation of `aggregate_features`.
+
+    Kept for parity tests and benchmarks; it is far too slow for large exports.
     """
     df = df.copy()
 
@@ -130,20 +515,47 @@ def aggregate_features(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def cluster_students(features_df: pd.DataFrame, n_clusters: int = 3) -> Tuple[KMeans, pd.DataFrame]:
+@traced
+def cluster_students(features_df: pd.DataFrame, n_clusters: int = 3, mode: str = "full",
+                     batch_size: Optional[int] = None, model_path: Optional[str] = None,
+                     persist: bool = True) -> Tuple[Any, pd.DataFrame]:
     """Cluster students by aggregated features to find natural groups (e.g., beginner/intermediate/advanced).
 
-    Returns the fitted KMeans and the DataFrame with cluster labels attached.
+    mode="full" fits KMeans over the whole matrix; mode="minibatch" uses a
+    MiniBatchKMeans (see `ml.clustering`), which is much faster on large frames.
+    With `persist` the mini-batch model is loaded from `model_path` (default
+    `clustering.CLUSTER_MODEL_PATH`), `partial_fit` on these rows and saved
+    back, so each run refines the saved centroids instead of refitting.
+    Returns the fitted model and the DataFrame with cluster labels attached.
     """
-    X = features_df[["accuracy_mean", "avg_time_mean", "improvement_slope"]].fillna(0.0).values
-    km = KMeans(n_clusters=n_clusters, random_state=0)
-    labels = km.fit_predict(X)
+    if mode == "minibatch":
+        from ml.clustering import DEFAULT_BATCH_SIZE, assign_clusters, fit_streaming_clusters, update_saved_clusters
+
+        if persist:
+            km = update_saved_clusters(features_df, n_clusters, batch_size or DEFAULT_BATCH_SIZE, model_path)
+        else:
+            km = fit_streaming_clusters(features_df, n_clusters, batch_size or DEFAULT_BATCH_SIZE)
+        labels = assign_clusters(features_df, km)
+    elif mode == "full":
+        X = features_df[["accuracy_mean", "avg_time_mean", "improvement_slope"]].fillna(0.0).values
+        km = KMeans(n_clusters=n_clusters, n_init=10, random_state=0)
+        labels = km.fit_predict(X)
+    else:
+        raise ValueError(f"unknown clustering mode: {mode!r}")
     features_df = features_df.copy()
     features_df["cluster"] = labels
     return km, features_df
 
 
-def train_topic_classifier(features_df: pd.DataFrame) -> TrainedModels:
+def mastery_levels(accuracy) -> np.ndarray:
+    """Beginner (< 0.5) / Intermediate (< 0.8) / Advanced, the classifier's target labels."""
+    acc = np.asarray(accuracy, dtype=float)
+    return np.select([acc < 0.5, acc < 0.8], ["Beginner", "Intermediate"], default="Advanced")
+
+
+@traced
+def train_topic_classifier(features_df: pd.DataFrame, previous: Optional[TrainedModels] = None,
+                           extra_trees: int = 50) -> TrainedModels:
     """Train a simple classifier that predicts 'mastery level' for topic using RandomForest.
 
     We derive a target label using thresholds on accuracy_mean:
@@ -152,17 +564,12 @@ def train_topic_classifier(features_df: pd.DataFrame) -> TrainedModels:
     - >= 0.8 -> Advanced
 
     This function returns TrainedModels containing a trained RandomForest and any encoders used.
+    Pass the `previous` TrainedModels to grow a copy of its forest by `extra_trees`
+    trees (warm_start) instead of fitting 200 new ones; a changed label set falls
+    back to a full fit.
     """
     df = features_df.copy()
-
-    def label_from_accuracy(a: float) -> str:
-        if a < 0.5:
-            return "Beginner"
-        if a < 0.8:
-            return "Intermediate"
-        return "Advanced"
-
-    df["label"] = df["accuracy_mean"].apply(label_from_accuracy)
+    df["label"] = mastery_levels(df["accuracy_mean"])
 
     # Features for the classifier
     feat_cols = ["accuracy_mean", "avg_time_mean", "attempts_count", "improvement_slope", "success_easy", "success_medium", "success_hard"]
@@ -170,8 +577,15 @@ def train_topic_classifier(features_df: pd.DataFrame) -> TrainedModels:
     y = df["label"]
 
     X_train, X_test, y_train, y_test = train_test_split(X, y, stratify=y, random_state=0)
-    clf = RandomForestClassifier(n_estimators=200, random_state=0)
-    clf.fit(X_train, y_train)
+    prev_clf = previous.topic_classifier if previous is not None else None
+    if isinstance(prev_clf, RandomForestClassifier) and set(prev_clf.classes_) == set(y_train):
+        clf = copy.deepcopy(prev_clf)
+        clf.set_params(warm_start=True, n_estimators=prev_clf.n_estimators + extra_trees)
+        clf.fit(X_train, y_train)
+        clf.set_params(warm_start=False)
+    else:
+        clf = RandomForestClassifier(n_estimators=200, random_state=0)
+        clf.fit(X_train, y_train)
 
     preds = clf.predict(X_test)
     print("Classifier report:\n", classification_report(y_test, preds))
@@ -180,6 +594,7 @@ def train_topic_classifier(features_df: pd.DataFrame) -> TrainedModels:
     return models
 
 
+@traced
 def predict_mastery(models: TrainedModels, agg_df: pd.DataFrame) -> pd.DataFrame:
     """Predict mastery labels for each (student, topic) row in agg_df."""
     df = agg_df.copy()
@@ -190,6 +605,32 @@ def predict_mastery(models: TrainedModels, agg_df: pd.DataFrame) -> pd.DataFrame
     return df
 
 
+def _recommended_difficulty(accuracy) -> np.ndarray:
+    """Vectorized difficulty bucket: accuracy < 0.4 -> easy, 0.4-0.7 -> medium, else hard."""
+    acc = np.asarray(accuracy, dtype=float)
+    return np.select([acc < 0.4, acc < 0.7], ["easy", "medium"], default="hard")
+
+
+def _recommendation_records(rows: pd.DataFrame) -> list:
+    accuracy = rows["accuracy_mean"].to_numpy(dtype=float)
+    return [
+        {"topic": topic, "accuracy": float(acc), "recommended_difficulty": str(diff)}
+        for topic, acc, diff in zip(rows["topic"].tolist(), accuracy, _recommended_difficulty(accuracy))
+    ]
+
+
+@traced
+def index_by_student(agg_df: pd.DataFrame) -> pd.DataFrame:
+    """Pre-index `agg_df` for repeated `recommend_next_topic` lookups.
+
+    Rows are sorted by (student_id, accuracy_mean) and student_id becomes the
+    index, so a lookup is a binary search on the index plus a slice.
+    """
+    ordered = agg_df.sort_values(["student_id", "accuracy_mean"], kind="mergesort", na_position="last")
+    return ordered.set_index("student_id")
+
+
+@traced
 def recommend_next_topic(student_id: str, agg_df: pd.DataFrame, top_n: int = 3) -> Dict[str, Any]:
     """Recommend topics that need more practice for the student (ranked by weakness).
 
@@ -197,24 +638,61 @@ def recommend_next_topic(student_id: str, agg_df: pd.DataFrame, top_n: int = 3)
     - For the student, find topics with lowest accuracy_mean and label Beginner/Intermediate/Advanced
     - Recommend the bottom `top_n` topics for practice
     - Suggest difficulty: if current accuracy < 0.4 -> easy, 0.4-0.7 -> medium, else hard
+
+    `agg_df` may be indexed by student_id, e.g. by `index_by_student`. A sorted
+    index turns the lookup into an O(log n) search plus a sort of that
+    student's few rows; an unsorted one falls back to the scan.
     """
-    s = agg_df[agg_df["student_id"] == student_id]
+    by_index = agg_df.index.name == "student_id"
+    if by_index and agg_df.index.is_monotonic_increasing:
+        lo = agg_df.index.searchsorted(student_id, side="left")
+        hi = agg_df.index.searchsorted(student_id, side="right")
+        s = agg_df.iloc[lo:hi].sort_values("accuracy_mean", kind="mergesort").head(top_n)
+    else:
+        if by_index and "student_id" not in agg_df.columns:
+            agg_df = agg_df.reset_index()
+        s = agg_df[agg_df["student_id"] == student_id]
+        s = s.sort_values("accuracy_mean", kind="mergesort").head(top_n)
     if s.empty:
         return {"recommendations": [], "reason": "no_data"}
 
-    s = s.sort_values("accuracy_mean")
-    recs = []
-    for _, row in s.head(top_n).iterrows():
-        acc = row["accuracy_mean"]
-        if acc < 0.4:
-            diff = "easy"
-        elif acc < 0.7:
-            diff = "medium"
-        else:
-            diff = "hard"
-        recs.append({"topic": row["topic"], "accuracy": float(acc), "recommended_difficulty": diff})
+    return {"recommendations": _recommendation_records(s), "student_id": student_id}
+
+
+@traced
+def recommend_next_topics_batch(agg_df: pd.DataFrame, top_n: int = 3, student_ids=None) -> pd.DataFrame:
+    """Recommend the `top_n` weakest topics for every student in one grouped pass.
+
+    Returns a long frame with columns student_id, rank (1 = weakest), topic,
+    accuracy and recommended_difficulty, ordered by student and rank; the rows per
+    student are the ones `recommend_next_topic` would return. Pass `student_ids`
+    to restrict the result to a class roster.
+    """
+    df = agg_df
+    if student_ids is not None:
+        df = df[df["student_id"].isin(list(student_ids))]
+    ordered = df.sort_values(["student_id", "accuracy_mean"], kind="mergesort", na_position="last")
+    top = ordered.groupby("student_id", sort=False, observed=True).head(top_n)
+
+    out = pd.DataFrame({
+        "student_id": top["student_id"].to_numpy(),
+        "rank": top.groupby("student_id", sort=False, observed=True).cumcount().to_numpy() + 1,
+        "topic": top["topic"].to_numpy(),
+        "accuracy": top["accuracy_mean"].to_numpy(dtype=float),
+    })
+    out["recommended_difficulty"] = _recommended_difficulty(out["accuracy"])
+    return out
+
 
-    return {"recommendations": recs, "student_id": student_id}
+@traced
+def batch_to_dicts(batch: pd.DataFrame) -> Dict[Any, Dict[str, Any]]:
+    """Convert `recommend_next_topics_batch` output to {student_id: recommend_next_topic-style dict}."""
+    result: Dict[Any, Dict[str, Any]] = {}
+    for sid, topic, acc, diff in zip(batch["student_id"].tolist(), batch["topic"].tolist(),
+                                     batch["accuracy"].tolist(), batch["recommended_difficulty"].tolist()):
+        entry = result.setdefault(sid, {"recommendations": [], "student_id": sid})
+        entry["recommendations"].append({"topic": topic, "accuracy": float(acc), "recommended_difficulty": diff})
+    return result
 
 
 if __name__ == "__main__":
@@ -223,7 +701,7 @@ if __name__ == "__main__":
     df = load_data("data/sample_attempts.csv")
     df = preprocess(df)
     agg = aggregate_features(df)
-    km, clustered = cluster_students(agg)
+    km, clustered = cluster_students(agg, mode="minibatch")
     models = train_topic_classifier(clustered)
     preds = predict_mastery(models, agg)
     print(preds.head())
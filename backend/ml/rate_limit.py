@@ -0,0 +1,315 @@
+"""Client-side quota for model calls: token buckets plus retry with backoff.
+
+`RateLimiter` keeps two token buckets, requests per minute and tokens per
+minute. Each refills continuously and holds at most one minute of quota.
+`acquire(tokens)` blocks until both buckets can pay for the call, so a burst
+of uploads is paced at the quota ceiling instead of tripping 429s. The bucket
+state lives in a backend that decides who shares the quota:
+
+- `LocalBackend`: this process only;
+- `FileBackend`: every process on the host, through an fcntl-locked state file;
+- `RedisBackend`: every process that can reach the Redis `ml.worker` uses.
+  The refill runs as one Lua script on Redis time. If Redis is unreachable
+  the call falls back to a local bucket rather than failing.
+
+`call_with_retries` retries rate-limit and transient server errors with
+full-jitter exponential backoff. It never waits less than the server's
+retry-after hint. On a rate-limit error it also `pause`s the limiter, so
+other callers back off too instead of hammering the quota. When the retries
+run out it raises `RateLimitError`.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_TOKENS = 512
+DEFAULT_MAX_RETRIES = 4
+
+# state: (request tokens, model tokens, last refill time, paused until); None buckets are full
+State = Tuple[Optional[float], Optional[float], float, float]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+class RateLimitError(RuntimeError):
+    """The model kept answering with rate-limit errors after every retry.
+
+    `retry_after` is the suggested wait in seconds, when one is known.
+    """
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _take(state: Optional[State], now: float, rpm: float, tpm: float, tokens: float) -> Tuple[State, float]:
+    """Refill, then either spend (1 request, `tokens`) and return wait 0, or return the wait needed."""
+    r, t, ts, until = state if state is not None else (None, None, now, 0.0)
+    r = rpm if r is None else r
+    t = tpm if t is None else t
+    dt = max(0.0, now - ts)
+    if rpm > 0:
+        r = min(rpm, r + dt * rpm / 60.0)
+    if tpm > 0:
+        t = min(tpm, t + dt * tpm / 60.0)
+        tokens = min(tokens, tpm)  # one oversized call must still get through eventually
+    wait = max(0.0, until - now)
+    if rpm > 0 and r < 1:
+        wait = max(wait, (1 - r) * 60.0 / rpm)
+    if tpm > 0 and t < tokens:
+        wait = max(wait, (tokens - t) * 60.0 / tpm)
+    if wait == 0:
+        r -= 1 if rpm > 0 else 0
+        t -= tokens if tpm > 0 else 0
+    return (r, t, now, until), wait
+
+
+class LocalBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Optional[State] = None
+
+    def take(self, rpm: float, tpm: float, tokens: float) -> float:
+        with self._lock:
+            self._state, wait = _take(self._state, time.time(), rpm, tpm, tokens)
+            return wait
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            r, t, ts, until = self._state or (None, None, time.time(), 0.0)
+            self._state = (r, t, ts, max(until, time.time() + seconds))
+
+
+class FileBackend:
+    """Bucket state in a small JSON file, serialised with an exclusive flock."""
+
+    def __init__(self, path: str):
+        import fcntl  # POSIX only; use LocalBackend or RedisBackend elsewhere
+
+        self._fcntl = fcntl
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _update(self, fn: Callable[[Optional[State]], Tuple[State, Any]]) -> Any:
+        with self._lock, open(self.path, "a+") as fh:
+            self._fcntl.flock(fh, self._fcntl.LOCK_EX)
+            try:
+                fh.seek(0)
+                try:
+                    state = tuple(json.loads(fh.read()))
+                except ValueError:
+                    state = None
+                state, result = fn(state)
+                fh.seek(0)
+                fh.truncate()
+                fh.write(json.dumps(list(state)))
+                fh.flush()
+                return result
+            finally:
+                self._fcntl.flock(fh, self._fcntl.LOCK_UN)
+
+    def take(self, rpm: float, tpm: float, tokens: float) -> float:
+        return self._update(lambda state: _take(state, time.time(), rpm, tpm, tokens))
+
+    def pause(self, seconds: float) -> None:
+        def extend(state):
+            r, t, ts, until = state or (None, None, time.time(), 0.0)
+            return (r, t, ts, max(until, time.time() + seconds)), None
+        self._update(extend)
+
+
+_REDIS_TAKE = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rpm, tpm, need = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local s = redis.call('HMGET', KEYS[1], 'r', 't', 'ts', 'until')
+local r, t = tonumber(s[1]) or rpm, tonumber(s[2]) or tpm
+local ts, untl = tonumber(s[3]) or now, tonumber(s[4]) or 0
+local dt = math.max(0, now - ts)
+if rpm > 0 then r = math.min(rpm, r + dt * rpm / 60) end
+if tpm > 0 then
+  t = math.min(tpm, t + dt * tpm / 60)
+  need = math.min(need, tpm)
+end
+local wait = math.max(0, untl - now)
+if rpm > 0 and r < 1 then wait = math.max(wait, (1 - r) * 60 / rpm) end
+if tpm > 0 and t < need then wait = math.max(wait, (need - t) * 60 / tpm) end
+if wait == 0 then
+  if rpm > 0 then r = r - 1 end
+  if tpm > 0 then t = t - need end
+end
+redis.call('HSET', KEYS[1], 'r', r, 't', t, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+_REDIS_PAUSE = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local untl = tonumber(redis.call('HGET', KEYS[1], 'until')) or 0
+redis.call('HSET', KEYS[1], 'until', math.max(untl, now + tonumber(ARGV[1])))
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 120)
+return 1
+"""
+
+
+class RedisBackend:
+    def __init__(self, conn: Any = None, key: str = "ml:ratelimit:gemini"):
+        if conn is None:
+            import redis
+
+            conn = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), socket_connect_timeout=1)
+        self.conn = conn
+        self.key = key
+        self._take = conn.register_script(_REDIS_TAKE)
+        self._pause = conn.register_script(_REDIS_PAUSE)
+        self._fallback = LocalBackend()
+
+    def take(self, rpm: float, tpm: float, tokens: float) -> float:
+        try:
+            return float(self._take(keys=[self.key], args=[rpm, tpm, tokens]))
+        except Exception as e:
+            logger.warning("Redis rate limiter unavailable, limiting locally: %s", e)
+            return self._fallback.take(rpm, tpm, tokens)
+
+    def pause(self, seconds: float) -> None:
+        try:
+            self._pause(keys=[self.key], args=[seconds])
+        except Exception:
+            self._fallback.pause(seconds)
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = 0, tpm: float = 0, backend: Any = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.backend = backend or LocalBackend()
+        self.waited = 0.0
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """Block until one request of `tokens` fits both buckets; return the seconds waited."""
+        start = time.monotonic()
+        while True:
+            wait = self.backend.take(self.rpm, self.tpm, tokens)
+            if wait <= 0:
+                waited = time.monotonic() - start
+                self.waited += waited
+                return waited
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise RateLimitError(f"rate limiter would block for more than {timeout}s", retry_after=wait)
+            # Small jitter so processes woken together do not race for the same refill
+            time.sleep(wait + random.uniform(0, 0.05))
+
+    def pause(self, seconds: float) -> None:
+        """Stop every caller sharing this backend for `seconds` (e.g. after a 429)."""
+        self.backend.pause(seconds)
+
+
+_RETRY_DELAY = re.compile(r"retry[-_ ]?(?:after|delay)['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)", re.I)
+
+
+def _status(err: BaseException) -> Optional[int]:
+    for attr in ("code", "status_code", "status"):
+        value = getattr(err, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(err, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_rate_limited(err: BaseException) -> bool:
+    text = str(err)
+    return _status(err) == 429 or "RESOURCE_EXHAUSTED" in text or bool(re.search(r"\b429\b", text))
+
+
+def is_retryable(err: BaseException) -> bool:
+    status = _status(err)
+    return is_rate_limited(err) or status in (500, 502, 503, 504) or "UNAVAILABLE" in str(err)
+
+
+def retry_after(err: BaseException) -> Optional[float]:
+    """Server-suggested delay in seconds, from a retry_after attribute, Retry-After header or retryDelay detail."""
+    value = getattr(err, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    try:
+        if headers.get("Retry-After") is not None:
+            return float(headers["Retry-After"])
+    except (TypeError, ValueError, AttributeError):
+        pass
+    m = _RETRY_DELAY.search(str(err))
+    return float(m.group(1)) if m else None
+
+
+def call_with_retries(fn: Callable[[], Any], max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 1.0,
+                      max_delay: float = 60.0, limiter: Optional[RateLimiter] = None,
+                      sleep: Callable[[float], None] = time.sleep) -> Any:
+    """Call `fn`, retrying retryable errors with full-jitter exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            if attempt == max_retries:
+                if is_rate_limited(e):
+                    raise RateLimitError(f"model still rate limited after {max_retries} retries: {e}",
+                                         retry_after=retry_after(e)) from e
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            hint = retry_after(e)
+            if hint is not None:
+                delay = max(delay, min(hint, max_delay))
+            if limiter is not None and is_rate_limited(e):
+                limiter.pause(delay)
+            logger.info("model call failed (%s), retry %d/%d in %.1fs", e, attempt + 1, max_retries, delay)
+            sleep(delay)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> Optional[RateLimiter]:
+    """Process-wide limiter from GEMINI_RPM / GEMINI_TPM; None when neither is set.
+
+    GEMINI_RATE_BACKEND picks the shared state: "redis" (REDIS_URL), "file"
+    (GEMINI_RATE_FILE, default in the temp dir) or "local". The default is
+    redis when REDIS_URL is set, else file.
+    """
+    global _limiter
+    rpm = float(os.getenv("GEMINI_RPM", "0"))
+    tpm = float(os.getenv("GEMINI_TPM", "0"))
+    if rpm <= 0 and tpm <= 0:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                kind = os.getenv("GEMINI_RATE_BACKEND", "redis" if os.getenv("REDIS_URL") else "file")
+                if kind == "redis":
+                    backend = RedisBackend()
+                elif kind == "file":
+                    try:
+                        backend = FileBackend(os.getenv("GEMINI_RATE_FILE",
+                                                        os.path.join(tempfile.gettempdir(), "assesify_gemini_rate.json")))
+                    except ImportError:
+                        backend = LocalBackend()
+                else:
+                    backend = LocalBackend()
+                _limiter = RateLimiter(rpm=rpm, tpm=tpm, backend=backend)
+    return _limiter
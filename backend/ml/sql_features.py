@@ -0,0 +1,214 @@
+"""Compute the mastery features inside the database.
+
+`extract_features` returns the columns of `pipeline.aggregate_features` per
+(student_id, topic) straight from `quiz_attempts`, `quiz_answers`, `quizzes`
+and `lessons`, optionally limited to one class or one teacher's lessons, so
+raw attempt rows never have to be pulled into Python.
+
+On PostgreSQL everything is a single aggregate query (avg, stddev_pop,
+regr_slope over epoch seconds, FILTERed averages per difficulty). On SQLite
+the query aggregates grouped sums (julianday for the timestamps) and
+`pipeline.finalize_partial_aggregates` finishes the arithmetic. Other dialects
+raise ValueError.
+
+The SQLite path is checked against `aggregate_features(preprocess(...))` in the
+test suite. The PostgreSQL query is unverified: its parity test only runs with
+TEST_POSTGRES_URL set (e.g. against the docker-compose database), and nothing
+runs it automatically.
+
+Per attempt: student_id = user_id, topic = lessons.topic (or "general"),
+total_questions / correct_answers come from quiz_answers, time taken is
+completed_at - started_at and the attempt date is completed_at. Missing times
+are filled with the median, as `pipeline.preprocess` does.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from ml.pipeline import DIFFICULTY_LEVELS, FEATURE_OUTPUT_COLUMNS, finalize_partial_aggregates
+
+DEFAULT_TOPIC = "general"
+
+# Seconds between two timestamps and seconds since the epoch, per dialect
+_EXPRESSIONS = {
+    "postgresql": {
+        "elapsed": "CAST(EXTRACT(EPOCH FROM (qa.completed_at - qa.started_at)) AS DOUBLE PRECISION)",
+        "epoch": "CAST(EXTRACT(EPOCH FROM qa.completed_at) AS DOUBLE PRECISION)",
+    },
+    "sqlite": {
+        "elapsed": "(julianday(qa.completed_at) - julianday(qa.started_at)) * 86400.0",
+        "epoch": "(julianday(qa.completed_at) - 2440587.5) * 86400.0",
+    },
+}
+
+_ATTEMPTS_CTE = """
+WITH answer_counts AS (
+    SELECT a.attempt_id,
+           COUNT(*) AS n_answers,
+           SUM(CASE WHEN a.is_correct THEN 1 ELSE 0 END) AS n_correct
+    FROM quiz_answers a
+    GROUP BY a.attempt_id
+), attempts AS (
+    SELECT qa.user_id AS student_id,
+           COALESCE(l.topic, :default_topic) AS topic,
+           qa.difficulty AS difficulty,
+           COALESCE(ac.n_answers, 1) AS total_questions,
+           CAST(COALESCE(ac.n_correct, 0) AS DOUBLE PRECISION) / COALESCE(ac.n_answers, 1) AS accuracy,
+           {elapsed} AS time_taken,
+           {epoch} AS x
+    FROM quiz_attempts qa
+    JOIN quizzes q ON q.id = qa.quiz_id
+    JOIN lessons l ON l.id = q.lesson_id
+    LEFT JOIN answer_counts ac ON ac.attempt_id = qa.id
+    WHERE 1 = 1 {filters}
+)
+"""
+
+_POSTGRES_FEATURES = """
+, filled AS (
+    SELECT attempts.*,
+           COALESCE(time_taken, (SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY time_taken) FROM attempts))
+               / total_questions AS avg_time
+    FROM attempts
+)
+SELECT student_id,
+       topic,
+       AVG(accuracy) AS accuracy_mean,
+       CASE WHEN COUNT(*) > 1 THEN stddev_pop(accuracy) ELSE 0.0 END AS accuracy_std,
+       AVG(avg_time) AS avg_time_mean,
+       COUNT(*) AS attempts_count,
+       COALESCE(regr_slope(accuracy, x), 0.0) AS improvement_slope,
+       {success}
+FROM filled
+GROUP BY student_id, topic
+ORDER BY student_id, topic
+"""
+
+_SQLITE_SUMS = """
+, shifted AS (
+    SELECT attempts.*,
+           x - MIN(x) OVER (PARTITION BY student_id, topic) AS dx,
+           time_taken / total_questions AS avg_time
+    FROM attempts
+)
+SELECT student_id,
+       topic,
+       COUNT(*) AS attempts_count,
+       COUNT(accuracy) AS n_accuracy,
+       COALESCE(SUM(accuracy), 0.0) AS sum_accuracy,
+       COALESCE(SUM(accuracy * accuracy), 0.0) AS sum_sq_accuracy,
+       COUNT(avg_time) AS n_time,
+       COALESCE(SUM(avg_time), 0.0) AS sum_time,
+       COUNT(CASE WHEN time_taken IS NULL THEN 1 END) AS n_missing_time,
+       COALESCE(SUM(CASE WHEN time_taken IS NULL THEN 1.0 / total_questions END), 0.0) AS sum_inv_questions,
+       MIN(x) AS x0,
+       MAX(x) AS x_max,
+       SUM(dx) AS sx,
+       COALESCE(SUM(dx * accuracy), 0.0) AS sxy,
+       SUM(dx * dx) AS sxx,
+       {difficulty_sums}
+FROM shifted
+GROUP BY student_id, topic
+ORDER BY student_id, topic
+"""
+
+_SQLITE_MEDIAN = """
+SELECT AVG(time_taken) FROM (
+    SELECT time_taken FROM attempts
+    WHERE time_taken IS NOT NULL
+    ORDER BY time_taken
+    LIMIT 2 - (SELECT COUNT(time_taken) FROM attempts) % 2
+    OFFSET ((SELECT COUNT(time_taken) FROM attempts) - 1) / 2
+) AS middle
+"""
+
+
+def _connection(bind: Any):
+    """Accept an Engine, Connection or (Flask-)SQLAlchemy Session."""
+    if hasattr(bind, "get_bind"):
+        return bind.connection()
+    return bind
+
+
+def _dialect(bind: Any) -> str:
+    name = bind.dialect.name if hasattr(bind, "dialect") else bind.get_bind().dialect.name
+    if name not in _EXPRESSIONS:
+        raise ValueError(f"extract_features supports {sorted(_EXPRESSIONS)}, not the {name!r} dialect")
+    return name
+
+
+def _attempts_cte(dialect: str, class_id: Optional[int], teacher_id: Optional[int]) -> Tuple[str, Dict[str, Any]]:
+    filters = []
+    params: Dict[str, Any] = {"default_topic": DEFAULT_TOPIC}
+    if class_id is not None:
+        filters.append("AND qa.class_id = :class_id")
+        params["class_id"] = class_id
+    if teacher_id is not None:
+        filters.append("AND l.teacher_id = :teacher_id")
+        params["teacher_id"] = teacher_id
+    sql = _ATTEMPTS_CTE.format(filters=" ".join(filters), **_EXPRESSIONS[dialect])
+    return sql, params
+
+
+def extract_features(bind: Any, class_id: Optional[int] = None, teacher_id: Optional[int] = None) -> pd.DataFrame:
+    """Return `aggregate_features` columns per (student_id, topic) computed by the database.
+
+    bind: SQLAlchemy Engine, Connection or Session (e.g. `db.session`)
+    class_id: only attempts taken in this class
+    teacher_id: only attempts on lessons created by this teacher
+    """
+    dialect = _dialect(bind)
+    conn = _connection(bind)
+    cte, params = _attempts_cte(dialect, class_id, teacher_id)
+
+    if dialect == "postgresql":
+        success = ",\n       ".join(
+            f"COALESCE(AVG(accuracy) FILTER (WHERE difficulty = '{level}'), 0.0) AS success_{level}"
+            for level in DIFFICULTY_LEVELS
+        )
+        out = pd.read_sql(text(cte + _POSTGRES_FEATURES.format(success=success)), conn, params=params)
+        out["attempts_count"] = out["attempts_count"].astype(np.int64)
+        return out[FEATURE_OUTPUT_COLUMNS]
+
+    difficulty_sums = ",\n       ".join(
+        f"COUNT(CASE WHEN difficulty = '{level}' THEN accuracy END) AS n_{level},\n"
+        f"       COALESCE(SUM(CASE WHEN difficulty = '{level}' THEN accuracy END), 0.0) AS sum_{level}"
+        for level in DIFFICULTY_LEVELS
+    )
+    state = pd.read_sql(text(cte + _SQLITE_SUMS.format(difficulty_sums=difficulty_sums)), conn, params=params)
+    median = conn.execute(text(cte + _SQLITE_MEDIAN), params).scalar()
+
+    # accuracy is always finite here (total_questions >= 1)
+    state["n_finite"] = state["n_accuracy"]
+    state["sum_finite"] = state["sum_accuracy"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m2 = state["sum_sq_accuracy"] - state["sum_accuracy"] ** 2 / state["n_accuracy"]
+    state["m2_finite"] = m2.clip(lower=0.0).fillna(0.0)
+    return finalize_partial_aggregates(state, time_fill=median)
+
+
+def load_attempts(bind: Any, class_id: Optional[int] = None, teacher_id: Optional[int] = None) -> pd.DataFrame:
+    """Return the raw attempt rows behind `extract_features` in the `load_data` layout.
+
+    Meant for checking the SQL path against `aggregate_features(preprocess(...))`;
+    day-to-day callers should use `extract_features`.
+    """
+    dialect = _dialect(bind)
+    conn = _connection(bind)
+    cte, params = _attempts_cte(dialect, class_id, teacher_id)
+    sql = cte + """
+SELECT student_id, topic, difficulty, total_questions,
+       accuracy * total_questions AS correct_answers,
+       time_taken AS time_taken_seconds,
+       x AS epoch
+FROM attempts
+ORDER BY student_id, topic
+"""
+    df = pd.read_sql(text(sql), conn, params=params)
+    df["correct_answers"] = df["correct_answers"].round()
+    df["attempt_date"] = pd.to_datetime(df.pop("epoch"), unit="s")
+    return df
@@ -0,0 +1,141 @@
+"""Seeded generator of realistic quiz-attempt logs for tests and benchmarks.
+
+The logs have the columns of `data/sample_attempts.csv` (`pipeline.ATTEMPT_COLUMNS`)
+and a bit of the structure real data has, so aggregation, clustering and the
+mastery labels see more than uniform noise:
+
+- every student has a latent ability, every topic a latent hardness;
+- topics and students are Zipf-skewed (`skew`, `student_skew`): a few popular
+  topics and very active students, a long tail of rare ones;
+- the chance of a correct answer is a logistic of ability - hardness - the
+  difficulty level, plus a per-(student, topic) learning trend over the year;
+- slower students take longer per question; `missing_time` of the durations
+  are left empty, as with attempts that were never timed.
+
+`generate_attempts` returns one frame; `iter_attempts` yields rows in chunks so
+logs larger than RAM can be written to disk (`write_attempts`). Output is fully
+determined by the arguments, including `chunksize`. `generate_cluster_features`
+draws per-student clustering features around a few well-separated profiles.
+"""
+from __future__ import annotations
+
+import os
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml.pipeline import ATTEMPT_COLUMNS, DIFFICULTY_LEVELS
+
+_DIFFICULTY_NAMES = np.array(list(DIFFICULTY_LEVELS))
+_DIFFICULTY_PENALTY = np.array([-0.6, 0.0, 0.7])
+_START = pd.Timestamp("2025-01-01")
+_YEAR_SECONDS = 365 * 86400
+# accuracy_mean, avg_time_mean, improvement_slope of a struggling, an average and a strong student
+_PROFILES = np.array([
+    [0.35, 75.0, -0.002],
+    [0.65, 45.0, 0.000],
+    [0.90, 25.0, 0.003],
+])
+
+
+def _zipf_weights(n: int, skew: float) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1) ** skew
+    return w / w.sum()
+
+
+class _Population:
+    """Per-student and per-topic latent parameters, fixed for a given seed."""
+
+    def __init__(self, n_students: int, n_topics: int, skew: float, student_skew: float, seed: int):
+        rng = np.random.default_rng(seed)
+        self.n_students = n_students
+        self.n_topics = n_topics
+        self.ability = rng.normal(0.8, 1.0, n_students)
+        self.hardness = rng.normal(0.0, 0.6, n_topics)
+        self.pace = rng.lognormal(np.log(45.0), 0.35, n_students)  # seconds per question
+        # Shuffle so the most active ids are not always s0, s1, ...
+        self.student_weights = rng.permutation(_zipf_weights(n_students, student_skew))
+        self.topic_weights = rng.permutation(_zipf_weights(n_topics, skew))
+        self.learning_seed = int(rng.integers(2**31))
+
+    def learning_rate(self, student: np.ndarray, topic: np.ndarray) -> np.ndarray:
+        # Deterministic per (student, topic) so every chunk agrees on a pair's trend
+        key = student.astype(np.uint64) * np.uint64(1_000_003) + topic.astype(np.uint64)
+        key = (key ^ np.uint64(self.learning_seed)) * np.uint64(0x9E3779B97F4A7C15)
+        unit = (key >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+        return 1.5 * unit - 0.3  # logit gain over a year, mostly positive
+
+
+def iter_attempts(n_rows: int, n_students: Optional[int] = None, n_topics: int = 50, skew: float = 1.0,
+                  student_skew: float = 0.6, missing_time: float = 0.01, seed: int = 0,
+                  chunksize: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Yield `n_rows` synthetic attempts in chunks of at most `chunksize` rows.
+
+    `n_students` defaults to one per 40 attempts; a skew of 0 makes popularity uniform.
+    """
+    n_students = n_students or max(1, n_rows // 40)
+    pop = _Population(n_students, n_topics, skew, student_skew, seed)
+    rng = np.random.default_rng([seed, 1])
+    for start in range(0, n_rows, chunksize):
+        n = min(chunksize, n_rows - start)
+        student = rng.choice(n_students, n, p=pop.student_weights)
+        topic = rng.choice(n_topics, n, p=pop.topic_weights)
+        level = rng.choice(3, n, p=[0.4, 0.4, 0.2])
+        when = rng.integers(0, _YEAR_SECONDS, n)
+
+        logit = (pop.ability[student] - pop.hardness[topic] - _DIFFICULTY_PENALTY[level]
+                 + pop.learning_rate(student, topic) * (when / _YEAR_SECONDS - 0.5))
+        total = rng.integers(5, 21, n)
+        correct = rng.binomial(total, 1.0 / (1.0 + np.exp(-logit)))
+        seconds = np.round(total * pop.pace[student] * (1.0 + 0.25 * level) * rng.lognormal(0.0, 0.2, n))
+        seconds[rng.random(n) < missing_time] = np.nan
+
+        chunk = pd.DataFrame({
+            "student_id": np.char.add("s", student.astype(str)),
+            "topic": np.char.add("topic_", topic.astype(str)),
+            "difficulty": _DIFFICULTY_NAMES[level],
+            "total_questions": total,
+            "correct_answers": correct,
+            "time_taken_seconds": seconds,
+            "attempt_date": _START + pd.to_timedelta(when, unit="s"),
+        })
+        yield chunk[ATTEMPT_COLUMNS]
+
+
+def generate_attempts(n_rows: int, **kwargs) -> pd.DataFrame:
+    """Return `n_rows` synthetic attempts as one frame (see `iter_attempts` for the options)."""
+    return pd.concat(list(iter_attempts(n_rows, **kwargs)), ignore_index=True)
+
+
+def generate_cluster_features(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Return `n_rows` clustering feature rows drawn around `_PROFILES` with per-feature noise."""
+    rng = np.random.default_rng(seed)
+    centre = _PROFILES[rng.integers(0, len(_PROFILES), n_rows)]
+    noise = rng.normal(size=(n_rows, 3)) * np.array([0.08, 12.0, 0.002])
+    X = centre + noise
+    return pd.DataFrame({"accuracy_mean": X[:, 0], "avg_time_mean": X[:, 1], "improvement_slope": X[:, 2]})
+
+
+def write_attempts(path: str, n_rows: int, **kwargs) -> str:
+    """Stream synthetic attempts to a CSV (or .parquet with pyarrow) file without holding them all."""
+    if path.endswith((".parquet", ".pq")):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in iter_attempts(n_rows, **kwargs):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
+
+    if os.path.exists(path):
+        os.remove(path)
+    for i, chunk in enumerate(iter_attempts(n_rows, **kwargs)):
+        chunk.to_csv(path, mode="a", header=i == 0, index=False)
+    return path
@@ -4,6 +4,11 @@ This module is intentionally small and easy to test. It exposes `process_uploade
 which extracts text, runs the ML pipeline to recommend topics/difficulty, calls Gemini
 (via `ml.genai.GeminiClient`) to generate quizzes, validates them with Pydantic, and
 persists a JSON result file in `uploads/` alongside the original document.
+
+`refresh_mastery_view` is the `ml-tasks` job that recomputes the dirty rows of the
+materialized mastery/recommendation table; `enqueue_mastery_refresh` queues it
+at most once until it starts. Quiz submissions enqueue it (MASTERY_REFRESH_ON_SUBMIT)
+and `python -m ml.worker` also enqueues it every MASTERY_REFRESH_INTERVAL seconds.
 """
 from __future__ import annotations
 
@@ -15,7 +20,7 @@ from typing import Dict, Any
 from ml.utils.pdf_utils import extract_text_from_pdf
 from ml.utils.text_cleaner import clean_text
 from ml.pipeline import preprocess, aggregate_features, recommend_next_topic
-from ml.gemini import GeminiClient
+from ml.gemini import get_client
 from ml.gemini_prompt import build_quiz_prompt
 from ml.schemas import QuizItem
 
@@ -61,7 +66,7 @@ def process_uploaded_file(saved_path: str, title: str = "", num_questions: int =
         difficulty = "hard"
 
     # Prepare Gemini prompt and call model
-    client = GeminiClient()
+    client = get_client()
     prompt = build_quiz_prompt(topic=topic, difficulty=difficulty, n_questions=num_questions)
 
     try:
@@ -89,3 +94,78 @@ def process_uploaded_file(saved_path: str, title: str = "", num_questions: int =
     out_path = _write_quiz_output(saved_path, out)
 
     return {"status": "ok", "output_path": out_path, "quiz": out["quiz"]}
+
+
+MASTERY_REFRESH_PENDING_KEY = "ml-tasks:mastery-refresh-pending"
+MASTERY_REFRESH_LOCK_KEY = "ml-tasks:mastery-refresh-lock"
+# Longest a refresh may hold the lock; it expires on its own if the worker dies mid-run
+MASTERY_REFRESH_LOCK_SECONDS = 3600
+# After Redis was unreachable, submissions skip the enqueue for this long instead of each waiting on it
+ENQUEUE_RETRY_SECONDS = 30
+
+
+def refresh_mastery_view(batch_size: int = 500) -> Dict[str, Any]:
+    """RQ job: recompute MasteryView rows for users whose TopicStats changed since the last run.
+
+    Runs hold a Redis lock for their whole duration, so jobs picked up by
+    different workers run one after another and never allocate the same
+    view version or rewrite the same rows at once.
+    """
+    from contextlib import nullcontext
+    from rq import get_current_job
+    from app.main import app
+    from app.models.performance import MasteryView
+
+    job = get_current_job()
+    lock = nullcontext() if job is None else job.connection.lock(
+        MASTERY_REFRESH_LOCK_KEY, timeout=MASTERY_REFRESH_LOCK_SECONDS,
+        blocking_timeout=MASTERY_REFRESH_LOCK_SECONDS)
+    with lock:
+        if job is not None:
+            # Clear the flag before reading dirty rows, so submissions from now on queue a fresh run
+            job.connection.delete(MASTERY_REFRESH_PENDING_KEY)
+        with app.app_context():
+            version, users = MasteryView.refresh_dirty(batch_size=batch_size)
+    return {"status": "ok", "version": version, "users": users}
+
+
+_redis_connections: Dict[str, Any] = {}
+_redis_down_until = 0.0
+
+
+def _redis_connection(url: str):
+    """One client (and so one connection pool) per URL for the whole process."""
+    conn = _redis_connections.get(url)
+    if conn is None:
+        import redis
+
+        conn = _redis_connections.setdefault(url, redis.from_url(url, socket_connect_timeout=1))
+    return conn
+
+
+def enqueue_mastery_refresh(redis_url: str | None = None):
+    """Queue `refresh_mastery_view` on `ml-tasks` unless a run is already waiting.
+
+    Returns the enqueued job, or None when one was pending. Raises when Redis
+    is unreachable; for ENQUEUE_RETRY_SECONDS after that it raises at once
+    without trying to connect.
+    """
+    global _redis_down_until
+    import redis
+    from rq import Queue
+
+    if time.monotonic() < _redis_down_until:
+        raise RuntimeError("Redis was unreachable recently; skipping the enqueue")
+    conn = _redis_connection(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    try:
+        if not conn.set(MASTERY_REFRESH_PENDING_KEY, 1, nx=True, ex=3600):
+            return None
+    except (redis.ConnectionError, redis.TimeoutError):
+        _redis_down_until = time.monotonic() + ENQUEUE_RETRY_SECONDS
+        raise
+    try:
+        return Queue("ml-tasks", connection=conn).enqueue(refresh_mastery_view)
+    except Exception:
+        # Nothing was queued, so don't let the flag hold off the next submission's refresh
+        conn.delete(MASTERY_REFRESH_PENDING_KEY)
+        raise
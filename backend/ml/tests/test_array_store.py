@@ -0,0 +1,42 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import numpy as np
+import pytest
+
+from ml.array_store import load_arrays, save_arrays
+
+
+def test_array_store_roundtrip_is_memory_mapped(tmp_path):
+    arrays = {
+        "ints": np.arange(10, dtype=np.int32).reshape(2, 5),
+        "floats": np.linspace(0, 1, 7),
+        "labels": np.array(["Advanced", "Beginner"]),
+        "empty": np.zeros((0, 3)),
+    }
+    path = save_arrays(str(tmp_path / "m.forest"), arrays, {"max_depth": 4})
+
+    for mmap_mode in (True, False):
+        loaded, meta = load_arrays(path, mmap_mode=mmap_mode)
+        assert meta == {"max_depth": 4}
+        for name, a in arrays.items():
+            np.testing.assert_array_equal(loaded[name], a)
+            assert loaded[name].dtype == a.dtype
+    assert not loaded["floats"].flags.writeable
+
+    with pytest.raises(TypeError):
+        save_arrays(str(tmp_path / "bad"), {"obj": np.array([{}], dtype=object)})
+
+
+def test_concurrent_saves_of_one_path_never_mix(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    path = str(tmp_path / "shared.rows")
+    versions = [{"hashes": np.full(200_000, i, dtype=np.uint64)} for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda arrays: save_arrays(path, arrays), versions))
+
+    hashes = load_arrays(path, mmap_mode=False)[0]["hashes"]
+    assert len(np.unique(hashes)) == 1 and len(hashes) == 200_000
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["shared.rows"]
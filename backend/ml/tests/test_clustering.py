@@ -0,0 +1,45 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import numpy as np
+import pytest
+
+from ml.synthetic import generate_cluster_features
+from ml.clustering import (assign_clusters, fit_streaming_clusters, load_clusterer,
+                           partial_fit_clusters, save_clusterer)
+from ml.pipeline import cluster_students
+
+
+def test_streaming_clusters_persist_and_assign(tmp_path):
+    feats = generate_cluster_features(3000, seed=1)
+    chunks = [feats.iloc[:2], feats.iloc[2:1500], feats.iloc[1500:]]
+    model = fit_streaming_clusters(iter(chunks), n_clusters=3, batch_size=256)
+    assert model.cluster_centers_.shape == (3, 3)
+
+    path = save_clusterer(model, str(tmp_path / "clusters.joblib"))
+    loaded = load_clusterer(path)
+    new_students = generate_cluster_features(200, seed=2)
+    np.testing.assert_array_equal(assign_clusters(new_students, loaded), loaded.predict(new_students.values))
+
+    steps = loaded.n_steps_
+    partial_fit_clusters(loaded, new_students)
+    assert loaded.n_steps_ > steps
+
+    with pytest.raises(ValueError):
+        fit_streaming_clusters(feats.iloc[:2], n_clusters=3)
+
+
+def test_cluster_students_minibatch_mode(tmp_path):
+    feats = generate_cluster_features(500, seed=3)
+    path = str(tmp_path / "clusters.joblib")
+    model, clustered = cluster_students(feats, mode="minibatch", batch_size=100, model_path=path)
+    assert clustered["cluster"].nunique() == 3
+    assert hasattr(model, "partial_fit")
+
+    # The next run continues from the saved centroids instead of refitting
+    steps = load_clusterer(path).n_steps_
+    new_students = generate_cluster_features(200, seed=4)
+    again, labelled = cluster_students(new_students, mode="minibatch", batch_size=100, model_path=path)
+    assert again.n_steps_ == steps + 2 and load_clusterer(path).n_steps_ == steps + 2
+    np.testing.assert_array_equal(labelled["cluster"], assign_clusters(new_students, again))
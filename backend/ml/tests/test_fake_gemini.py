@@ -0,0 +1,53 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import pytest
+
+from ml.fake_gemini import FakeGeminiConfig, FakeGeminiHTTPClient, FakeGeminiModel, install, start_server
+from ml.genai import GeminiClient
+from ml.rate_limit import RateLimitError
+from ml.train.quiz_gen import generate_quiz_batch
+
+
+def _client(target, retries=0):
+    return install(target, GeminiClient(api_key="test", cache=None, limiter=None, max_retries=retries))
+
+
+def test_in_process_fake_returns_schema_valid_quizzes(monkeypatch):
+    model = FakeGeminiModel(FakeGeminiConfig(seed=3))
+    client = _client(model)
+    monkeypatch.setattr("ml.train.quiz_gen.get_client", lambda: client)
+
+    chunks = [f"Passage {i} explains how plants turn light into chemical energy every day." for i in range(5)]
+    quiz = generate_quiz_batch(chunks)
+    assert len(quiz) == 5 and all(q["correct_answer"] in q["options"] for q in quiz)
+    assert all(q["answer"] != "Answer TBD" for q in quiz)
+    assert model.stats()["calls"] == 1
+
+    # Same seed and prompts -> same outcomes
+    again = FakeGeminiModel(FakeGeminiConfig(seed=3))
+    assert again.complete("Return ONLY valid JSON. x") == FakeGeminiModel(FakeGeminiConfig(seed=3)).complete(
+        "Return ONLY valid JSON. x")
+
+
+def test_http_fake_injects_rate_limits_and_truncation():
+    model = FakeGeminiModel(FakeGeminiConfig(rate_limit_rate=1.0, retry_after=0))
+    server, url = start_server(model)
+    try:
+        with pytest.raises(RateLimitError):
+            _client(FakeGeminiHTTPClient(url), retries=1).generate_text("hello")
+        assert model.stats()["rate_limited"] == 2
+    finally:
+        server.shutdown()
+
+    model = FakeGeminiModel(FakeGeminiConfig(truncate_rate=1.0, seed=1))
+    server, url = start_server(model)
+    try:
+        resp = _client(FakeGeminiHTTPClient(url)).generate_json("Return ONLY valid JSON. Context/Question: what?")
+        assert model.stats()["truncated"] == 1
+        # seed=1 cuts the answer inside "options"; only the complete leading values are recovered
+        assert resp == {"answer": "Because answer option 4 matches the passage.",
+                        "options": ["answer option 1", "answer option 2"]}
+    finally:
+        server.shutdown()
@@ -0,0 +1,147 @@
+import sys
+import os
+import pandas as pd
+from datetime import datetime
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+from ml.pipeline import load_data, preprocess, aggregate_features
+from ml.feature_store import new_stats, update_stats, features_from_stats
+
+
+def test_running_stats_match_batch_features():
+    csv = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_attempts.csv')
+    df = preprocess(load_data(csv))
+    # Feed attempts out of date order to exercise re-basing of the regression sums
+    df = df.sample(frac=1.0, random_state=0)
+
+    records = {}
+    for row in df.itertuples(index=False):
+        stats = records.setdefault((row.student_id, row.topic), new_stats())
+        update_stats(stats, row.accuracy, row.attempt_date.to_pydatetime(), difficulty=row.difficulty, avg_time=row.avg_time_per_question)
+
+    out = features_from_stats({"student_id": sid, "topic": topic, **stats} for (sid, topic), stats in records.items())
+    out = out.sort_values(["student_id", "topic"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(out, aggregate_features(df))
+
+
+def test_submit_quiz_updates_topic_stats(monkeypatch):
+    from app.core.config import Config
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+
+    from app.main import create_app
+    from app.models.users import db, User
+    from app.models.lesson import Lesson
+    from app.models.quiz import Quiz
+    from app.models.performance import TopicStats
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        student = User(email="s@example.com", full_name="S", password_hash="x")
+        lesson = Lesson(title="L", content="c", topic="algebra")
+        db.session.add_all([student, lesson])
+        db.session.flush()
+        quiz = Quiz(lesson_id=lesson.id, questions=[])
+        db.session.add(quiz)
+        db.session.commit()
+        student_id, quiz_id = student.id, quiz.id
+
+    client = app.test_client()
+    for correct, difficulty in ((True, "easy"), (False, "hard")):
+        resp = client.post(f"/api/quizzes/{quiz_id}/submit", json={
+            "user_id": student_id,
+            "difficulty": difficulty,
+            "time_taken_seconds": 120,
+            "answers": [{"question": "q1", "answer": "a", "is_correct": correct},
+                        {"question": "q2", "answer": "b", "is_correct": True}],
+        })
+        assert resp.status_code == 201
+
+    with app.app_context():
+        feats = TopicStats.features_frame(user_id=student_id)
+        assert len(feats) == 1
+        row = feats.iloc[0]
+        assert row["topic"] == "algebra"
+        assert row["attempts_count"] == 2
+        assert row["accuracy_mean"] == 0.75
+        assert row["accuracy_std"] == 0.25
+        assert row["avg_time_mean"] == 60.0
+        assert row["success_easy"] == 1.0 and row["success_hard"] == 0.5
+
+
+def test_mastery_view_refreshes_only_dirty_users(monkeypatch):
+    from app.core.config import Config
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+
+    from app.main import create_app
+    from app.models.users import db, User
+    from app.models.performance import TopicStats, MasteryView
+    from ml.model_registry import ModelRegistry
+
+    app = create_app()
+    registry = ModelRegistry(model_dir=os.path.join(os.path.dirname(__file__), "..", "models"))
+    with app.app_context():
+        db.create_all()
+        users = [User(email=f"u{i}@example.com", full_name=f"U{i}", password_hash="x") for i in range(2)]
+        db.session.add_all(users)
+        db.session.flush()
+        for user, accs in zip(users, ([0.9, 0.3, 0.6], [0.5, 0.5, 0.5])):
+            for topic, acc in zip(["algebra", "geometry", "calculus"], accs):
+                TopicStats.for_update(user.id, topic).record_attempt(acc, datetime(2025, 1, 1), "medium", 30.0)
+        db.session.commit()
+        u0, u1 = users[0].id, users[1].id
+
+        assert sorted(MasteryView.dirty_user_ids()) == [u0, u1]
+        version, refreshed = MasteryView.refresh_dirty(registry=registry)
+        assert (version, refreshed) == (1, 2)
+        assert MasteryView.dirty_user_ids() == []
+        assert MasteryView.refresh_dirty(registry=registry) == (None, 0)
+
+        TopicStats.for_update(u1, "algebra").record_attempt(0.0, datetime(2025, 1, 2), "hard", 30.0)
+        db.session.commit()
+        assert MasteryView.refresh_dirty(registry=registry) == (2, 1)
+
+    body = app.test_client().get(f"/api/analytics/mastery/{u0}").get_json()
+    assert [r["topic"] for r in body["recommendations"]] == ["geometry", "calculus", "algebra"]
+    assert body["recommendations"][0]["recommended_difficulty"] == "easy"
+    levels = {r["topic"]: r["mastery_level"] for r in body["topics"]}
+    assert levels == {"algebra": "Advanced", "calculus": "Intermediate", "geometry": "Beginner"}
+    assert all(r["version"] == 1 and r["mastery_probability"] is not None for r in body["topics"])
+    assert app.test_client().get(f"/api/analytics/mastery/{u1}").get_json()["version"] == 2
+
+
+def test_submit_quiz_rejects_bad_difficulty_and_time(monkeypatch):
+    from app.core.config import Config
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+
+    from app.main import create_app
+    from app.models.users import db, User
+    from app.models.lesson import Lesson
+    from app.models.quiz import Quiz
+    from app.models.performance import TopicStats
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        student = User(email="s@example.com", full_name="S", password_hash="x")
+        lesson = Lesson(title="L", content="c", topic="algebra")
+        db.session.add_all([student, lesson])
+        db.session.flush()
+        quiz = Quiz(lesson_id=lesson.id, questions=[])
+        db.session.add(quiz)
+        db.session.commit()
+        student_id, quiz_id = student.id, quiz.id
+
+    client = app.test_client()
+    answers = [{"question": "q1", "answer": "a", "is_correct": True}]
+    for extra in ({"time_taken_seconds": "abc"}, {"time_taken_seconds": -5}, {"time_taken_seconds": "nan"},
+                  {"difficulty": "x" * 50}):
+        resp = client.post(f"/api/quizzes/{quiz_id}/submit", json={"user_id": student_id, "answers": answers, **extra})
+        assert resp.status_code == 400
+
+    resp = client.post(f"/api/quizzes/{quiz_id}/submit", json={
+        "user_id": student_id, "answers": answers, "difficulty": None, "time_taken_seconds": None})
+    assert resp.status_code == 201
+    with app.app_context():
+        assert TopicStats.query.filter_by(user_id=student_id).one().attempts_count == 1
@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.synthetic import generate_attempts
+from ml.flat_forest import FOREST_SUFFIX, flatten_forest, load_flat_forest
+from ml.model_registry import ModelRegistry
+from ml.pipeline import aggregate_features, preprocess
+from ml.topic_models import FEATURE_COLUMNS, export_flat_models, predict_topic_mastery_batch, train_per_topic_models
+
+
+def test_flat_forest_matches_sklearn():
+    agg = aggregate_features(preprocess(generate_attempts(5000, n_students=100, n_topics=5, seed=6)))
+    X = agg[FEATURE_COLUMNS].fillna(0.0)
+    y = np.where(agg["accuracy_mean"] < 0.5, "Beginner", np.where(agg["accuracy_mean"] < 0.8, "Intermediate", "Advanced"))
+    clf = RandomForestClassifier(n_estimators=30, random_state=0).fit(X, y)
+
+    flat = flatten_forest(clf)
+    np.testing.assert_array_equal(flat.predict_proba(X), clf.predict_proba(X))
+    np.testing.assert_array_equal(flat.predict(X.to_numpy()[:7]), clf.predict(X.iloc[:7]))
+
+
+def test_exported_topic_models_score_like_joblib(tmp_path):
+    agg = aggregate_features(preprocess(generate_attempts(3000, n_students=60, n_topics=3, seed=7)))
+    train_per_topic_models(agg, model_dir=str(tmp_path))
+    exported = export_flat_models(str(tmp_path))
+    assert sorted(exported) == sorted(agg["topic"].unique())
+    assert load_flat_forest(next(iter(exported.values()))).classes_.dtype.kind in "iu"
+
+    expected = predict_topic_mastery_batch(agg, ModelRegistry(str(tmp_path)))
+    flat = predict_topic_mastery_batch(agg, ModelRegistry(str(tmp_path), suffix=FOREST_SUFFIX, loader=load_flat_forest))
+    np.testing.assert_allclose(flat["mastery_probability"], expected["mastery_probability"], rtol=0, atol=1e-12)
+
+
+def test_retraining_rewrites_the_flat_exports(tmp_path):
+    from ml.topic_models import remove_topic_model, retrain_changed_topics, train_per_topic_models_parallel
+
+    agg = aggregate_features(preprocess(generate_attempts(3000, n_students=60, n_topics=3, seed=7)))
+    model_dir = str(tmp_path)
+    train_per_topic_models_parallel(agg, workers=1, model_dir=model_dir, record_manifest=True)
+    registry = ModelRegistry(model_dir, suffix=FOREST_SUFFIX, loader=load_flat_forest)
+    topic = sorted(agg["topic"].unique())[0]
+    assert len(registry.get(topic).roots) == 100
+
+    changed = agg.copy()
+    rows = changed[changed["topic"] == topic].sample(frac=0.05, random_state=0).index
+    changed.loc[rows, "attempts_count"] += 1
+    assert retrain_changed_topics(changed, workers=1, model_dir=model_dir, extra_trees=10).warm_started == [topic]
+    assert len(registry.get(topic).roots) == 110
+
+    remove_topic_model(topic, model_dir)
+    assert not [f for f in os.listdir(model_dir) if f.startswith(topic + ".")]
@@ -21,3 +21,27 @@ def test_gemini_client_json_parse(monkeypatch):
     parsed = c.generate_json("dummy")
     assert isinstance(parsed, dict)
     assert "quiz" in parsed
+
+
+def test_shared_client_async_and_generate_many(monkeypatch):
+    import asyncio
+    from ml.genai import get_client
+
+    assert get_client() is get_client()
+    assert get_client(model="other") is not get_client()
+
+    def fake_generate_text(self, prompt, **kwargs):
+        if prompt == "bad":
+            raise RuntimeError("quota")
+        return '{"echo": "%s"}' % prompt
+
+    monkeypatch.setattr(GeminiClient, "generate_text", fake_generate_text)
+    c = get_client()
+    results = c.generate_many(["a", "bad", "c"], as_json=True, max_concurrency=3)
+    assert results[0] == {"echo": "a"} and results[2] == {"echo": "c"}
+    assert isinstance(results[1], RuntimeError)
+
+    async def both():
+        return await asyncio.gather(c.agenerate_text("x"), c.agenerate_json("y"))
+
+    assert asyncio.run(both()) == ['{"echo": "x"}', {"echo": "y"}]
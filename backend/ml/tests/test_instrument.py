@@ -0,0 +1,28 @@
+import sys
+import json
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+from ml import instrument
+from ml.pipeline import aggregate_features, preprocess, recommend_next_topic
+from ml.synthetic import generate_attempts
+
+
+def test_tracing_records_nested_stage_spans(tmp_path):
+    raw = generate_attempts(2000, n_topics=4, seed=3)
+    assert not instrument.is_enabled()
+
+    with instrument.tracing(str(tmp_path / "trace.json"), memory=True):
+        agg = aggregate_features(preprocess(raw))
+    recommend_next_topic("s0", agg)  # after the block: not recorded
+
+    spans = {s["name"].rsplit(".", 1)[-1]: s for s in instrument.get_spans()}
+    assert set(spans) == {"preprocess", "aggregate_features", "partial_aggregate", "finalize_partial_aggregates"}
+    assert spans["preprocess"]["rows_in"] == 2000 and spans["aggregate_features"]["rows_out"] == len(agg)
+    assert spans["partial_aggregate"]["path"] == "ml.pipeline.aggregate_features;ml.pipeline.partial_aggregate"
+    assert spans["aggregate_features"]["peak_mb"] >= spans["partial_aggregate"]["peak_mb"] > 0
+
+    events = json.load(open(tmp_path / "trace.json"))["traceEvents"]
+    assert len(events) == 4 and all(e["ph"] == "X" for e in events)
+    assert "ml.pipeline.aggregate_features;ml.pipeline.partial_aggregate " in instrument.folded_stacks()
+    assert instrument.summary().splitlines()[0].startswith("function")
@@ -0,0 +1,34 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import pytest
+
+from ml.json_extract import extract_json, extract_json_partial
+
+
+def test_fences_prose_and_trailing_commas():
+    text = 'Sure! Here it is:\n```json\n{"answer": "a {curly} \\"quoted\\" one", "options": ["a", "b",],}\n```\nHope {this} helps.'
+    assert extract_json(text) == {"answer": 'a {curly} "quoted" one', "options": ["a", "b"]}
+
+    # Extra braces after the JSON and a stray quote before it don't change the span
+    assert extract_json('My 5" note: {"x": [1, 2]} and then {not json}') == {"x": [1, 2]}
+    # Objects are preferred over an earlier array-looking reference like "[0]"
+    assert extract_json('Answering [0] and [1]: {"items": []}') == {"items": []}
+    assert extract_json("[1, 2, 3]") == [1, 2, 3]
+
+    with pytest.raises(ValueError):
+        extract_json("no json here {at all")
+
+
+def test_truncated_tail_keeps_complete_items():
+    full = '{"items": [{"index": 0, "answer": "x"}, {"index": 1, "answer": "y"}, {"index": 2, "ans'
+    value, complete = extract_json_partial(full)
+    assert not complete
+    assert value == {"items": [{"index": 0, "answer": "x"}, {"index": 1, "answer": "y"}]}
+
+    with pytest.raises(ValueError):
+        extract_json(full, allow_partial=False)
+    # A pathological run of openers stays fast (linear scan, bounded repair attempts)
+    with pytest.raises(ValueError):
+        extract_json("{" * 200_000 + '"')
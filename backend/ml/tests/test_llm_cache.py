@@ -0,0 +1,69 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+from ml.genai import GeminiClient
+from ml.llm_cache import ResponseCache, cache_key
+
+
+class FakeModel:
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_text(self, model, prompt, **kwargs):
+        self.calls += 1
+        return type("Resp", (), {"text": self.text})()
+
+
+def test_memory_and_sqlite_tiers_with_ttl_and_lru(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "llm.sqlite")
+    cache = ResponseCache(max_entries=2, ttl=60, path=path, max_disk_entries=3, clock=lambda: now[0])
+    for k in "abcd":
+        cache.set(k, k.upper())
+    assert cache.stats()["entries"] == 2
+
+    assert cache.get("d") == "D"  # memory
+    assert cache.get("b") == "B"  # memory LRU dropped it, SQLite still has it
+    assert cache.get("a") is None  # beyond max_disk_entries
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+
+    # A second process sharing the file sees the entries; TTL applies to both tiers
+    other = ResponseCache(path=path, ttl=60, clock=lambda: now[0])
+    assert other.get("c") == "C"
+    now[0] += 61
+    assert cache.get("d") is None and other.get("c") is None
+
+    assert cache_key("m", "p", {"temperature": 0}) != cache_key("m", "p", {"temperature": 1})
+
+
+def test_sqlite_tier_is_bounded_by_bytes(tmp_path):
+    path = str(tmp_path / "llm.sqlite")
+    cache = ResponseCache(max_entries=1, path=path, max_disk_bytes=100)
+    for k in "abc":
+        cache.set(k, k * 40)
+    # 120 bytes > 100: the least recently used rows go until 90% of the bound is left
+    reader = ResponseCache(path=path)
+    assert [reader.get(k) for k in "abc"] == [None, "b" * 40, "c" * 40]
+
+def test_gemini_client_serves_repeated_prompts_from_cache():
+    client = GeminiClient(api_key="x", model="m", cache=ResponseCache())
+    client._client = FakeModel('{"answer": "yes"}')
+
+    assert client.generate_json("same prompt") == {"answer": "yes"}
+    assert client.generate_json("same prompt") == {"answer": "yes"}
+    assert client._client.calls == 1
+    client.generate_text("same prompt", use_cache=False)
+    assert client._client.calls == 2
+    assert client.cache.stats()["hit_rate"] == 0.5
+
+    # An unparseable response is not kept, so the next call asks again
+    client._client = FakeModel("not json")
+    for _ in range(2):
+        try:
+            client.generate_json("other prompt")
+        except ValueError:
+            pass
+    assert client._client.calls == 2
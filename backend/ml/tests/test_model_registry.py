@@ -0,0 +1,34 @@
+import sys
+import os
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import joblib
+import pytest
+
+from ml.model_registry import ModelRegistry
+
+
+def test_registry_caches_reloads_and_evicts(tmp_path):
+    for topic, value in [("a", 1), ("b", 2), ("c", 3)]:
+        joblib.dump({"v": value}, tmp_path / f"{topic}.joblib")
+
+    reg = ModelRegistry(str(tmp_path), max_models=2)
+    assert reg.preload() == ["a", "b", "c"]
+    assert reg.stats()["models"] == 2 and reg.evictions == 1  # "a" fell out
+
+    assert reg.get("c")["v"] == 3
+    assert reg.hits == 1
+
+    joblib.dump({"v": 30, "pad": "x" * 100}, tmp_path / "c.joblib")
+    assert reg.get("c")["v"] == 30
+    assert reg.reloads == 1
+
+    os.remove(tmp_path / "b.joblib")
+    with pytest.raises(FileNotFoundError):
+        reg.get("b")
+    assert reg.stats()["models"] == 1
+
+    small = ModelRegistry(str(tmp_path), max_bytes=1)
+    small.preload(["a", "c"])
+    assert small.stats()["models"] == 1 and small.evictions == 1
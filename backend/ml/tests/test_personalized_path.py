@@ -0,0 +1,43 @@
+import sys
+import os
+import json
+import subprocess
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+from ml.pipeline import aggregate_features, preprocess, recommend_next_topic, recommend_next_topics_batch
+from ml.personalized_path import expand_class_paths, generate_class_paths, generate_learning_path
+from ml.synthetic import generate_attempts
+
+
+def test_learning_path_is_stable_across_processes():
+    backend = os.path.join(os.path.dirname(__file__), "..", "..")
+    code = ("import json; from ml.personalized_path import generate_learning_path; "
+            "print(json.dumps(generate_learning_path({'recommendations': ["
+            "{'topic': t, 'accuracy': 0.2, 'recommended_difficulty': 'medium'} for t in ('algebra', 'geometry', 'calculus')]})))")
+    outputs = set()
+    for seed in ("1", "2", "3"):
+        env = dict(os.environ, PYTHONHASHSEED=seed, PYTHONPATH=backend)
+        outputs.add(subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout)
+    assert len(outputs) == 1
+    path = json.loads(outputs.pop())
+    assert [p["sequence"][0]["step"] for p in path] == ["revision"] * 3
+
+
+def test_class_paths_match_per_student_paths():
+    agg = aggregate_features(preprocess(generate_attempts(3000, n_topics=5, seed=8)))
+    batch = recommend_next_topics_batch(agg, top_n=2)
+    paces = {sid: ("slow", "normal", "fast")[i % 3] for i, sid in enumerate(batch["student_id"].unique())}
+
+    compact = generate_class_paths(batch, pace=paces)
+    expected = {sid: generate_learning_path(recommend_next_topic(sid, agg, top_n=2), pace=paces[sid]) for sid in paces}
+    assert expand_class_paths(compact) == expected
+    assert len(compact["templates"]) < len(batch)
+
+    as_dicts = {sid: recommend_next_topic(sid, agg, top_n=2) for sid in paces}
+    assert generate_class_paths(as_dicts, pace=paces) == compact
+
+    # Callers may edit the returned templates without corrupting the step cache
+    for steps in compact["templates"].values():
+        steps[0]["step"] = "edited"
+    assert expand_class_paths(generate_class_paths(batch, pace=paces)) == expected
@@ -21,3 +21,113 @@ def test_pipeline_end_to_end():
     rec = recommend_next_topic("s1", agg, top_n=2)
     assert isinstance(rec, dict)
     assert "recommendations" in rec
+
+
+def test_aggregate_features_matches_reference_loop():
+    from ml.pipeline import _aggregate_features_loop
+    from ml.synthetic import generate_attempts
+
+    csv_path = os.path.join(os.path.dirname(__file__), "..", "data", "sample_attempts.csv")
+    dfp = preprocess(load_data(csv_path))
+    pd.testing.assert_frame_equal(aggregate_features(dfp), _aggregate_features_loop(dfp))
+
+    # Larger random log with repeated dates, single-attempt groups and a few missing accuracies
+    dfp = preprocess(generate_attempts(5000, n_students=300, n_topics=6, seed=1))
+    dfp.loc[dfp.sample(10, random_state=0).index, "accuracy"] = float("nan")
+    pd.testing.assert_frame_equal(aggregate_features(dfp), _aggregate_features_loop(dfp))
+
+
+def test_preprocess_compact_mode():
+    from ml.synthetic import generate_attempts
+
+    raw = generate_attempts(2000, missing_time=0, seed=2)
+    raw.loc[0, "total_questions"] = 0
+    before = raw.copy()
+
+    full = preprocess(raw)
+    small = preprocess(raw, compact=True)
+    pd.testing.assert_frame_equal(raw, before)
+
+    assert pd.isna(full.loc[0, "avg_time_per_question"])
+    expected = raw["time_taken_seconds"] / raw["total_questions"]
+    pd.testing.assert_series_equal(full["avg_time_per_question"].iloc[1:], expected.iloc[1:], check_names=False)
+
+    for col in ("student_id", "topic", "difficulty"):
+        assert isinstance(small[col].dtype, pd.CategoricalDtype)
+    assert small["accuracy"].dtype == "float32"
+    assert small["total_questions"].dtype == "int8"
+    assert small.memory_usage(deep=True).sum() < full.memory_usage(deep=True).sum() / 2
+
+    agg = aggregate_features(small).astype({"student_id": object, "topic": object})
+    pd.testing.assert_frame_equal(agg, aggregate_features(full), rtol=1e-4, atol=1e-6)
+
+
+def test_aggregate_features_chunked_matches_in_memory(tmp_path):
+    import numpy as np
+    from ml.pipeline import aggregate_features_chunked
+    from ml.synthetic import generate_attempts
+
+    raw = generate_attempts(3000, n_students=80, n_topics=4, seed=3)
+    raw.loc[raw.sample(40, random_state=0).index, "time_taken_seconds"] = np.nan
+    raw.iloc[:1100].to_csv(tmp_path / "part1.csv", index=False)
+    raw.iloc[1100:].to_csv(tmp_path / "part2.csv", index=False)
+
+    expected = aggregate_features(preprocess(load_data(str(tmp_path / "part*.csv"))))
+    chunked = aggregate_features_chunked(str(tmp_path / "part*.csv"), chunksize=250)
+    pd.testing.assert_frame_equal(chunked, expected)
+
+
+def test_load_data_columnar_formats(tmp_path):
+    import pytest
+    pytest.importorskip("pyarrow")
+    from ml.pipeline import aggregate_features_chunked, iter_attempt_chunks
+
+    csv_path = os.path.join(os.path.dirname(__file__), "..", "data", "sample_attempts.csv")
+    df = load_data(csv_path)
+    df.iloc[:8].to_parquet(tmp_path / "a.parquet")
+    df.iloc[8:].reset_index(drop=True).to_feather(tmp_path / "b.feather")
+    paths = [tmp_path / "a.parquet", tmp_path / "b.feather"]
+
+    projected = load_data(str(tmp_path / "a.parquet"), columns=["student_id", "topic"])
+    assert list(projected.columns) == ["student_id", "topic"]
+    assert [len(c) for c in iter_attempt_chunks(paths, chunksize=5)] == [5, 3, 5, 3]
+
+    expected = aggregate_features(preprocess(df))
+    pd.testing.assert_frame_equal(aggregate_features_chunked(paths, chunksize=3), expected)
+
+
+def test_batch_recommendations_match_single_student():
+    from ml.pipeline import (recommend_next_topic, recommend_next_topics_batch,
+                             batch_to_dicts, index_by_student)
+    from ml.synthetic import generate_attempts
+
+    agg = aggregate_features(preprocess(generate_attempts(4000, n_students=60, n_topics=6, seed=5)))
+    expected = {sid: recommend_next_topic(sid, agg, top_n=2) for sid in agg["student_id"].unique()}
+
+    batch = recommend_next_topics_batch(agg, top_n=2)
+    assert batch_to_dicts(batch) == expected
+    assert batch.groupby("student_id")["rank"].max().max() == 2
+
+    indexed = index_by_student(agg)
+    for sid, rec in expected.items():
+        assert recommend_next_topic(sid, indexed, top_n=2) == rec
+    assert recommend_next_topic("missing", indexed)["reason"] == "no_data"
+
+    # A student_id index that is sorted but not by accuracy within a student
+    plain = agg.sort_values("student_id", kind="mergesort").set_index("student_id", drop=False)
+    sid = agg["student_id"].iloc[0]
+    assert recommend_next_topic(sid, plain, top_n=2) == expected[sid]
+
+
+def test_recommend_next_topic_on_resorted_indexed_frame():
+    from ml.pipeline import recommend_next_topic, index_by_student
+    from ml.synthetic import generate_attempts
+
+    agg = aggregate_features(preprocess(generate_attempts(2000, n_students=20, n_topics=5, seed=6)))
+    expected = {sid: recommend_next_topic(sid, agg, top_n=2) for sid in agg["student_id"].unique()}
+
+    resorted = index_by_student(agg).sort_values("accuracy_mean", ascending=False)
+    assert not resorted.index.is_monotonic_increasing
+    for sid, rec in expected.items():
+        assert recommend_next_topic(sid, resorted, top_n=2) == rec
+    assert recommend_next_topic(sid, resorted.sort_index(kind="mergesort"), top_n=2) == rec
@@ -1,11 +1,14 @@
 import sys
+import threading
+import time
 from types import SimpleNamespace
 import pytest
 
 # Ensure backend package on sys.path when tests run from project root
 sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
 
-from ml.train.quiz_gen import generate_quiz
+from ml.train import quiz_gen
+from ml.train.quiz_gen import generate_quiz, generate_quiz_batch, generate_quiz_from_chunks, plan_batches
 from ml.genai import GeminiClient
 
 
@@ -58,3 +61,98 @@ def test_generate_quiz_handles_no_gemini(monkeypatch):
     item = quiz[0]
     assert item["answer"] == "Answer TBD"
     assert item["hint"] == "Summarize the passage in one sentence."
+
+
+def test_generate_quiz_from_chunks_keeps_order_and_stops_early(monkeypatch):
+    # Later chunks finish first; output must still follow the source order
+    started = []
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_generate_quiz(chunk, difficulty="medium", **kwargs):
+        with lock:
+            started.append(chunk)
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05 / (int(chunk.split()[1]) + 1))
+        with lock:
+            active[0] -= 1
+        return [{"question": chunk, "difficulty": difficulty}]
+
+    monkeypatch.setattr(quiz_gen, "generate_quiz", fake_generate_quiz)
+    chunks = [f"chunk {i}" for i in range(20)]
+
+    quiz = generate_quiz_from_chunks(chunks, difficulty="hard", num_questions=5, max_workers=3)
+    assert [q["question"] for q in quiz] == chunks[:5]
+    assert all(q["difficulty"] == "hard" for q in quiz)
+    assert peak[0] <= 3
+    assert len(started) <= 5 + 3
+
+    assert generate_quiz_from_chunks(chunks[:4], max_workers=1) == [{"question": c, "difficulty": "medium"} for c in chunks[:4]]
+    assert generate_quiz_from_chunks(["short"], min_chars=50) == []
+
+
+def test_generate_quiz_batch_packs_chunks_and_falls_back_per_chunk(monkeypatch):
+    prompts = []
+
+    def fake_generate_json(self, prompt):
+        prompts.append(prompt)
+        if "Questions:" not in prompt:  # per-chunk fallback call
+            return {"answer": "single", "options": ["a", "b", "c", "d"], "correct_answer": "a"}
+        n = prompt.count("\n[")
+        items = [{"index": i, "answer": f"batched {i}", "options": ["w", "x", "y", "z"], "correct_answer": "x"}
+                 for i in range(n)]
+        items[1] = {"index": 1, "options": ["w"]}  # missing required keys -> fallback
+        return {"items": list(reversed(items))}
+
+    monkeypatch.setattr(GeminiClient, "generate_json", fake_generate_json)
+    chunks = [f"Passage number {i} talks about photosynthesis in some detail." for i in range(6)]
+
+    quiz = generate_quiz_batch(chunks)
+    assert len(quiz) == 6
+    assert [q["answer"] for q in quiz] == ["batched 0", "single", "batched 2", "batched 3", "batched 4", "batched 5"]
+    assert all("Passage number %d" % i in q["question"] for i, q in enumerate(quiz))
+    assert len(prompts) == 2  # one batched call + one fallback
+
+    # A tight budget splits the batch; every chunk still appears exactly once, in order
+    batches = plan_batches(["q" * 400] * 5, token_budget=900)
+    assert sum(batches, []) == list(range(5)) and len(batches) > 1
+
+    # A rate-limited batch gets placeholders rather than one more call per chunk
+    def rate_limited(self, prompt):
+        prompts.append(prompt)
+        raise quiz_gen.RateLimitError("quota exhausted")
+
+    monkeypatch.setattr(GeminiClient, "generate_json", rate_limited)
+    prompts.clear()
+    quiz = generate_quiz_batch(chunks)
+    assert [q["answer"] for q in quiz] == ["Answer TBD"] * 6 and len(prompts) == 1
+    monkeypatch.setattr(GeminiClient, "generate_json", fake_generate_json)
+
+    prompts.clear()
+    quiz = generate_quiz_from_chunks(chunks * 3, num_questions=10, max_workers=2, batch_tokens=4000)
+    assert len(quiz) == 10
+    assert len([p for p in prompts if "Questions:" in p]) == 1
+
+
+@pytest.mark.parametrize("batch_tokens", [0, 4000])
+def test_failed_chunks_do_not_count_towards_num_questions(monkeypatch, batch_tokens):
+    # Every third chunk fails validation; the quiz must still reach num_questions valid items
+    def fake_generate_json(self, prompt):
+        if "Questions:" in prompt:
+            lines = [l for l in prompt.split("\n") if l.startswith("[")]
+            return {"items": [{"index": i, "answer": "ok", "options": ["w", "x", "y", "z"], "correct_answer": "x"}
+                              for i, l in enumerate(lines) if "bad" not in l]}
+        if "bad" in prompt:
+            raise ValueError("unparseable")
+        return {"answer": "ok", "options": ["a", "b", "c", "d"], "correct_answer": "a"}
+
+    monkeypatch.setattr(GeminiClient, "generate_json", fake_generate_json)
+    monkeypatch.setattr(GeminiClient, "generate_text", lambda self, prompt, **kw: (_ for _ in ()).throw(ValueError()))
+    chunks = [f"Passage {i} {'bad' if i % 3 == 0 else 'good'} text about photosynthesis in plants." for i in range(12)]
+
+    quiz = generate_quiz_from_chunks(chunks, num_questions=6, max_workers=2, batch_tokens=batch_tokens)
+    assert [q["question"].split("Passage ")[1].split()[0] for q in quiz] == ["1", "2", "4", "5", "7", "8"]
+    assert not any(quiz_gen.is_placeholder(q) for q in quiz)
+    # Running out of chunks gives a short quiz, never placeholders
+    assert len(generate_quiz_from_chunks(chunks[:4], num_questions=6, batch_tokens=batch_tokens)) == 2
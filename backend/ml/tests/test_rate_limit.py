@@ -0,0 +1,75 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import pytest
+
+from ml.genai import GeminiClient
+from ml.rate_limit import (FileBackend, RateLimitError, RateLimiter, _take, call_with_retries, is_rate_limited,
+                           retry_after)
+
+
+class QuotaError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 RESOURCE_EXHAUSTED")
+        self.code = 429
+        self.retry_after = retry_after
+
+
+def test_token_buckets_pace_requests_and_tokens():
+    state, wait = _take(None, 0.0, rpm=60, tpm=1000, tokens=600)
+    assert wait == 0
+    state, wait = _take(state, 0.0, rpm=60, tpm=1000, tokens=600)
+    assert wait == pytest.approx(200 * 60 / 1000)  # 400 tokens left, 200 short
+    state, wait = _take(state, 12.0, rpm=60, tpm=1000, tokens=600)
+    assert wait == 0
+
+    # requests-per-minute only: a full minute of burst, then one request per second
+    state = None
+    for _ in range(60):
+        state, wait = _take(state, 5.0, rpm=60, tpm=0, tokens=10_000)
+        assert wait == 0
+    state, wait = _take(state, 5.0, rpm=60, tpm=0, tokens=0)
+    assert wait == pytest.approx(1.0)
+
+
+def test_file_backend_is_shared_and_pause_blocks_everyone(tmp_path):
+    path = str(tmp_path / "rate.json")
+    a, b = FileBackend(path), FileBackend(path)
+    assert a.take(rpm=2, tpm=0, tokens=0) == 0
+    assert b.take(rpm=2, tpm=0, tokens=0) == 0
+    assert a.take(rpm=2, tpm=0, tokens=0) > 0
+
+    limiter = RateLimiter(rpm=1000, backend=FileBackend(str(tmp_path / "other.json")))
+    limiter.pause(30)
+    with pytest.raises(RateLimitError):
+        limiter.acquire(timeout=1)
+
+
+def test_retries_honour_retry_after_then_raise_rate_limit_error():
+    sleeps = []
+    calls = iter([QuotaError(retry_after=7), QuotaError(), "ok"])
+
+    def flaky():
+        result = next(calls)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert call_with_retries(flaky, max_retries=3, sleep=sleeps.append) == "ok"
+    assert sleeps[0] >= 7 and len(sleeps) == 2
+
+    with pytest.raises(ValueError):  # not retryable
+        call_with_retries(lambda: (_ for _ in ()).throw(ValueError("bad")), sleep=sleeps.append)
+
+    assert is_rate_limited(Exception("status 429: quota")) and not is_rate_limited(Exception("line 4290"))
+    assert retry_after(Exception("{'retryDelay': '31s'}")) == 31.0
+
+    class AlwaysLimited:
+        def generate_text(self, model, prompt, **kwargs):
+            raise QuotaError(retry_after=0)
+
+    client = GeminiClient(api_key="x", cache=None, limiter=None, max_retries=1)
+    client._client = AlwaysLimited()
+    with pytest.raises(RateLimitError):
+        client.generate_text("hello")
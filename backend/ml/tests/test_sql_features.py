@@ -0,0 +1,98 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+from ml.pipeline import preprocess, aggregate_features
+from ml.sql_features import extract_features, load_attempts
+
+
+def _seed(engine, seed=0):
+    from app.models.users import db, User
+    from app.models.classes import Class
+    from app.models.lesson import Lesson
+    from app.models.quiz import Quiz
+    from app.models.submission import QuizAttempt, QuizAnswer
+
+    db.metadata.create_all(engine)
+    rng = np.random.default_rng(seed)
+    with Session(engine) as session:
+        teachers = [User(email=f"t{i}@x.io", full_name=f"T{i}", password_hash="x", is_teacher=True) for i in range(2)]
+        students = [User(email=f"s{i}@x.io", full_name=f"S{i}", password_hash="x") for i in range(12)]
+        session.add_all(teachers + students)
+        session.flush()
+        classes = [Class(name=f"C{i}", teacher_id=teachers[i].id) for i in range(2)]
+        session.add_all(classes)
+        session.flush()
+        quizzes = []
+        for i, topic in enumerate(["algebra", "geometry", "calculus", None]):
+            lesson = Lesson(title=f"L{i}", content="c", topic=topic, teacher_id=teachers[i % 2].id, class_id=classes[i % 2].id)
+            session.add(lesson)
+            session.flush()
+            quiz = Quiz(lesson_id=lesson.id, questions=[])
+            session.add(quiz)
+            quizzes.append(quiz)
+        session.flush()
+
+        start = datetime(2025, 9, 1)
+        for _ in range(300):
+            quiz = quizzes[rng.integers(len(quizzes))]
+            completed = start + timedelta(days=int(rng.integers(0, 60)), seconds=int(rng.integers(0, 86400)))
+            timed = rng.random() > 0.1
+            attempt = QuizAttempt(
+                user_id=students[rng.integers(len(students))].id,
+                quiz_id=quiz.id,
+                class_id=classes[rng.integers(2)].id,
+                score=0.0,
+                difficulty=["easy", "medium", "hard", None][rng.integers(4)],
+                started_at=completed - timedelta(seconds=int(rng.integers(30, 900))) if timed else None,
+                completed_at=completed,
+            )
+            session.add(attempt)
+            session.flush()
+            for q in range(int(rng.integers(0, 8))):
+                session.add(QuizAnswer(attempt_id=attempt.id, question_text=f"q{q}", is_correct=bool(rng.random() < 0.6)))
+        session.commit()
+        return teachers[0].id, classes[1].id
+
+
+def _assert_parity(bind, **filters):
+    expected = aggregate_features(preprocess(load_attempts(bind, **filters)))
+    got = extract_features(bind, **filters)
+    assert len(got) > 0
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, rtol=1e-6, atol=1e-12)
+
+
+def test_extract_features_matches_pandas_sqlite():
+    engine = create_engine("sqlite://")
+    teacher_id, class_id = _seed(engine)
+    with engine.connect() as conn:
+        _assert_parity(conn)
+        _assert_parity(conn, teacher_id=teacher_id)
+        _assert_parity(conn, class_id=class_id, teacher_id=teacher_id)
+        assert len(extract_features(conn, class_id=class_id)) < len(extract_features(conn))
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="set TEST_POSTGRES_URL to a scratch database")
+def test_extract_features_matches_pandas_postgres():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    from app.models.users import db
+    db.metadata.drop_all(engine)
+    teacher_id, class_id = _seed(engine)
+    with engine.connect() as conn:
+        _assert_parity(conn)
+        _assert_parity(conn, class_id=class_id, teacher_id=teacher_id)
+    db.metadata.drop_all(engine)
+
+
+def test_extract_features_rejects_unsupported_dialects():
+    from types import SimpleNamespace
+    with pytest.raises(ValueError, match="'mysql'"):
+        extract_features(SimpleNamespace(dialect=SimpleNamespace(name="mysql")))
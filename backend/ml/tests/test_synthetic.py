@@ -0,0 +1,31 @@
+import sys
+
+sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
+
+import pandas as pd
+
+from ml.pipeline import ATTEMPT_COLUMNS, load_data
+from ml.synthetic import generate_attempts, iter_attempts, write_attempts
+
+
+def test_generator_is_seeded_and_shaped_like_the_sample():
+    a = generate_attempts(5000, n_topics=8, seed=11, chunksize=2000)
+    b = generate_attempts(5000, n_topics=8, seed=11, chunksize=2000)
+    pd.testing.assert_frame_equal(a, b)
+    assert list(a.columns) == ATTEMPT_COLUMNS
+    assert (a["correct_answers"] <= a["total_questions"]).all()
+    assert [len(c) for c in iter_attempts(5000, chunksize=2000)] == [2000, 2000, 1000]
+    # Zipf skew: the most popular topic gets far more than an even share
+    assert a["topic"].value_counts().iloc[0] > 2 * len(a) / 8
+    assert not generate_attempts(5000, n_topics=8, seed=12).equals(a)
+
+
+def test_benchmark_stages_run_on_generated_csv(tmp_path):
+    from ml.benchmarks.bench_pipeline import run_size
+
+    path = write_attempts(str(tmp_path / "attempts.csv"), 3000, n_topics=5, seed=1, chunksize=1000)
+    assert len(load_data(path)) == 3000
+    records = run_size(path, 3000, train_rows=None, seed=0)
+    assert [r["stage"] for r in records] == ["load_data", "preprocess", "aggregate_features", "cluster_students",
+                                             "train_topic_classifier", "predict_mastery"]
+    assert all(r["wall_s"] >= 0 and r["peak_rss_mb"] > 0 for r in records)
@@ -2,6 +2,7 @@ import sys
 import os
 import io
 import json
+from types import SimpleNamespace
 
 sys.path.insert(0, r"c:/Users/Home/Desktop/backend/assesify/backend")
 
@@ -30,3 +31,83 @@ def test_process_uploaded_file_handles_gemini_error(monkeypatch, tmp_path):
 
     out = process_uploaded_file(str(p), title="X", num_questions=1)
     assert out["status"] == "error"
+
+
+def test_enqueue_mastery_refresh_clears_flag_when_enqueue_fails(monkeypatch):
+    import pytest
+    import ml.tasks as tasks
+
+    class Conn:
+        def __init__(self):
+            self.keys = {}
+
+        def set(self, key, value, nx=False, ex=None):
+            if nx and key in self.keys:
+                return False
+            self.keys[key] = value
+            return True
+
+        def delete(self, key):
+            self.keys.pop(key, None)
+
+    class BrokenQueue:
+        def __init__(self, name, connection):
+            pass
+
+        def enqueue(self, fn):
+            raise ConnectionError("redis went away")
+
+    conn = Conn()
+    monkeypatch.setattr(tasks, "_redis_connection", lambda url: conn)
+    # An earlier submission in this process may have found Redis down and started the cooldown
+    monkeypatch.setattr(tasks, "_redis_down_until", 0.0)
+    monkeypatch.setattr("rq.Queue", BrokenQueue)
+    with pytest.raises(ConnectionError):
+        tasks.enqueue_mastery_refresh()
+    assert tasks.MASTERY_REFRESH_PENDING_KEY not in conn.keys
+
+
+def test_refresh_mastery_view_runs_under_a_lock(monkeypatch):
+    import contextlib
+    import ml.tasks as tasks
+    from app.models.performance import MasteryView
+
+    events = []
+
+    class Conn:
+        @contextlib.contextmanager
+        def lock(self, name, timeout=None, blocking_timeout=None):
+            events.append(("lock", name))
+            yield
+            events.append(("unlock", name))
+
+        def delete(self, key):
+            events.append(("delete", key))
+
+    monkeypatch.setattr("rq.get_current_job", lambda: SimpleNamespace(connection=Conn()))
+    monkeypatch.setattr(MasteryView, "refresh_dirty",
+                        classmethod(lambda cls, batch_size=500: events.append(("refresh", None)) or (7, 2)))
+
+    assert tasks.refresh_mastery_view()["version"] == 7
+    assert events == [("lock", tasks.MASTERY_REFRESH_LOCK_KEY), ("delete", tasks.MASTERY_REFRESH_PENDING_KEY),
+                      ("refresh", None), ("unlock", tasks.MASTERY_REFRESH_LOCK_KEY)]
+
+
+def test_enqueue_mastery_refresh_backs_off_while_redis_is_down(monkeypatch):
+    import pytest
+    import redis
+    import ml.tasks as tasks
+
+    class DownConn:
+        calls = 0
+
+        def set(self, *args, **kwargs):
+            DownConn.calls += 1
+            raise redis.ConnectionError("refused")
+
+    monkeypatch.setattr(tasks, "_redis_connection", lambda url: DownConn())
+    monkeypatch.setattr(tasks, "_redis_down_until", 0.0)
+    for _ in range(3):
+        with pytest.raises(Exception):
+            tasks.enqueue_mastery_refresh()
+    assert DownConn.calls == 1
@@ -18,3 +18,100 @@ def test_train_per_topic_models(tmp_path):
         assert os.path.exists(path)
         model = load_topic_model(topic)
         assert model is not None
+
+
+def test_parallel_training_matches_serial(tmp_path):
+    import numpy as np
+    from ml.synthetic import generate_attempts
+    from ml.topic_models import FEATURE_COLUMNS, train_per_topic_models_parallel
+
+    agg = aggregate_features(preprocess(generate_attempts(3000, n_students=50, n_topics=5, seed=4)))
+    serial = train_per_topic_models(agg, workers=1, model_dir=str(tmp_path / "serial"))
+    report = train_per_topic_models_parallel(agg, workers=2, model_dir=str(tmp_path / "parallel"))
+
+    assert sorted(report.saved) == sorted(serial) == sorted(report.timings)
+    assert not [f for f in os.listdir(tmp_path / "parallel") if f.startswith(".tmp-")]
+    X = agg[FEATURE_COLUMNS].fillna(0.0)
+    for topic in serial:
+        a = load_topic_model(topic, str(tmp_path / "serial")).predict_proba(X)
+        b = load_topic_model(topic, str(tmp_path / "parallel")).predict_proba(X)
+        np.testing.assert_array_equal(a, b)
+
+
+def test_batch_mastery_matches_single_row(tmp_path):
+    import numpy as np
+    import pandas as pd
+    import pytest
+    from ml.model_registry import ModelRegistry
+    from ml.topic_models import FEATURE_COLUMNS, predict_topic_mastery_batch
+
+    csv = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_attempts.csv')
+    agg = aggregate_features(preprocess(load_data(csv)))
+    train_per_topic_models(agg, min_samples=1, model_dir=str(tmp_path))
+    registry = ModelRegistry(str(tmp_path))
+
+    rows = pd.concat([agg, agg.head(1).assign(topic="no-model")], ignore_index=True)
+    out = predict_topic_mastery_batch(rows, registry)
+    assert list(out.columns) == ["student_id", "topic", "mastery_probability"]
+    assert np.isnan(out["mastery_probability"].iloc[-1])
+
+    for i, row in agg.iterrows():
+        model = registry.get(row["topic"])
+        classes = list(model.classes_)
+        if len(classes) == 1:
+            expected = float(classes[0] == 1)
+        else:
+            expected = model.predict_proba(row[FEATURE_COLUMNS].fillna(0.0).to_frame().T)[0, classes.index(1)]
+        assert out["mastery_probability"].iloc[i] == pytest.approx(expected)
+
+
+def test_incremental_retrain_skips_unchanged_and_grows_small_changes(tmp_path):
+    from ml.synthetic import generate_attempts
+    from ml.topic_models import load_manifest, retrain_changed_topics, train_per_topic_models_parallel
+
+    agg = aggregate_features(preprocess(generate_attempts(20000, n_topics=4, skew=0, seed=9)))
+    model_dir = str(tmp_path)
+    train_per_topic_models_parallel(agg, workers=1, model_dir=model_dir, record_manifest=True)
+
+    unchanged = retrain_changed_topics(agg, workers=1, model_dir=model_dir)
+    assert sorted(unchanged.skipped) == sorted(agg["topic"].unique()) and not unchanged.saved
+
+    topics = sorted(agg["topic"].unique())
+    changed = agg.copy()
+    small = changed[changed["topic"] == topics[0]].sample(frac=0.05, random_state=0).index
+    large = changed[changed["topic"] == topics[1]].sample(frac=0.6, random_state=0).index
+    changed.loc[small.union(large), "attempts_count"] += 1
+
+    report = retrain_changed_topics(changed, workers=1, model_dir=model_dir, extra_trees=10)
+    assert report.warm_started == [topics[0]] and report.rebuilt == [topics[1]]
+    assert sorted(report.skipped) == topics[2:]
+    assert load_topic_model(topics[0], model_dir).n_estimators == 110
+    assert load_manifest(model_dir)[topics[0]]["n_estimators"] == 110
+    assert retrain_changed_topics(changed, workers=1, model_dir=model_dir).saved == {}
+
+
+def test_manifest_is_recorded_only_on_request(tmp_path):
+    from ml.topic_models import MANIFEST_NAME, ROW_HASH_SUFFIX, load_manifest, train_per_topic_models_parallel
+
+    csv = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_attempts.csv')
+    agg = aggregate_features(preprocess(load_data(csv)))
+
+    plain = str(tmp_path / "plain")
+    train_per_topic_models_parallel(agg, min_samples=1, workers=1, model_dir=plain)
+    assert not [f for f in os.listdir(plain) if f == MANIFEST_NAME or f.endswith(ROW_HASH_SUFFIX)]
+
+    recorded = str(tmp_path / "recorded")
+    report = train_per_topic_models_parallel(agg, min_samples=1, workers=1, model_dir=recorded, record_manifest=True)
+    assert sorted(load_manifest(recorded)) == sorted(report.saved)
+    assert all(os.path.exists(os.path.join(recorded, t + ROW_HASH_SUFFIX)) for t in report.saved)
+
+
+def test_train_topic_classifier_warm_start():
+    from ml.pipeline import train_topic_classifier
+    from ml.synthetic import generate_attempts
+
+    agg = aggregate_features(preprocess(generate_attempts(5000, n_topics=3, seed=10)))
+    first = train_topic_classifier(agg)
+    grown = train_topic_classifier(agg, previous=first, extra_trees=20)
+    assert grown.topic_classifier.n_estimators == 220
+    assert first.topic_classifier.n_estimators == 200
@@ -23,3 +23,83 @@ def test_upload_txt_file():
     assert "quiz" in body
     assert isinstance(body["quiz"], list)
     assert len(body["quiz"]) <= 3
+
+
+def test_upload_stream_sends_questions_as_they_are_generated(monkeypatch, tmp_path):
+    import itertools
+    import json
+    from app.core.config import Config
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+    monkeypatch.setattr(Config, "QUIZ_GEN_BATCH_TOKENS", 4000)
+
+    from ml.fake_gemini import FakeGeminiModel, install
+    from ml.genai import GeminiClient
+    model = FakeGeminiModel()
+    fake = install(model, GeminiClient(api_key="test", cache=None, limiter=None))
+    # The first prompt fails: its chunk must not reach the stream as a placeholder
+    calls, generate_json = itertools.count(), fake.generate_json
+
+    def flaky_generate_json(prompt, **kwargs):
+        if next(calls) == 0:
+            raise ValueError("unparseable")
+        return generate_json(prompt, **kwargs)
+
+    monkeypatch.setattr(fake, "generate_json", flaky_generate_json)
+    monkeypatch.setattr("ml.train.quiz_gen.get_client", lambda: fake)
+
+    from app.models.users import db
+    from app.models.quiz import Quiz
+    from ml.train.quiz_gen import is_placeholder
+
+    app = create_app()
+    app.root_path = str(tmp_path / "app")  # uploads go to tmp_path/uploads
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    text = " ".join(f"Sentence {i} explains how plants turn sunlight into sugar." for i in range(60))
+    data = {"file": (io.BytesIO(text.encode()), "lesson.txt"), "title": "Week 1", "numQuestions": "3"}
+    resp = client.post("/api/teacher/materials/stream", data=data, content_type="multipart/form-data")
+    assert resp.mimetype == "text/event-stream"
+
+    events = []
+    for block in resp.get_data(as_text=True).strip().split("\n\n"):
+        name, payload = block.split("\n")
+        events.append((name[len("event: "):], json.loads(payload[len("data: "):])))
+    assert [e for e, _ in events] == ["lesson", "question", "question", "question", "done"]
+    assert [d["index"] for e, d in events if e == "question"] == [0, 1, 2]
+    assert not any(is_placeholder(d["question"]) for e, d in events if e == "question")
+    assert events[-1][1]["num_questions"] == 3
+    assert model.stats()["calls"] >= 3  # per-chunk prompts even with batching configured
+
+    with app.app_context():
+        saved = db.session.get(Quiz, events[0][1]["quiz_id"])
+        assert [q["question"] for q in saved.questions] == [d["question"]["question"] for e, d in events if e == "question"]
+
+
+def test_upload_answers_503_when_the_model_stays_rate_limited(monkeypatch, tmp_path):
+    from app.core.config import Config
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", "sqlite://")
+
+    from ml.fake_gemini import FakeGeminiConfig, FakeGeminiModel, install
+    from ml.genai import GeminiClient
+    fake = install(FakeGeminiModel(FakeGeminiConfig(rate_limit_rate=1.0, retry_after=7)),
+                   GeminiClient(api_key="test", cache=None, limiter=None, max_retries=0))
+    monkeypatch.setattr("ml.train.quiz_gen.get_client", lambda: fake)
+
+    from app.models.users import db
+    from app.models.lesson import Lesson
+
+    app = create_app()
+    app.root_path = str(tmp_path / "app")  # uploads go to tmp_path/uploads
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    text = " ".join(f"Sentence {i} explains how plants turn sunlight into sugar." for i in range(60))
+    data = {"file": (io.BytesIO(text.encode()), "lesson.txt"), "title": "Week 1", "numQuestions": "3"}
+    resp = client.post("/api/teacher/materials", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7" and resp.get_json()["retry_after"] == 7
+    with app.app_context():
+        assert Lesson.query.count() == 0  # nothing saved for a quiz of placeholders
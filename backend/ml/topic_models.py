@@ -1,49 +1,314 @@
 """Train and manage per-topic models for predicting mastery.
 
 This module trains a RandomForest per topic using features produced by `pipeline.aggregate_features`.
-Models are saved to `ml/models/<topic>.joblib` for quick loading at inference.
+Models are saved to `ml/models/<topic>.joblib` for quick loading at inference;
+`predict_topic_mastery` reads them through the cached `model_registry`.
+`retrain_changed_topics` uses the per-topic fingerprints in `topic_manifest.json`
+to retrain only topics whose rows changed, growing small changes by warm_start.
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import os
-from typing import Dict
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 import joblib
 import numpy as np
+import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
+from ml.array_store import load_arrays, save_arrays
+from ml.flat_forest import FOREST_SUFFIX, flatten_forest, save_flat_forest
+from ml.instrument import traced
 
 
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+MANIFEST_NAME = "topic_manifest.json"
+ROW_HASH_SUFFIX = ".rows"
 
-def train_per_topic_models(agg_df, min_samples=2) -> Dict[str, str]:
-    """Train a model per topic and return dict mapping topic -> saved_path.
+FEATURE_COLUMNS = ["accuracy_mean", "avg_time_mean", "attempts_count", "improvement_slope", "success_easy", "success_medium", "success_hard"]
+
+
+@dataclass
+class TrainingReport:
+    saved: Dict[str, str] = field(default_factory=dict)  # topic -> model path
+    timings: Dict[str, float] = field(default_factory=dict)  # topic -> fit + write seconds
+    wall_seconds: float = 0.0
+    rebuilt: List[str] = field(default_factory=list)
+    warm_started: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)  # unchanged since the last run
+
+
+def _atomic_dump(obj, path: str) -> None:
+    """joblib.dump to a temp file in the same directory, then rename over `path`.
 
-    Only trains when enough samples exist for that topic.
+    os.replace is atomic on the same filesystem, so a concurrent `load_topic_model`
+    sees either the old model or the new one, never a partial file. The
+    `<topic>.forest` export next to it is rewritten too, so a registry serving
+    flat models (ML_FLAT_MODELS=1) picks up every retrain.
     """
-    saved = {}
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".joblib")
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _export_flat(obj, path)
+
+
+def _forest_path(joblib_path: str) -> str:
+    return joblib_path[:-len(".joblib")] + FOREST_SUFFIX
+
+
+def _export_flat(model, joblib_path: str) -> str:
+    """Write the flat export of `model` next to its joblib file (atomically, via array_store)."""
+    return save_flat_forest(flatten_forest(model), _forest_path(joblib_path))
+
+
+def remove_topic_model(topic: str, model_dir: Optional[str] = None) -> None:
+    """Delete a topic's model, its flat export, its row hashes and its manifest entry."""
+    model_dir = model_dir or MODEL_DIR
+    path = os.path.join(model_dir, f"{topic}.joblib")
+    for p in (path, _forest_path(path), os.path.join(model_dir, f"{topic}{ROW_HASH_SUFFIX}")):
+        if os.path.exists(p):
+            os.remove(p)
+    manifest = load_manifest(model_dir)
+    if manifest.pop(topic, None) is not None:
+        _write_manifest(model_dir, manifest)
+
+
+def _fit_topic(topic: str, X: np.ndarray, y: np.ndarray, model_dir: str):
+    start = time.perf_counter()
+    clf = RandomForestClassifier(n_estimators=100, random_state=0)
+    clf.fit(X, y)
+    path = os.path.join(model_dir, f"{topic}.joblib")
+    _atomic_dump(clf, path)
+    return topic, path, time.perf_counter() - start
+
+
+def _grow_topic(topic: str, X: np.ndarray, y: np.ndarray, model_dir: str, extra_trees: int):
+    """Add `extra_trees` trees fitted on the current rows to the saved forest (warm_start)."""
+    start = time.perf_counter()
+    path = os.path.join(model_dir, f"{topic}.joblib")
+    clf = joblib.load(path)
+    clf.set_params(warm_start=True, n_estimators=clf.n_estimators + extra_trees)
+    clf.fit(X, y)
+    clf.set_params(warm_start=False)
+    _atomic_dump(clf, path)
+    return topic, path, time.perf_counter() - start
+
+
+def _topic_jobs(agg_df, min_samples: int):
+    """(topic, rows, X, y) per topic with enough samples, largest topic first."""
+    jobs = []
     for topic, g in agg_df.groupby("topic"):
         if len(g) < min_samples:
             continue
-        X = g[["accuracy_mean", "avg_time_mean", "attempts_count", "improvement_slope", "success_easy", "success_medium", "success_hard"]].fillna(0.0)
-        y = (g["accuracy_mean"] >= 0.8).astype(int)  # binary mastery label
-        clf = RandomForestClassifier(n_estimators=100, random_state=0)
-        clf.fit(X, y)
-        path = os.path.join(MODEL_DIR, f"{topic}.joblib")
-        joblib.dump(clf, path)
-        saved[topic] = path
-    return saved
-
-
-def load_topic_model(topic: str):
-    path = os.path.join(MODEL_DIR, f"{topic}.joblib")
+        X = g[FEATURE_COLUMNS].fillna(0.0)
+        y = (g["accuracy_mean"] >= 0.8).astype(int).to_numpy()  # binary mastery label
+        jobs.append((topic, g, X, y))
+    jobs.sort(key=lambda job: len(job[3]), reverse=True)
+    return jobs
+
+
+def _run_jobs(calls, workers: Optional[int]):
+    """Run [(fn, args), ...] in order, over a process pool when workers > 1."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(calls) <= 1:
+        return [fn(*args) for fn, args in calls]
+    with ProcessPoolExecutor(max_workers=min(workers, len(calls))) as pool:
+        futures = [pool.submit(fn, *args) for fn, args in calls]
+        return [f.result() for f in futures]
+
+
+def _row_hashes(g, X) -> np.ndarray:
+    """One uint64 per (student, topic) feature row; equal rows hash equal across runs."""
+    keyed = X.assign(student_id=g["student_id"].astype(str).to_numpy()) if "student_id" in g else X
+    return np.sort(pd.util.hash_pandas_object(keyed, index=False).to_numpy())
+
+
+def _fingerprint(hashes: np.ndarray) -> str:
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def _manifest_path(model_dir: str) -> str:
+    return os.path.join(model_dir, MANIFEST_NAME)
+
+
+def load_manifest(model_dir: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """topic -> {fingerprint, rows, n_estimators, mode} recorded by the last training run."""
+    path = _manifest_path(model_dir or MODEL_DIR)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _record_topics(model_dir: str, entries: Dict[str, Dict[str, Any]], hashes: Dict[str, np.ndarray]) -> None:
+    manifest = load_manifest(model_dir)
+    manifest.update(entries)
+    for topic, h in hashes.items():
+        save_arrays(os.path.join(model_dir, f"{topic}{ROW_HASH_SUFFIX}"), {"hashes": h})
+    _write_manifest(model_dir, manifest)
+
+
+def _write_manifest(model_dir: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    tmp = _manifest_path(model_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, _manifest_path(model_dir))
+
+
+@traced
+def train_per_topic_models_parallel(agg_df, min_samples=2, workers: Optional[int] = None,
+                                    model_dir: Optional[str] = None,
+                                    record_manifest: bool = False) -> TrainingReport:
+    """Train the per-topic models over a process pool.
+
+    Topics are submitted largest first, so the pool starts the long fits early
+    and fills in with small topics (longest-processing-time-first scheduling)
+    instead of finishing on one big straggler. `workers` defaults to the CPU
+    count; workers=1 trains in this process.
+
+    With `record_manifest=True` every trained topic's fingerprint is recorded
+    for `retrain_changed_topics`; otherwise no manifest or row-hash files are
+    written.
+    """
+    model_dir = model_dir or MODEL_DIR
+    os.makedirs(model_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    jobs = _topic_jobs(agg_df, min_samples)
+    results = _run_jobs([(_fit_topic, (topic, X, y, model_dir)) for topic, _, X, y in jobs], workers)
+
+    if record_manifest:
+        hashes = {topic: _row_hashes(g, X) for topic, g, X, _ in jobs}
+        _record_topics(model_dir, {
+            topic: {"fingerprint": _fingerprint(hashes[topic]), "rows": len(X), "n_estimators": 100,
+                    "mode": "rebuilt", "labels": sorted(int(v) for v in np.unique(y))}
+            for topic, _, X, y in jobs
+        }, hashes)
+
+    report = TrainingReport()
+    for topic, path, seconds in sorted(results):
+        report.saved[topic] = path
+        report.timings[topic] = seconds
+        report.rebuilt.append(topic)
+    report.wall_seconds = time.perf_counter() - start
+    return report
+
+
+@traced
+def retrain_changed_topics(agg_df, min_samples=2, workers: Optional[int] = None, model_dir: Optional[str] = None,
+                           warm_start_fraction: float = 0.2, extra_trees: int = 25,
+                           max_estimators: int = 300) -> TrainingReport:
+    """Retrain only the topics whose feature rows changed since the last run.
+
+    Each topic's (student, topic) rows are hashed; a topic whose fingerprint
+    matches the manifest is skipped without loading anything. If at most
+    `warm_start_fraction` of a changed topic's rows are new or different, the
+    saved forest keeps its trees and grows `extra_trees` more fitted on the
+    current rows (warm_start). Larger changes, a changed label set, a forest
+    already at `max_estimators` or a topic never trained before get a full
+    rebuild.
+    """
+    model_dir = model_dir or MODEL_DIR
+    os.makedirs(model_dir, exist_ok=True)
+    start = time.perf_counter()
+    manifest = load_manifest(model_dir)
+    report = TrainingReport()
+
+    calls, entries, hashes = [], {}, {}
+    for topic, g, X, y in _topic_jobs(agg_df, min_samples):
+        h = _row_hashes(g, X)
+        fingerprint = _fingerprint(h)
+        previous = manifest.get(topic)
+        path = os.path.join(model_dir, f"{topic}.joblib")
+        if previous and previous["fingerprint"] == fingerprint and os.path.exists(path):
+            report.skipped.append(topic)
+            continue
+
+        grow = False
+        hash_path = os.path.join(model_dir, f"{topic}{ROW_HASH_SUFFIX}")
+        if previous and os.path.exists(path) and os.path.exists(hash_path):
+            old_hashes = load_arrays(hash_path, mmap_mode=False)[0]["hashes"]
+            changed = np.count_nonzero(~np.isin(h, old_hashes, assume_unique=False)) / max(1, len(h))
+            same_labels = sorted(int(v) for v in np.unique(y)) == previous.get("labels")
+            grow = (changed <= warm_start_fraction and same_labels
+                    and previous["n_estimators"] + extra_trees <= max_estimators)
+
+        if grow:
+            calls.append((_grow_topic, (topic, X, y, model_dir, extra_trees)))
+            n_estimators, mode = previous["n_estimators"] + extra_trees, "warm_start"
+        else:
+            calls.append((_fit_topic, (topic, X, y, model_dir)))
+            n_estimators, mode = 100, "rebuilt"
+        hashes[topic] = h
+        entries[topic] = {"fingerprint": fingerprint, "rows": len(X), "n_estimators": n_estimators, "mode": mode,
+                          "labels": sorted(int(v) for v in np.unique(y))}
+
+    for topic, path, seconds in sorted(_run_jobs(calls, workers)):
+        report.saved[topic] = path
+        report.timings[topic] = seconds
+        (report.warm_started if entries[topic]["mode"] == "warm_start" else report.rebuilt).append(topic)
+    if entries:
+        _record_topics(model_dir, entries, hashes)
+    report.wall_seconds = time.perf_counter() - start
+    return report
+
+
+@traced
+def train_per_topic_models(agg_df, min_samples=2, workers: int = 1, model_dir: Optional[str] = None) -> Dict[str, str]:
+    """Train a model per topic and return dict mapping topic -> saved_path.
+
+    Only trains when enough samples exist for that topic. Pass workers > 1 to
+    train topics in parallel (see `train_per_topic_models_parallel`).
+    """
+    return train_per_topic_models_parallel(agg_df, min_samples, workers, model_dir).saved
+
+
+@traced
+def export_flat_models(model_dir: Optional[str] = None) -> Dict[str, str]:
+    """Write a `<topic>.forest` array export next to every `<topic>.joblib` model.
+
+    Training keeps the exports current on its own; this (re)creates them for
+    models saved before that, or copied in from elsewhere.
+
+    Load them with `ModelRegistry(suffix=FOREST_SUFFIX, loader=load_flat_forest)`
+    (or set ML_FLAT_MODELS=1) to score without sklearn on the hot path; the
+    arrays are memory-mapped, so workers share them (see `ml.flat_forest`).
+    """
+    model_dir = model_dir or MODEL_DIR
+    exported = {}
+    for name in sorted(os.listdir(model_dir)):
+        if not name.endswith(".joblib"):
+            continue
+        path = os.path.join(model_dir, name)
+        exported[name[:-len(".joblib")]] = _export_flat(joblib.load(path), path)
+    return exported
+
+
+@traced
+def load_topic_model(topic: str, model_dir: Optional[str] = None):
+    path = os.path.join(model_dir or MODEL_DIR, f"{topic}.joblib")
     if not os.path.exists(path):
         raise FileNotFoundError(path)
     return joblib.load(path)
 
 
+@traced
 def predict_topic_mastery(topic: str, features_row) -> float:
-    model = load_topic_model(topic)
+    from ml.model_registry import get_registry
+
+    model = get_registry().get(topic)
     X = np.array([[
         features_row.get("accuracy_mean", 0.0),
         features_row.get("avg_time_mean", 0.0),
@@ -53,5 +318,51 @@ def predict_topic_mastery(topic: str, features_row) -> float:
         features_row.get("success_medium", 0.0),
         features_row.get("success_hard", 0.0),
     ]])
+    col = _mastery_column(model)
+    if col is None or len(model.classes_) == 1:
+        return 0.0 if col is None else 1.0
     prob = model.predict_proba(X)
-    return float(prob[0, 1])
+    return float(prob[0, col])
+
+
+def _mastery_column(model) -> Optional[int]:
+    """Column of predict_proba holding the 'mastered' (1) class, None if the model never saw it."""
+    hits = np.flatnonzero(np.asarray(model.classes_) == 1)
+    return int(hits[0]) if len(hits) else None
+
+
+@traced
+def predict_topic_mastery_batch(features_df: pd.DataFrame, registry=None) -> pd.DataFrame:
+    """Score many (student, topic) feature rows with one predict_proba call per topic.
+
+    `features_df` needs a `topic` column and the FEATURE_COLUMNS (missing values
+    count as 0.0, as in training); a `student_id` column is carried through.
+    Returns a frame aligned with the input index with student_id, topic and
+    mastery_probability. Rows whose topic has no saved model get NaN; a model
+    trained on a single class gives 1.0 or 0.0.
+    """
+    if registry is None:
+        from ml.model_registry import get_registry
+        registry = get_registry()
+
+    X_all = features_df.reindex(columns=FEATURE_COLUMNS).fillna(0.0)
+    probs = np.full(len(features_df), np.nan)
+    topics = features_df["topic"].to_numpy()
+    for topic, positions in pd.Series(np.arange(len(features_df))).groupby(topics, sort=False):
+        try:
+            model = registry.get(topic)
+        except FileNotFoundError:
+            continue
+        idx = positions.to_numpy()
+        col = _mastery_column(model)
+        if col is None:
+            probs[idx] = 0.0
+        elif len(model.classes_) == 1:
+            probs[idx] = 1.0
+        else:
+            probs[idx] = model.predict_proba(X_all.iloc[idx])[:, col]
+
+    out = pd.DataFrame({"topic": topics, "mastery_probability": probs}, index=features_df.index)
+    if "student_id" in features_df.columns:
+        out.insert(0, "student_id", features_df["student_id"].to_numpy())
+    return out
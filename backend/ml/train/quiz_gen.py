@@ -1,19 +1,29 @@
 # quiz_gen.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import re
 import random
 
 # AI interaction helpers (Gemini client)
-from ml.genai import GeminiClient
+from ml.genai import get_client
+from ml.rate_limit import RateLimitError, estimate_tokens
 from ml.schemas import StructuredAnswer, QuizItem
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+# Set on fallback items the model did not write ("Answer TBD", Options A-D)
+PLACEHOLDER_KEY = "placeholder"
+
+
 def ai_generate_answer(question: str) -> str:
     """Generate a short textual answer for a question using the configured model.
     Falls back to a placeholder string if model is not configured or call fails.
     """
     try:
-        client = GeminiClient()
-        return client.generate_text(question)
+        return get_client().generate_text(question)
     except Exception:
         return "Answer TBD"
 
@@ -31,8 +41,7 @@ def _try_structured_answer(question: str, difficulty: str = "medium") -> dict:
         "Return ONLY valid JSON.\n\n"
         f"Context/Question: {question}"
     )
-    client = GeminiClient()
-    return client.generate_json(prompt)
+    return get_client().generate_json(prompt)
 
 
 def chunk_text(text: str, max_words: int = 50) -> List[str]:
@@ -73,50 +82,254 @@ def _excerpt_for_question(text: str, max_chars: int = 120) -> str:
 
     return excerpt
 
-def generate_quiz(chunk: str, difficulty: str = "medium") -> List[Dict[str, Any]]:
-    """Generate a quiz from a chunk of text.
-    Returns a list of dicts: {'question', 'answer', 'options', 'correct_answer', 'hint'}
-    """
+def _question_for_chunk(chunk: str) -> str:
     excerpt = _excerpt_for_question(chunk)
-    question_text = f'What is the main idea of the following passage: "{excerpt}"?'
+    return f'What is the main idea of the following passage: "{excerpt}"?'
 
-    # Default/Fallback values
-    answer = "Answer TBD"
-    options = ["Option A", "Option B", "Option C", "Option D"]
-    correct_answer = "Option A"
-    hint = "Summarize the passage."
 
+def _build_item(question_text: str, resp: Any) -> Optional[Dict[str, Any]]:
+    """Validate a model response against StructuredAnswer; None if it does not validate."""
+    if not isinstance(resp, dict):
+        return None
     try:
-        resp = _try_structured_answer(question_text, difficulty=difficulty)
-        if isinstance(resp, dict):
-            sa = StructuredAnswer(**resp)
-            answer = sa.answer
-            options = sa.options
-            correct_answer = sa.correct_answer
-            hint = sa.hint or hint
-            
-            # Simple validation: ensure correct_answer is in options
-            if correct_answer not in options:
-                 # If not in options, maybe try to match fuzzy or just replace first option
-                 if options:
-                     options[0] = correct_answer
-    except Exception as e:
-        # validation or model parse failed—fall back below
-        # print("Quiz gen error:", e) 
-        pass
+        sa = StructuredAnswer(**resp)
+    except Exception:
+        return None
+    options = sa.options
+    correct_answer = sa.correct_answer
+    # Simple validation: ensure correct_answer is in options
+    if correct_answer not in options:
+        # If not in options, maybe try to match fuzzy or just replace first option
+        if options:
+            options[0] = correct_answer
+    return _item_dict(question_text, sa.answer, options, correct_answer, sa.hint or "Summarize the passage.")
 
+
+def _item_dict(question_text: str, answer: str, options: List[str], correct_answer: str, hint: str) -> Dict[str, Any]:
     item = QuizItem(
-        question=question_text, 
-        answer=answer, 
-        options=options, 
-        correct_answer=correct_answer, 
+        question=question_text,
+        answer=answer,
+        options=options,
+        correct_answer=correct_answer,
         hint=hint
     )
-    
-    return [{
-        "question": item.question, 
-        "answer": item.answer, 
-        "options": item.options, 
+    return {
+        "question": item.question,
+        "answer": item.answer,
+        "options": item.options,
         "correct_answer": item.correct_answer,
         "hint": item.hint
-    }]
+    }
+
+
+def _placeholder_item(question_text: str) -> Dict[str, Any]:
+    """Default/fallback item for a chunk the model could not answer, marked with PLACEHOLDER_KEY."""
+    item = _item_dict(question_text, "Answer TBD", ["Option A", "Option B", "Option C", "Option D"],
+                      "Option A", "Summarize the passage.")
+    item[PLACEHOLDER_KEY] = True
+    return item
+
+
+def is_placeholder(item: Dict[str, Any]) -> bool:
+    return bool(item.get(PLACEHOLDER_KEY))
+
+
+def generate_quiz(chunk: str, difficulty: str = "medium", raise_rate_limit: bool = False) -> List[Dict[str, Any]]:
+    """Generate a quiz from a chunk of text.
+    Returns a list of dicts: {'question', 'answer', 'options', 'correct_answer', 'hint'}
+
+    A failed or invalid answer gives a placeholder item (see `is_placeholder`);
+    with `raise_rate_limit` a RateLimitError is raised to the caller instead.
+    """
+    question_text = _question_for_chunk(chunk)
+
+    item = None
+    try:
+        item = _build_item(question_text, _try_structured_answer(question_text, difficulty=difficulty))
+    except RateLimitError as e:
+        if raise_rate_limit:
+            raise
+        # Quota exhausted even after backing off: still fall back, but make it visible
+        logger.warning("Quiz generation rate limited, using placeholder item: %s", e)
+    except Exception as e:
+        # model call or parse failed—fall back below
+        logger.debug("Quiz gen error: %s", e)
+
+    if item is None:
+        item = _placeholder_item(question_text)
+    return [item]
+
+
+# Batched generation: several chunks per prompt, one shared copy of the instructions
+DEFAULT_BATCH_TOKENS = 4000
+MAX_BATCH_ITEMS = 10
+# Rough allowance for one generated item (options, explanation, hint) in the response
+ITEM_OUTPUT_TOKENS = 150
+
+
+def _batch_prompt(questions: List[str], difficulty: str) -> str:
+    numbered = "\n".join(f"[{i}] {q}" for i, q in enumerate(questions))
+    return (
+        f"For EACH numbered question below, write a {difficulty}-level multiple choice question item. "
+        "Return a JSON object {\"items\": [...]} with one object per question, each with the keys:\n"
+        "- 'index': The number of the question it answers.\n"
+        "- 'answer': A concise explanation of why the correct option is right.\n"
+        "- 'options': A list of exactly 4 distinct options (strings). One must be correct, others plausible distractors.\n"
+        "- 'correct_answer': The exact string content of the correct option from the list.\n"
+        "- 'hint': A short hint.\n"
+        "Return ONLY valid JSON.\n\n"
+        f"Questions:\n{numbered}"
+    )
+
+
+_BATCH_OVERHEAD_TOKENS = estimate_tokens(_batch_prompt([], "medium"))
+
+
+def plan_batches(questions: List[str], token_budget: int = DEFAULT_BATCH_TOKENS,
+                 max_items: int = MAX_BATCH_ITEMS) -> List[List[int]]:
+    """Group question indices, in order, so each batch's prompt plus expected output fits `token_budget`."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = _BATCH_OVERHEAD_TOKENS
+    for i, q in enumerate(questions):
+        cost = estimate_tokens(q) + 4 + ITEM_OUTPUT_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], _BATCH_OVERHEAD_TOKENS
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _try_structured_batch(questions: List[str], difficulty: str = "medium") -> Dict[int, Any]:
+    """One model call for several questions; returns {index: raw item} for whatever came back."""
+    resp = get_client().generate_json(_batch_prompt(questions, difficulty))
+    raw = resp.get("items", []) if isinstance(resp, dict) else resp
+    by_index: Dict[int, Any] = {}
+    for pos, entry in enumerate(raw if isinstance(raw, list) else []):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            idx = int(entry.get("index", pos))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= idx < len(questions):
+            by_index.setdefault(idx, entry)
+    return by_index
+
+
+def generate_quiz_batch(chunks: List[str], difficulty: str = "medium", token_budget: int = DEFAULT_BATCH_TOKENS,
+                        max_items: int = MAX_BATCH_ITEMS, raise_rate_limit: bool = False) -> List[Dict[str, Any]]:
+    """One quiz item per chunk, asking the model for several chunks per call.
+
+    Chunks are packed into prompts by `plan_batches`. Every returned item is
+    validated against StructuredAnswer; a chunk whose item is missing or
+    invalid (or whose whole batch call failed) falls back to `generate_quiz`
+    on its own, so the output always matches the chunk order one-for-one.
+    A batch that is still rate limited after the client's retries gets
+    placeholder items instead (or, with `raise_rate_limit`, re-raises): one
+    call per chunk would only hit the exhausted quota harder.
+    """
+    questions = [_question_for_chunk(c) for c in chunks]
+    items: List[Dict[str, Any]] = []
+    for batch in plan_batches(questions, token_budget, max_items):
+        try:
+            raw = _try_structured_batch([questions[i] for i in batch], difficulty=difficulty)
+        except RateLimitError as e:
+            if raise_rate_limit:
+                raise
+            logger.warning("Batched quiz prompt rate limited, using %d placeholder items: %s", len(batch), e)
+            items.extend(_placeholder_item(questions[i]) for i in batch)
+            continue
+        except Exception as e:
+            logger.info("Batched quiz prompt failed, generating its %d chunks one by one: %s", len(batch), e)
+            raw = {}
+        for pos, i in enumerate(batch):
+            item = _build_item(questions[i], raw.get(pos))
+            items.extend([item] if item is not None
+                         else generate_quiz(chunks[i], difficulty=difficulty, raise_rate_limit=raise_rate_limit))
+    return items
+
+
+def iter_quiz_from_chunks(chunks: Iterable[str], difficulty: str = "medium", num_questions: Optional[int] = None,
+                          max_workers: int = DEFAULT_CONCURRENCY, min_chars: int = 0,
+                          batch_tokens: int = 0) -> Iterator[Dict[str, Any]]:
+    """Yield validated quiz items from chunks as soon as each one (in source order) is ready.
+
+    Placeholder items (a chunk the model failed on) are dropped and do not
+    count towards `num_questions`: chunks keep being sent until that many
+    valid items were yielded or the chunks run out. At most `max_workers`
+    Gemini calls are in flight, and no more chunks are in flight than items
+    are still missing; once the limit is met, calls that have not begun are
+    cancelled (in-flight ones finish in the background). Closing the generator
+    early does the same. Chunks shorter than `min_chars` are skipped.
+    A RateLimitError (quota still exhausted after the client's retries) ends
+    the iteration and is raised to the caller, which can answer 503.
+
+    With `batch_tokens` > 0 consecutive chunks are packed into one
+    `generate_quiz_batch` call (see `plan_batches`), never more chunks than
+    items are still missing.
+    """
+    chunks = [c for c in chunks if len(c) >= min_chars]
+    limit = float("inf") if num_questions is None else num_questions
+    if not chunks or limit <= 0:
+        return
+
+    cursor = 0
+
+    def next_unit(need) -> List[str]:
+        nonlocal cursor
+        size = 1
+        if batch_tokens > 0:
+            window = chunks[cursor:cursor + min(need, MAX_BATCH_ITEMS)]
+            size = len(plan_batches([_question_for_chunk(c) for c in window], batch_tokens)[0])
+        unit = chunks[cursor:cursor + size]
+        cursor += size
+        return unit
+
+    def run(unit: List[str]) -> List[Dict[str, Any]]:
+        if batch_tokens > 0:
+            return generate_quiz_batch(unit, difficulty=difficulty, token_budget=batch_tokens, raise_rate_limit=True)
+        return generate_quiz(unit[0], difficulty=difficulty, raise_rate_limit=True)
+
+    workers = max(1, max_workers)
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-gen") if workers > 1 else None
+    pending = deque()  # (future, or the unit itself when running inline; chunks in it)
+    produced = 0
+    try:
+        while True:
+            while cursor < len(chunks) and len(pending) < workers:
+                need = limit - produced - sum(n for _, n in pending)
+                if need <= 0:
+                    break
+                unit = next_unit(need)
+                pending.append((pool.submit(run, unit) if pool else unit, len(unit)))
+            if not pending:
+                return
+            head, _ = pending.popleft()
+            for item in (head.result() if pool else run(head)):
+                if is_placeholder(item):
+                    continue
+                yield item
+                produced += 1
+                if produced >= limit:
+                    return
+    finally:
+        if pool is not None:
+            # Don't hold the request open for calls whose results are no longer needed
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def generate_quiz_from_chunks(chunks: Iterable[str], difficulty: str = "medium", num_questions: Optional[int] = None,
+                              max_workers: int = DEFAULT_CONCURRENCY, min_chars: int = 0,
+                              batch_tokens: int = 0) -> List[Dict[str, Any]]:
+    """Run `generate_quiz` over chunks on a bounded thread pool.
+
+    Items come back in the order of the source chunks, exactly as a sequential
+    loop would produce them, placeholders left out; see `iter_quiz_from_chunks`
+    for the options.
+    """
+    return list(iter_quiz_from_chunks(chunks, difficulty=difficulty, num_questions=num_questions,
+                                      max_workers=max_workers, min_chars=min_chars, batch_tokens=batch_tokens))
@@ -5,21 +5,47 @@ Usage:
   python -m ml.worker
 
 This uses RQ and expects REDIS_URL in env or defaults to redis://localhost:6379/0
+
+The worker also queues `ml.tasks.refresh_mastery_view` every
+MASTERY_REFRESH_INTERVAL seconds (default 300, 0 = off), so the materialized
+mastery table catches up even when submissions do not enqueue it
+(MASTERY_REFRESH_ON_SUBMIT=0) or their enqueue failed. Runs already pending are
+not queued twice, so several workers can all keep this on.
 """
 from __future__ import annotations
 
 import os
+import threading
 from rq import Queue, Worker, Connection
 import redis
 
 listen = ["ml-tasks"]
 
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+refresh_interval = float(os.getenv("MASTERY_REFRESH_INTERVAL", "300"))
 
 conn = redis.from_url(redis_url)
 
+
+def schedule_mastery_refresh(interval: float, stop: threading.Event) -> None:
+    """Queue a mastery refresh every `interval` seconds until `stop` is set."""
+    from ml.tasks import enqueue_mastery_refresh
+
+    while not stop.wait(interval):
+        try:
+            enqueue_mastery_refresh(redis_url)
+        except Exception as e:
+            print(f"Could not queue mastery refresh: {e}")
+
+
 if __name__ == "__main__":
+    stop = threading.Event()
+    if refresh_interval > 0:
+        threading.Thread(target=schedule_mastery_refresh, args=(refresh_interval, stop), daemon=True).start()
     with Connection(conn):
         q = Queue("ml-tasks")
         print("Starting worker listening on ml-tasks queue...")
-        Worker(q).work()
+        try:
+            Worker(q).work()
+        finally:
+            stop.set()